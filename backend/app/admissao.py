@@ -0,0 +1,175 @@
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Optional, Tuple
+from app.metricas import metricas
+
+
+class AdmissaoNegada(Exception):
+    """Requisição recusada antes de executar; vira 429 com Retry-After."""
+
+    def __init__(self, motivo: str, tentar_em: float):
+        super().__init__(motivo)
+        self.motivo = motivo
+        self.tentar_em = tentar_em
+
+    @property
+    def retry_after(self) -> str:
+        return str(max(1, math.ceil(self.tentar_em)))
+
+
+class BaldeTokens:
+    """Token bucket: `taxa` unidades por segundo, acumulando até `capacidade`."""
+
+    def __init__(self, taxa: float, capacidade: float):
+        self.taxa = taxa
+        self.capacidade = capacidade
+        self.tokens = capacidade
+        self.atualizado_em = time.monotonic()
+
+    def consumir(self, custo: float) -> float:
+        """Desconta `custo` e devolve 0, ou devolve quantos segundos faltam sem descontar."""
+        agora = time.monotonic()
+        self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado_em) * self.taxa)
+        self.atualizado_em = agora
+        # Uma operação maior que a rajada inteira passa quando o balde estiver cheio
+        custo = min(custo, self.capacidade)
+        if self.tokens >= custo:
+            self.tokens -= custo
+            return 0.0
+        return (custo - self.tokens) / self.taxa
+
+
+class ControleAdmissao:
+    """Controle de admissão do /graphql.
+
+    Cada cliente tem um token bucket, e as execuções dividem `capacidade` unidades de
+    concorrência, ponderadas pelo custo da operação (app/custo.py). Quem não cabe espera
+    numa fila FIFO de até `max_fila` operações por no máximo `espera_maxima` segundos. Com a
+    fila cheia ou o balde vazio a recusa é imediata, para que a latência de quem entrou
+    não cresça sem limite.
+    """
+
+    def __init__(
+        self,
+        capacidade: float = 16.0,
+        max_fila: int = 64,
+        espera_maxima: float = 1.0,
+        taxa_cliente: float = 50.0,
+        rajada_cliente: float = 200.0,
+        max_clientes: int = 10_000
+    ):
+        self.capacidade = capacidade
+        self.max_fila = max_fila
+        self.espera_maxima = espera_maxima
+        self.taxa_cliente = taxa_cliente
+        self.rajada_cliente = rajada_cliente
+        self.max_clientes = max_clientes
+        self.em_uso = 0.0
+        self._fila: Deque[Tuple[float, "asyncio.Future[None]"]] = deque()
+        self._baldes: "OrderedDict[str, BaldeTokens]" = OrderedDict()
+
+    @classmethod
+    def do_ambiente(cls) -> Optional["ControleAdmissao"]:
+        if os.getenv("ADMISSAO", "1") == "0":
+            return None
+        return cls(
+            capacidade=float(os.getenv("ADMISSAO_CAPACIDADE", "16")),
+            max_fila=int(os.getenv("ADMISSAO_FILA", "64")),
+            espera_maxima=float(os.getenv("ADMISSAO_ESPERA_MAXIMA", "1")),
+            taxa_cliente=float(os.getenv("ADMISSAO_TAXA_CLIENTE", "50")),
+            rajada_cliente=float(os.getenv("ADMISSAO_RAJADA_CLIENTE", "200")),
+        )
+
+    @property
+    def na_fila(self) -> int:
+        return len(self._fila)
+
+    def verificar_cliente(self, cliente: str, custo: float) -> None:
+        if self.taxa_cliente <= 0:
+            return
+        balde = self._baldes.get(cliente)
+        if balde is None:
+            balde = self._baldes[cliente] = BaldeTokens(self.taxa_cliente, self.rajada_cliente)
+            if len(self._baldes) > self.max_clientes:
+                self._baldes.popitem(last=False)
+        else:
+            self._baldes.move_to_end(cliente)
+        espera = balde.consumir(custo)
+        if espera > 0:
+            self._registrar("limite_cliente")
+            raise AdmissaoNegada("Limite de requisições do cliente excedido", espera)
+
+    @asynccontextmanager
+    async def vaga(self, custo: float) -> AsyncIterator[None]:
+        """Reserva `custo` unidades de concorrência durante a execução."""
+        peso = min(custo, self.capacidade)
+        inicio = time.perf_counter()
+        await self._adquirir(peso)
+        metricas.observar(
+            "graphql_admissao_espera_segundos", time.perf_counter() - inicio,
+            "Tempo na fila de admissão do /graphql"
+        )
+        self._registrar("admitida")
+        try:
+            yield
+        finally:
+            self._liberar(peso)
+
+    async def _adquirir(self, peso: float) -> None:
+        if not self._fila and self.em_uso + peso <= self.capacidade:
+            self.em_uso += peso
+            return
+        if len(self._fila) >= self.max_fila:
+            self._registrar("fila_cheia")
+            raise AdmissaoNegada("Servidor sobrecarregado", self.espera_maxima)
+
+        item = (peso, asyncio.get_running_loop().create_future())
+        self._fila.append(item)
+        try:
+            await asyncio.wait_for(item[1], self.espera_maxima)
+        except asyncio.TimeoutError:
+            self._desistir(item)
+            self._registrar("tempo_esgotado")
+            raise AdmissaoNegada("Servidor sobrecarregado", self.espera_maxima) from None
+        except asyncio.CancelledError:
+            if item[1].done() and not item[1].cancelled():
+                # A vaga foi concedida no mesmo instante do cancelamento
+                self._liberar(peso)
+            else:
+                self._desistir(item)
+            raise
+
+    def _desistir(self, item: Tuple[float, "asyncio.Future[None]"]) -> None:
+        if item in self._fila:
+            self._fila.remove(item)
+            # Quem estava atrás de uma operação grande pode caber agora
+            self._despachar()
+
+    def _liberar(self, peso: float) -> None:
+        self.em_uso = max(0.0, self.em_uso - peso)
+        self._despachar()
+
+    def _despachar(self) -> None:
+        while self._fila and self.em_uso + self._fila[0][0] <= self.capacidade:
+            peso, futuro = self._fila.popleft()
+            if futuro.done():
+                continue
+            self.em_uso += peso
+            futuro.set_result(None)
+
+    @staticmethod
+    def _registrar(resultado: str) -> None:
+        metricas.incrementar(
+            "graphql_admissao_total", descricao="Decisões do controle de admissão do /graphql",
+            resultado=resultado
+        )
+
+    def coletar(self) -> list:
+        return [
+            ("graphql_admissao_em_uso", "gauge", (), self.em_uso),
+            ("graphql_admissao_fila", "gauge", (), self.na_fila),
+        ]
@@ -0,0 +1,101 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+
+
+_AUSENTE = object()
+T = TypeVar("T")
+
+
+class CacheLRU:
+    """Cache limitado por tamanho (LRU) e por idade (TTL), com contadores de acerto."""
+
+    def __init__(self, tamanho_maximo: int = 1024, ttl_segundos: Optional[float] = 300.0):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl_segundos = ttl_segundos
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+        self._itens: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._itens)
+
+    def get(self, chave: Hashable, padrao: Any = None) -> Any:
+        with self._lock:
+            item = self._itens.get(chave, _AUSENTE)
+            if item is not _AUSENTE:
+                expira_em, valor = item
+                if expira_em >= time.monotonic():
+                    self._itens.move_to_end(chave)
+                    self.acertos += 1
+                    return valor
+                del self._itens[chave]
+                self.remocoes += 1
+            self.falhas += 1
+            return padrao
+
+    def set(self, chave: Hashable, valor: Any) -> None:
+        expira_em = time.monotonic() + self.ttl_segundos if self.ttl_segundos else float("inf")
+        with self._lock:
+            self._itens[chave] = (expira_em, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+                self.remocoes += 1
+
+    def get_or_set(self, chave: Hashable, calcular: Callable[[], Any]) -> Any:
+        valor = self.get(chave, _AUSENTE)
+        if valor is _AUSENTE:
+            valor = calcular()
+            self.set(chave, valor)
+        return valor
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._itens.clear()
+
+    @property
+    def taxa_acerto(self) -> float:
+        total = self.acertos + self.falhas
+        return self.acertos / total if total else 0.0
+
+
+class VooUnico:
+    """Single-flight: chamadas simultâneas com a mesma chave compartilham uma única execução.
+
+    A execução roda numa task própria, então um cliente que desiste não cancela a dos
+    demais. Nada é guardado depois que ela termina; reaproveitar resultados é papel do cache.
+    """
+
+    def __init__(self) -> None:
+        self.executadas = 0
+        self.coalescidas = 0
+        self._em_andamento: Dict[Hashable, "asyncio.Future[Any]"] = {}
+
+    def __len__(self) -> int:
+        return len(self._em_andamento)
+
+    def __contains__(self, chave: Hashable) -> bool:
+        return chave in self._em_andamento
+
+    async def executar(self, chave: Hashable, criar: Callable[[], Awaitable[T]]) -> T:
+        tarefa = self._em_andamento.get(chave)
+        if tarefa is None:
+            tarefa = asyncio.ensure_future(criar())
+            self._em_andamento[chave] = tarefa
+            tarefa.add_done_callback(lambda t: self._encerrar(chave, t))
+            self.executadas += 1
+        else:
+            self.coalescidas += 1
+        return await asyncio.shield(tarefa)
+
+    def _encerrar(self, chave: Hashable, tarefa: "asyncio.Future[Any]") -> None:
+        if self._em_andamento.get(chave) is tarefa:
+            del self._em_andamento[chave]
+        if not tarefa.cancelled():
+            # Marca a exceção como lida mesmo que todos os interessados tenham desistido
+            tarefa.exception()
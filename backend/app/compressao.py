@@ -0,0 +1,203 @@
+import gzip
+import os
+import zlib
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli é opcional
+    brotli = None
+
+TIPOS_COMPRESSIVEIS = ("application/json", "application/x-ndjson", "application/graphql-response+json", "text/")
+
+
+class Compressor(ABC):
+    """Interface comum de gzip e brotli: `comprimir` devolve o que já pode ser enviado."""
+
+    @abstractmethod
+    def comprimir(self, dados: bytes) -> bytes:
+        ...
+
+    @abstractmethod
+    def finalizar(self) -> bytes:
+        ...
+
+
+class CompressorGzip(Compressor):
+    def __init__(self, nivel: int):
+        self._zlib = zlib.compressobj(nivel, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def comprimir(self, dados: bytes) -> bytes:
+        # Sync flush: cada pedaço de um stream chega ao cliente sem esperar o próximo
+        return self._zlib.compress(dados) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finalizar(self) -> bytes:
+        return self._zlib.flush(zlib.Z_FINISH)
+
+
+class CompressorBrotli(Compressor):
+    def __init__(self, qualidade: int):
+        self._brotli = brotli.Compressor(quality=qualidade)
+
+    def comprimir(self, dados: bytes) -> bytes:
+        return self._brotli.process(dados) + self._brotli.flush()
+
+    def finalizar(self) -> bytes:
+        return self._brotli.finish()
+
+
+def codificacoes_disponiveis() -> Tuple[str, ...]:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def escolher_codificacao(accept_encoding: str, disponiveis: Tuple[str, ...]) -> Optional[str]:
+    """A codificação aceita de maior q; nos empates vale a ordem de `disponiveis` (br antes de gzip)."""
+    aceitas = {}
+    for item in accept_encoding.split(","):
+        nome, _, parametros = item.strip().partition(";")
+        q = 1.0
+        parametros = parametros.strip()
+        if parametros.startswith("q="):
+            try:
+                q = float(parametros[2:])
+            except ValueError:
+                q = 0.0
+        aceitas[nome.strip().lower()] = q
+    candidatas = [(aceitas.get(c, aceitas.get("*", 0.0)), -i, c) for i, c in enumerate(disponiveis)]
+    q, _, codificacao = max(candidatas)
+    return codificacao if q > 0 else None
+
+
+def comprimir_unico(codificacao: str, corpo: bytes, nivel_gzip: int, qualidade_brotli: int) -> bytes:
+    if codificacao == "br":
+        return brotli.compress(corpo, quality=qualidade_brotli)
+    return gzip.compress(corpo, compresslevel=nivel_gzip, mtime=0)
+
+
+TAMANHO_MINIMO = int(os.getenv("COMPRESSAO_MINIMO", "1024"))
+NIVEL_GZIP = int(os.getenv("COMPRESSAO_NIVEL_GZIP", "5"))
+QUALIDADE_BROTLI = int(os.getenv("COMPRESSAO_QUALIDADE_BROTLI", "4"))
+
+
+class MiddlewareCompressao:
+    """Compressão gzip/brotli negociada por Accept-Encoding.
+
+    Respostas de um só pedaço abaixo de `tamanho_minimo` e sem ETag seguem sem compressão; streams
+    (p.ex. /simulacoes/lote) são comprimidos pedaço a pedaço, sem bufferizar o corpo. O
+    ETag forte continua forte na versão comprimida, com a codificação no valor (`"x-gzip"`),
+    e o sufixo sai do If-None-Match antes de chegar à aplicação.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        tamanho_minimo: int = TAMANHO_MINIMO,
+        nivel_gzip: int = NIVEL_GZIP,
+        qualidade_brotli: int = QUALIDADE_BROTLI,
+        codificacoes: Optional[Tuple[str, ...]] = None
+    ):
+        self.app = app
+        self.tamanho_minimo = tamanho_minimo
+        self.nivel_gzip = nivel_gzip
+        self.qualidade_brotli = qualidade_brotli
+        self.codificacoes = codificacoes_disponiveis() if codificacoes is None else codificacoes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codificacao = escolher_codificacao(Headers(scope=scope).get("accept-encoding", ""), self.codificacoes)
+        if codificacao is not None:
+            scope = _sem_sufixo_if_none_match(scope, codificacao)
+
+        inicio: Optional[Message] = None
+        compressor: Optional[Compressor] = None
+
+        async def enviar(mensagem: Message) -> None:
+            nonlocal inicio, compressor
+            if mensagem["type"] == "http.response.start":
+                # Os cabeçalhos dependem do primeiro pedaço do corpo
+                inicio = mensagem
+                return
+            if mensagem["type"] != "http.response.body":
+                await send(mensagem)
+                return
+
+            corpo = mensagem.get("body", b"")
+            mais = mensagem.get("more_body", False)
+            if inicio is not None:
+                cabecalhos = MutableHeaders(raw=inicio["headers"])
+                if inicio["status"] == 304 or _tipo_comprimivel(cabecalhos):
+                    # Também sem compressão: caches compartilhados precisam saber que a resposta varia
+                    cabecalhos.add_vary_header("Accept-Encoding")
+                if codificacao is not None and self._comprimivel(inicio["status"], cabecalhos, corpo, mais):
+                    self._marcar_comprimida(cabecalhos, codificacao)
+                    if mais:
+                        compressor = self._compressor(codificacao)
+                    else:
+                        corpo = comprimir_unico(codificacao, corpo, self.nivel_gzip, self.qualidade_brotli)
+                        cabecalhos["Content-Length"] = str(len(corpo))
+                elif codificacao is not None and inicio["status"] == 304:
+                    # Mesmo validador que a resposta 200 comprimida teria
+                    _etag_codificado(cabecalhos, codificacao)
+                await send(inicio)
+                inicio = None
+
+            if compressor is not None:
+                corpo = compressor.comprimir(corpo) if corpo else b""
+                if not mais:
+                    corpo += compressor.finalizar()
+            await send({"type": "http.response.body", "body": corpo, "more_body": mais})
+
+        await self.app(scope, receive, enviar)
+
+    def _compressor(self, codificacao: str) -> Compressor:
+        if codificacao == "br":
+            return CompressorBrotli(self.qualidade_brotli)
+        return CompressorGzip(self.nivel_gzip)
+
+    def _comprimivel(self, status: int, cabecalhos: MutableHeaders, corpo: bytes, mais: bool) -> bool:
+        if status < 200 or status in (204, 304) or "content-encoding" in cabecalhos:
+            return False
+        if not _tipo_comprimivel(cabecalhos):
+            return False
+        # Com ETag comprime sempre, para que a 200 e a 304 da mesma negociação tenham o mesmo validador
+        return mais or "etag" in cabecalhos or len(corpo) >= self.tamanho_minimo
+
+    @staticmethod
+    def _marcar_comprimida(cabecalhos: MutableHeaders, codificacao: str) -> None:
+        cabecalhos["Content-Encoding"] = codificacao
+        if "content-length" in cabecalhos:
+            del cabecalhos["content-length"]
+        _etag_codificado(cabecalhos, codificacao)
+
+
+def _tipo_comprimivel(cabecalhos: MutableHeaders) -> bool:
+    return cabecalhos.get("content-type", "").startswith(TIPOS_COMPRESSIVEIS)
+
+
+def _etag_codificado(cabecalhos: MutableHeaders, codificacao: str) -> None:
+    # Bytes diferentes pedem validador forte diferente; ETags fracos valem para as duas versões
+    etag = cabecalhos.get("etag")
+    if etag and not etag.startswith("W/") and etag.endswith('"'):
+        cabecalhos["ETag"] = f'{etag[:-1]}-{codificacao}"'
+
+
+def _sem_sufixo_if_none_match(scope: Scope, codificacao: str) -> Scope:
+    """Tira do If-None-Match o sufixo que _etag_codificado pôs, para a aplicação comparar
+    com o próprio ETag. Validadores de outra codificação ficam como estão e não batem."""
+    sufixo = f'-{codificacao}"'
+    cabecalhos = []
+    alterado = False
+    for nome, valor in scope["headers"]:
+        if nome == b"if-none-match":
+            candidatos = [c.strip() for c in valor.decode("latin-1").split(",")]
+            limpos = [c[:-len(sufixo)] + '"' if c.endswith(sufixo) else c for c in candidatos]
+            if limpos != candidatos:
+                valor = ", ".join(limpos).encode("latin-1")
+                alterado = True
+        cabecalhos.append((nome, valor))
+    return {**scope, "headers": cabecalhos} if alterado else scope
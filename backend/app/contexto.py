@@ -0,0 +1,37 @@
+from typing import List, Optional
+from strawberry.dataloader import DataLoader
+from strawberry.fastapi import BaseContext
+from app.data import Catalogo
+from app.models import Estado, Fornecedor
+from app.rastreamento import span
+from app.repositorio import obter_catalogo
+
+
+class Contexto(BaseContext):
+    """Estado de uma operação GraphQL: o snapshot do catálogo e os DataLoaders.
+
+    Todos os resolvers da mesma operação enxergam a mesma versão do catálogo, e cada
+    fornecedor ou estado é buscado no máximo uma vez, em lote.
+    """
+
+    def __init__(self, catalogo: Catalogo):
+        super().__init__()
+        self.catalogo = catalogo
+        self.fornecedores: DataLoader[str, Optional[Fornecedor]] = DataLoader(
+            load_fn=self._carregar_fornecedores
+        )
+        self.estados: DataLoader[str, Optional[Estado]] = DataLoader(
+            load_fn=self._carregar_estados
+        )
+
+    async def _carregar_fornecedores(self, ids: List[str]) -> List[Optional[Fornecedor]]:
+        with span("dataloader.fornecedores", itens=len(ids)):
+            return self.catalogo.buscar_fornecedores(ids)
+
+    async def _carregar_estados(self, ufs: List[str]) -> List[Optional[Estado]]:
+        with span("dataloader.estados", itens=len(ufs)):
+            return self.catalogo.buscar_estados(ufs)
+
+
+async def get_contexto() -> Contexto:
+    return Contexto(await obter_catalogo())
@@ -0,0 +1,311 @@
+import os
+from typing import Any, Dict, Iterator, List, Mapping, NamedTuple, Optional, Sequence, Set, Tuple
+from graphql import (
+    DocumentNode, FieldNode, FragmentDefinitionNode, FragmentSpreadNode, GraphQLError, GraphQLList,
+    GraphQLNonNull, GraphQLSchema, InlineFragmentNode, OperationDefinitionNode, SelectionNode,
+    get_named_type, value_from_ast_untyped
+)
+from strawberry.extensions import SchemaExtension
+from app.data import Catalogo
+from app.models import SolucaoTipo
+
+# Limites dos resolvers, que recusam argumentos maiores
+MAX_PONTOS_CURVA = 500
+MAX_PERFIS_TARIFA = 1000
+
+
+class CustoCampo(NamedTuple):
+    """Custo de um campo raiz: `base` mais `por_item` para cada item dos argumentos de tamanho
+    (listas contam pelo comprimento, números pelo valor, como `passos`), até `max_itens`,
+    acima do qual o próprio resolver recusa a consulta."""
+    base: float
+    por_item: float = 0.0
+    argumentos: Tuple[str, ...] = ()
+    max_itens: Optional[float] = None
+
+
+class TamanhoLista(NamedTuple):
+    """Itens estimados de um campo lista: o tamanho dos `argumentos`, quando vierem, senão a
+    quantidade `catalogo` do catálogo ("estados", "solucoes" ou "fornecedores", por estado e
+    solução), no máximo o valor do argumento `limite`. Cada item construído custa `por_item`,
+    além dos campos que a consulta pedir dele."""
+    catalogo: str = ""
+    argumentos: Tuple[str, ...] = ()
+    limite: Optional[str] = None
+    por_item: float = 0.0
+
+
+class AnaliseCusto(NamedTuple):
+    custo: float
+    campos: float
+    profundidade: int
+    aliases: int
+    aliases_raiz: int = 0
+
+
+# Em unidades de um simularEconomia completo, aproximadas pelo tempo de execução com o
+# catálogo padrão (cada linha do lote, com a resposta, custa cerca de meia simulação)
+CUSTOS_CAMPOS: Dict[str, CustoCampo] = {
+    "estados": CustoCampo(0.5),
+    "simularEconomia": CustoCampo(1.0),
+    "simularEconomiaLote": CustoCampo(1.0, 0.5, ("entradas",)),
+    "compararEstados": CustoCampo(2.0, 0.1, ("unidades",)),
+    "curvaEconomia": CustoCampo(1.0, 0.05, ("pontos", "passos"), MAX_PONTOS_CURVA),
+    "projecaoContrato": CustoCampo(2.0),
+    "simularTarifas": CustoCampo(1.0, 0.1, ("perfis",), MAX_PERFIS_TARIFA),
+}
+CUSTO_PADRAO = CustoCampo(1.0)
+
+# Cada campo resolvido na resposta: ~1 µs, medido numa lista de 2000 fornecedores
+PESO_CAMPO = 0.001
+# Cada fornecedor da lista de um simularEconomia, carregado e convertido: ~20 µs
+PESO_FORNECEDOR = 0.02
+TAMANHO_LISTA_PADRAO = 10
+
+TAMANHOS_LISTAS: Dict[Tuple[str, str], TamanhoLista] = {
+    ("Query", "estados"): TamanhoLista("estados"),
+    ("Query", "simularEconomiaLote"): TamanhoLista(argumentos=("entradas",)),
+    ("Query", "compararEstados"): TamanhoLista("estados", ("unidades",)),
+    ("Query", "simularTarifas"): TamanhoLista(argumentos=("perfis",)),
+    ("ResultadoSimulacao", "solucoesDisponiveis"): TamanhoLista("solucoes"),
+    ("SolucaoDisponivel", "fornecedores"): TamanhoLista("fornecedores", limite="limite", por_item=PESO_FORNECEDOR),
+    ("FornecedorType", "estruturasTarifarias"): TamanhoLista("solucoes"),
+    ("ResultadoSimulacaoLote", "melhoresEconomias"): TamanhoLista("solucoes"),
+    ("CurvaEconomia", "solucoes"): TamanhoLista("solucoes"),
+    ("CurvaSolucao", "fornecedores"): TamanhoLista("fornecedores"),
+    ("ResultadoTarifa", "solucoes"): TamanhoLista("solucoes"),
+    ("TarifaSolucao", "ofertas"): TamanhoLista("fornecedores", limite="limite"),
+    ("ProjecaoContrato", "solucoes"): TamanhoLista("solucoes"),
+    ("ProjecaoSolucao", "fornecedores"): TamanhoLista("fornecedores"),
+}
+
+# ~6 s de CPU; um simularEconomiaLote de até ~9900 linhas. Arquivos maiores vão por /simulacoes/lote
+CUSTO_MAXIMO = float(os.getenv("CUSTO_MAXIMO", "5000"))
+PROFUNDIDADE_MAXIMA = int(os.getenv("CUSTO_PROFUNDIDADE_MAXIMA", "12"))
+# Campos raiz com alias: cada um é resolvido de novo, então o custo sozinho não barra o
+# leque de aliases num catálogo pequeno
+MAX_ALIASES_RAIZ = int(os.getenv("CUSTO_MAX_ALIASES_RAIZ", "50"))
+
+
+def operacao_selecionada(documento: DocumentNode, operacao: Optional[str]) -> Optional[OperationDefinitionNode]:
+    """A operação que o strawberry executa: a de nome `operacao` ou, sem nome, a primeira
+    do documento, mesmo que haja outras."""
+    operacoes = [d for d in documento.definitions if isinstance(d, OperationDefinitionNode)]
+    if not operacao:
+        return operacoes[0] if operacoes else None
+    return next((o for o in operacoes if o.name and o.name.value == operacao), None)
+
+
+def tamanho_argumentos(
+    campo: FieldNode, nomes: Sequence[str], variaveis: Optional[Mapping[str, Any]]
+) -> Optional[float]:
+    """Soma dos tamanhos dos argumentos presentes, ou None se nenhum veio."""
+    total = None
+    for argumento in campo.arguments:
+        if argumento.name.value not in nomes:
+            continue
+        valor = value_from_ast_untyped(argumento.value, variaveis)
+        if valor is None:
+            continue
+        if isinstance(valor, list):
+            tamanho = len(valor)
+        elif isinstance(valor, (int, float)) and not isinstance(valor, bool):
+            tamanho = max(valor, 0)
+        else:
+            # Um item sozinho onde se espera uma lista vale como lista de um
+            tamanho = 1
+        total = (total or 0) + tamanho
+    return total
+
+
+def quantidades_catalogo(catalogo: Optional[Catalogo]) -> Dict[str, float]:
+    if catalogo is None:
+        return {}
+    return {
+        "estados": len(catalogo.estados),
+        "solucoes": len(SolucaoTipo),
+        "fornecedores": catalogo.max_fornecedores_por_solucao,
+    }
+
+
+def _eh_lista(tipo: Any) -> bool:
+    while isinstance(tipo, GraphQLNonNull):
+        tipo = tipo.of_type
+    return isinstance(tipo, GraphQLList)
+
+
+class _Analise:
+    """Percorre a operação multiplicando cada campo pelos itens das listas que o contêm.
+
+    Aliases e fragmentos repetidos contam a cada ocorrência, porque cada um é resolvido de
+    novo. Campos de introspecção (`__schema`, `__typename`) não entram.
+    """
+
+    def __init__(
+        self,
+        schema: GraphQLSchema,
+        fragmentos: Dict[str, FragmentDefinitionNode],
+        variaveis: Optional[Mapping[str, Any]],
+        quantidades: Dict[str, float],
+        custos: Mapping[str, CustoCampo],
+        tamanhos: Mapping[Tuple[str, str], TamanhoLista]
+    ):
+        self.schema = schema
+        self.fragmentos = fragmentos
+        self.variaveis = variaveis
+        self.quantidades = quantidades
+        self.custos = custos
+        self.tamanhos = tamanhos
+        self.raiz = 0.0
+        self.campos = 0.0
+        self.profundidade = 0
+        self.aliases = 0
+        self.aliases_raiz = 0
+
+    def _campos(
+        self, selecoes: Sequence[SelectionNode], tipo: Any, visitados: Set[str]
+    ) -> Iterator[Tuple[FieldNode, Any]]:
+        """Campos da seleção com o tipo que os contém, com os fragmentos expandidos."""
+        for selecao in selecoes:
+            if isinstance(selecao, FieldNode):
+                yield selecao, tipo
+            elif isinstance(selecao, InlineFragmentNode):
+                condicao = selecao.type_condition
+                tipo_fragmento = self.schema.get_type(condicao.name.value) if condicao else tipo
+                yield from self._campos(selecao.selection_set.selections, tipo_fragmento, visitados)
+            elif isinstance(selecao, FragmentSpreadNode):
+                nome = selecao.name.value
+                fragmento = self.fragmentos.get(nome)
+                # Ciclos são erro de validação; aqui só não podem travar a análise
+                if fragmento is None or nome in visitados:
+                    continue
+                tipo_fragmento = self.schema.get_type(fragmento.type_condition.name.value)
+                yield from self._campos(fragmento.selection_set.selections, tipo_fragmento, visitados | {nome})
+
+    def percorrer(self, selecoes: Sequence[SelectionNode], tipo: Any, multiplicidade: float, nivel: int) -> None:
+        raiz = tipo is self.schema.query_type
+        for campo, tipo_pai in self._campos(selecoes, tipo, frozenset()):
+            nome = campo.name.value
+            definicao = getattr(tipo_pai, "fields", {}).get(nome)
+            if nome.startswith("__") or definicao is None:
+                continue
+            if campo.alias is not None:
+                self.aliases += 1
+                if raiz:
+                    self.aliases_raiz += 1
+            self.campos += multiplicidade
+            self.profundidade = max(self.profundidade, nivel)
+            if raiz:
+                regra = self.custos.get(nome, CUSTO_PADRAO)
+                itens = tamanho_argumentos(campo, regra.argumentos, self.variaveis) or 0
+                if regra.max_itens is not None:
+                    itens = min(itens, regra.max_itens)
+                self.raiz += regra.base + regra.por_item * itens
+            if campo.selection_set is None:
+                continue
+            itens = self._itens(tipo_pai.name, campo, multiplicidade) if _eh_lista(definicao.type) else 1
+            self.percorrer(campo.selection_set.selections, get_named_type(definicao.type), multiplicidade * itens, nivel + 1)
+
+    def _itens(self, tipo: str, campo: FieldNode, multiplicidade: float) -> float:
+        """Itens da lista, já cobrando em `raiz` os que custam para construir."""
+        regra = self.tamanhos.get((tipo, campo.name.value))
+        if regra is None:
+            return TAMANHO_LISTA_PADRAO
+        itens = tamanho_argumentos(campo, regra.argumentos, self.variaveis) if regra.argumentos else None
+        if itens is None:
+            itens = self.quantidades.get(regra.catalogo, TAMANHO_LISTA_PADRAO) if regra.catalogo else 0
+        if regra.limite:
+            limite = tamanho_argumentos(campo, (regra.limite,), self.variaveis)
+            if limite is not None:
+                itens = min(itens, limite)
+        self.raiz += regra.por_item * itens * multiplicidade
+        return itens
+
+
+def analisar_custo(
+    documento: DocumentNode,
+    schema: GraphQLSchema,
+    variaveis: Optional[Mapping[str, Any]] = None,
+    operacao: Optional[str] = None,
+    catalogo: Optional[Catalogo] = None,
+    custos: Mapping[str, CustoCampo] = CUSTOS_CAMPOS,
+    tamanhos: Mapping[Tuple[str, str], TamanhoLista] = TAMANHOS_LISTAS
+) -> AnaliseCusto:
+    """Custo estático de uma operação, antes de executá-la: o trabalho dos campos raiz mais
+    PESO_CAMPO por campo que a resposta terá. No mínimo 1."""
+    selecionada = operacao_selecionada(documento, operacao)
+    if selecionada is None or schema.query_type is None:
+        return AnaliseCusto(1.0, 0.0, 0, 0)
+    fragmentos = {d.name.value: d for d in documento.definitions if isinstance(d, FragmentDefinitionNode)}
+    analise = _Analise(schema, fragmentos, variaveis, quantidades_catalogo(catalogo), custos, tamanhos)
+    analise.percorrer(selecionada.selection_set.selections, schema.query_type, 1.0, 1)
+    custo = max(analise.raiz + PESO_CAMPO * analise.campos, 1.0)
+    return AnaliseCusto(
+        round(custo, 3), analise.campos, analise.profundidade, analise.aliases, analise.aliases_raiz
+    )
+
+
+def erros_limite(
+    analise: AnaliseCusto, custo_maximo: float, profundidade_maxima: int, max_aliases_raiz: int = MAX_ALIASES_RAIZ
+) -> List[GraphQLError]:
+    erros = []
+    if analise.custo > custo_maximo:
+        erros.append(GraphQLError(
+            f"Consulta custa {analise.custo:g}, acima do limite de {custo_maximo:g}",
+            extensions={"code": "CUSTO_EXCEDIDO", "custo": analise.custo, "limite": custo_maximo}
+        ))
+    if analise.profundidade > profundidade_maxima:
+        erros.append(GraphQLError(
+            f"Consulta com profundidade {analise.profundidade}, acima do limite de {profundidade_maxima}",
+            extensions={"code": "PROFUNDIDADE_EXCEDIDA", "limite": profundidade_maxima}
+        ))
+    if analise.aliases_raiz > max_aliases_raiz:
+        erros.append(GraphQLError(
+            f"Consulta com {analise.aliases_raiz} campos raiz com alias, acima do limite de {max_aliases_raiz}",
+            extensions={"code": "ALIASES_EXCEDIDOS", "limite": max_aliases_raiz}
+        ))
+    return erros
+
+
+class LimiteCusto(SchemaExtension):
+    """Recusa na validação as operações acima de CUSTO_MAXIMO, PROFUNDIDADE_MAXIMA ou
+    MAX_ALIASES_RAIZ e informa o custo em `extensions.custo` da resposta.
+
+    Analisa a operação que o strawberry vai executar (`operation_name` do contexto de
+    execução), independente da estimativa do controle de admissão.
+    """
+
+    custo_maximo = CUSTO_MAXIMO
+    profundidade_maxima = PROFUNDIDADE_MAXIMA
+    max_aliases_raiz = MAX_ALIASES_RAIZ
+
+    def on_validate(self) -> Iterator[None]:
+        contexto = self.execution_context
+        self.analise: Optional[AnaliseCusto] = None
+        if contexto.graphql_document is not None and not contexto.errors:
+            self.analise = analisar_custo(
+                contexto.graphql_document,
+                contexto.schema._schema,
+                contexto.variables,
+                contexto.operation_name,
+                getattr(contexto.context, "catalogo", None)
+            )
+            erros = erros_limite(
+                self.analise, self.custo_maximo, self.profundidade_maxima, self.max_aliases_raiz
+            )
+            if erros:
+                # Com erros definidos o strawberry não valida nem executa
+                contexto.errors = erros
+        yield
+
+    def get_results(self) -> Dict[str, Any]:
+        analise = getattr(self, "analise", None)
+        if analise is None:
+            return {}
+        return {"custo": {
+            "total": analise.custo,
+            "limite": self.custo_maximo,
+            "campos": analise.campos,
+            "profundidade": analise.profundidade,
+            "aliases": analise.aliases,
+        }}
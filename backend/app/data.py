@@ -1,9 +1,33 @@
-from typing import List
-from app.models import Fornecedor, Estado, SolucaoTipo
+import hashlib
+import math
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+from app.models import ESTRUTURAS_POR_SOLUCAO, BandeiraTarifaria, Fornecedor, Estado, EstruturaTarifaria, SolucaoTipo
+from app.indice import EnvelopeInferior, IndicePrecoFixo, construir_indice
+
+
+# Adicionais das bandeiras tarifárias em R$/kWh
+ADICIONAIS_BANDEIRA = {
+    BandeiraTarifaria.AMARELA: 0.01885,
+    BandeiraTarifaria.VERMELHA_1: 0.04463,
+    BandeiraTarifaria.VERMELHA_2: 0.07877,
+}
 
 
 ESTADOS: List[Estado] = [
-    Estado(uf="SP", nome="São Paulo", tarifa_base_kwh=0.92),
+    Estado(
+        uf="SP",
+        nome="São Paulo",
+        tarifa_base_kwh=0.92,
+        estrutura_tarifaria=EstruturaTarifaria(
+            tarifa_ponta_kwh=1.86,
+            tarifa_fora_ponta_kwh=0.74,
+            tarifa_demanda_kw=38.5,
+            adicional_bandeira_kwh=ADICIONAIS_BANDEIRA
+        )
+    ),
     Estado(uf="RJ", nome="Rio de Janeiro", tarifa_base_kwh=0.98),
     Estado(uf="MG", nome="Minas Gerais", tarifa_base_kwh=0.87),
     Estado(uf="RS", nome="Rio Grande do Sul", tarifa_base_kwh=0.85),
@@ -33,7 +57,10 @@ FORNECEDORES: List[Fornecedor] = [
         solucoes=[SolucaoTipo.MERCADO_LIVRE],
         custo_kwh_ml=0.58,
         total_clientes=892,
-        avaliacao_media=4.5
+        avaliacao_media=4.5,
+        estruturas_tarifarias={
+            SolucaoTipo.MERCADO_LIVRE: EstruturaTarifaria(tarifa_ponta_kwh=0.81, tarifa_fora_ponta_kwh=0.53)
+        }
     ),
     Fornecedor(
         id="f3",
@@ -131,9 +158,285 @@ FORNECEDORES: List[Fornecedor] = [
 ]
 
 
+def _somente_leitura(array: np.ndarray) -> np.ndarray:
+    # O snapshot é compartilhado entre requisições (e entre workers, via fork)
+    array.flags.writeable = False
+    return array
+
+
+_SEM_PRECOS = _somente_leitura(np.empty(0, dtype=np.float64))
+
+# Colunas dos fornecedores e seus tipos numpy ("U": texto), também o formato dos snapshots (app/snapshot.py)
+COLUNAS_FORNECEDORES = {
+    "id": "U", "nome": "U", "logo": "U", "estado": "U", "solucoes": "U",
+    "custo_kwh_gd": "f8", "custo_kwh_ml": "f8", "total_clientes": "i8", "avaliacao_media": "f8",
+}
+
+
+def _opcional(valor: float) -> Optional[float]:
+    return None if math.isnan(valor) else valor
+
+
+class FornecedoresColunares(Sequence[Fornecedor]):
+    """Fornecedores guardados em colunas numpy; o modelo de uma linha só é montado quando ela é lida.
+
+    O Catalogo constrói seus índices direto das colunas, então um snapshot mapeado em memória
+    não cria um Fornecedor por linha na carga. `solucoes` é o texto "GD|Mercado Livre" e os
+    custos ausentes são NaN.
+    """
+
+    def __init__(
+        self, colunas: Dict[str, np.ndarray],
+        estruturas: Optional[Dict[str, Dict[SolucaoTipo, EstruturaTarifaria]]] = None
+    ):
+        self.colunas = colunas
+        self.estruturas = estruturas or {}
+        self._modelos: List[Optional[Fornecedor]] = [None] * len(colunas["id"])
+
+    @classmethod
+    def de_modelos(cls, fornecedores: Iterable[Fornecedor]) -> "FornecedoresColunares":
+        fornecedores = list(fornecedores)
+        valores = {
+            "id": [f.id for f in fornecedores],
+            "nome": [f.nome for f in fornecedores],
+            "logo": [f.logo for f in fornecedores],
+            "estado": [f.estado for f in fornecedores],
+            "solucoes": ["|".join(s.value for s in f.solucoes) for f in fornecedores],
+            "custo_kwh_gd": [math.nan if f.custo_kwh_gd is None else f.custo_kwh_gd for f in fornecedores],
+            "custo_kwh_ml": [math.nan if f.custo_kwh_ml is None else f.custo_kwh_ml for f in fornecedores],
+            "total_clientes": [f.total_clientes for f in fornecedores],
+            "avaliacao_media": [f.avaliacao_media for f in fornecedores],
+        }
+        colunas = {
+            coluna: np.asarray(valores[coluna], dtype=str if tipo == "U" else tipo)
+            for coluna, tipo in COLUNAS_FORNECEDORES.items()
+        }
+        instancia = cls(colunas, {f.id: f.estruturas_tarifarias for f in fornecedores if f.estruturas_tarifarias})
+        instancia._modelos = fornecedores
+        return instancia
+
+    def __len__(self) -> int:
+        return len(self._modelos)
+
+    def __getitem__(self, linha):
+        if isinstance(linha, slice):
+            return tuple(self[i] for i in range(*linha.indices(len(self))))
+        modelo = self._modelos[linha]
+        if modelo is None:
+            modelo = self._modelos[linha] = self._montar(linha)
+        return modelo
+
+    def _montar(self, linha: int) -> Fornecedor:
+        # Os dados foram validados quando as colunas foram gravadas
+        c = self.colunas
+        id_ = str(c["id"][linha])
+        return Fornecedor.model_construct(
+            id=id_, nome=str(c["nome"][linha]), logo=str(c["logo"][linha]), estado=str(c["estado"][linha]),
+            solucoes=[SolucaoTipo(s) for s in str(c["solucoes"][linha]).split("|") if s],
+            custo_kwh_gd=_opcional(float(c["custo_kwh_gd"][linha])),
+            custo_kwh_ml=_opcional(float(c["custo_kwh_ml"][linha])),
+            total_clientes=int(c["total_clientes"][linha]), avaliacao_media=float(c["avaliacao_media"][linha]),
+            estruturas_tarifarias=self.estruturas.get(id_, {}),
+        )
+
+    def com_estrutura(self, solucao: SolucaoTipo) -> np.ndarray:
+        """Máscara das linhas com estrutura tarifária própria para a solução."""
+        ids = [id_ for id_, por_solucao in self.estruturas.items() if solucao in por_solucao]
+        return np.isin(self.colunas["id"], np.asarray(ids, dtype=str))
+
+    def precos(self, solucao: SolucaoTipo) -> np.ndarray:
+        """Coluna equivalente a `Fornecedor.custo_kwh(solucao)`: custo ausente vale 0."""
+        coluna = self.colunas["custo_kwh_gd" if solucao == SolucaoTipo.GD else "custo_kwh_ml"]
+        return np.nan_to_num(coluna, nan=0.0)
+
+
+class LinhasFornecedores(Sequence[Fornecedor]):
+    """Algumas linhas de FornecedoresColunares, na ordem dada."""
+
+    def __init__(self, fornecedores: FornecedoresColunares, linhas: np.ndarray):
+        self.fornecedores = fornecedores
+        self.linhas = _somente_leitura(linhas)
+
+    def __len__(self) -> int:
+        return len(self.linhas)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return tuple(self.fornecedores[linha] for linha in self.linhas[i].tolist())
+        return self.fornecedores[int(self.linhas[i])]
+
+
+def _agrupar(linhas: np.ndarray, grupos: np.ndarray, nomes: List[str]) -> Dict[str, np.ndarray]:
+    """Divide `linhas`, já ordenadas pelo grupo, em {nome do grupo: linhas}."""
+    grupos = grupos[linhas]
+    cortes = np.flatnonzero(np.diff(grupos)) + 1
+    return {
+        nomes[grupos[inicio]]: parte
+        for inicio, parte in zip(np.r_[0, cortes], np.split(linhas, cortes)) if len(parte)
+    }
+
+
+class Catalogo:
+    """Snapshot imutável de estados e fornecedores com índices construídos na carga."""
+
+    def __init__(
+        self, estados: Iterable[Estado], fornecedores: Iterable[Fornecedor] | FornecedoresColunares, versao: int = 1
+    ):
+        self.versao = versao
+        # Estruturas derivadas do snapshot (p.ex. objetos GraphQL prontos), descartadas com ele
+        self.derivados: Dict[str, Dict] = defaultdict(dict)
+        self.estados: Tuple[Estado, ...] = tuple(estados)
+        if not isinstance(fornecedores, FornecedoresColunares):
+            fornecedores = FornecedoresColunares.de_modelos(fornecedores)
+        self.fornecedores = fornecedores
+        colunas = fornecedores.colunas
+
+        self.estados_por_uf: Dict[str, Estado] = {e.uf: e for e in self.estados}
+        # Busca por id com searchsorted; em ids repetidos vale a última linha
+        self._ordem_ids = np.argsort(colunas["id"], kind="stable")
+        self._ids_ordenados = colunas["id"][self._ordem_ids]
+
+        ufs, linha_uf = np.unique(colunas["estado"], return_inverse=True)
+        ufs = ufs.tolist()
+        self.fornecedores_por_uf: Dict[str, LinhasFornecedores] = {
+            uf: LinhasFornecedores(fornecedores, linhas)
+            for uf, linhas in _agrupar(np.argsort(linha_uf, kind="stable"), linha_uf, ufs).items()
+        }
+        textos, linha_texto = np.unique(colunas["solucoes"], return_inverse=True)
+        textos = [texto.split("|") for texto in textos.tolist()]
+        self.fornecedores_por_solucao: Dict[Tuple[str, SolucaoTipo], LinhasFornecedores] = {}
+        self.fornecedores_por_custo: Dict[Tuple[str, SolucaoTipo], LinhasFornecedores] = {}
+        self.precos_por_custo: Dict[Tuple[str, SolucaoTipo], np.ndarray] = {}
+        for solucao in SolucaoTipo:
+            oferecem = [k for k, valores in enumerate(textos) if solucao.value in valores]
+            linhas = np.flatnonzero(np.isin(linha_texto, oferecem))
+            precos = fornecedores.precos(solucao)
+            na_ordem = linhas[np.argsort(linha_uf[linhas], kind="stable")]
+            # lexsort é estável: em caso de empate de preço prevalece a ordem do catálogo
+            por_custo = linhas[np.lexsort((precos[linhas], linha_uf[linhas]))]
+            for uf, grupo in _agrupar(na_ordem, linha_uf, ufs).items():
+                self.fornecedores_por_solucao[(uf, solucao)] = LinhasFornecedores(fornecedores, grupo)
+            for uf, grupo in _agrupar(por_custo, linha_uf, ufs).items():
+                self.fornecedores_por_custo[(uf, solucao)] = LinhasFornecedores(fornecedores, grupo)
+                self.precos_por_custo[(uf, solucao)] = _somente_leitura(precos[grupo])
+        # Tamanho das listas de fornecedores nas respostas, para a análise de custo (app/custo.py)
+        self.max_fornecedores_por_solucao = max(map(len, self.fornecedores_por_solucao.values()), default=0)
+        # Estados × fornecedores por solução: linhas na ordem de `estados`, colunas na ordem de
+        # custo, completadas com +inf onde o estado tem menos fornecedores
+        self.linha_por_uf: Dict[str, int] = {e.uf: i for i, e in enumerate(self.estados)}
+        self.tarifas: np.ndarray = _somente_leitura(
+            np.array([e.tarifa_base_kwh for e in self.estados], dtype=np.float64)
+        )
+        self.precos_por_estado: Dict[SolucaoTipo, np.ndarray] = {
+            solucao: _somente_leitura(self._matriz_precos(solucao)) for solucao in SolucaoTipo
+        }
+        # Hash do conteúdo: ao contrário de `versao`, que conta publicações neste processo,
+        # é igual em todos os workers que carregaram os mesmos dados
+        self.impressao = self._calcular_impressao()
+        # Sem estrutura própria a curva é o preço plano do catálogo: só os grupos com alguma
+        # estrutura montam os modelos para examinar as curvas
+        com_estrutura = {solucao: fornecedores.com_estrutura(solucao) for solucao in SolucaoTipo}
+        self.indices_melhor_oferta: Dict[Tuple[str, SolucaoTipo], IndicePrecoFixo | EnvelopeInferior] = {
+            (uf, solucao): construir_indice(lista, self.fornecedores_por_custo[(uf, solucao)], solucao)
+            if com_estrutura[solucao][lista.linhas].any()
+            else IndicePrecoFixo(self.fornecedores_por_custo[(uf, solucao)])
+            for (uf, solucao), lista in self.fornecedores_por_solucao.items()
+        }
+
+    def _calcular_impressao(self) -> str:
+        resumo = hashlib.blake2b(digest_size=16)
+        for e in self.estados:
+            resumo.update(f"{e.uf}\x1f{e.nome}\x1f{e.tarifa_base_kwh!r}\x1e".encode())
+        # As colunas têm os mesmos tipos vindas de modelos ou de um snapshot
+        for coluna in COLUNAS_FORNECEDORES:
+            array = self.fornecedores.colunas[coluna]
+            resumo.update(f"\x1e{coluna}\x1f{array.dtype.str}\x1f".encode())
+            resumo.update(np.ascontiguousarray(array).tobytes())
+        for e in self.estados:
+            if e.estrutura_tarifaria is not None:
+                resumo.update(f"{e.uf}:{e.estrutura_tarifaria.model_dump_json()}".encode())
+        for id_, estruturas in self.fornecedores.estruturas.items():
+            resumo.update(f"{id_}:{ESTRUTURAS_POR_SOLUCAO.dump_json(estruturas).decode()}".encode())
+        return resumo.hexdigest()
+
+    def _matriz_precos(self, solucao: SolucaoTipo) -> np.ndarray:
+        linhas = [self.precos_por_custo.get((e.uf, solucao), _SEM_PRECOS) for e in self.estados]
+        matriz = np.full((len(linhas), max(map(len, linhas), default=0)), np.inf)
+        for i, precos in enumerate(linhas):
+            matriz[i, :len(precos)] = precos
+        return matriz
+
+    def get_estado(self, uf: str) -> Estado | None:
+        return self.estados_por_uf.get(uf)
+
+    def get_fornecedor(self, fornecedor_id: str) -> Fornecedor | None:
+        return self.buscar_fornecedores([fornecedor_id])[0]
+
+    def buscar_estados(self, ufs: Iterable[str]) -> List[Estado | None]:
+        return [self.estados_por_uf.get(uf) for uf in ufs]
+
+    def buscar_fornecedores(self, ids: Iterable[str]) -> List[Fornecedor | None]:
+        ids = list(ids)
+        if not ids or not len(self._ids_ordenados):
+            return [None] * len(ids)
+        consulta = np.asarray(ids, dtype=str)
+        posicoes = np.searchsorted(self._ids_ordenados, consulta, side="right") - 1
+        encontrados = (posicoes >= 0) & (self._ids_ordenados[posicoes] == consulta)
+        return [
+            self.fornecedores[linha] if encontrado else None
+            for linha, encontrado in zip(self._ordem_ids[posicoes].tolist(), encontrados.tolist())
+        ]
+
+    def get_fornecedores_por_estado(self, uf: str) -> Sequence[Fornecedor]:
+        return self.fornecedores_por_uf.get(uf, ())
+
+    def get_fornecedores_por_solucao(self, uf: str, solucao: SolucaoTipo) -> Sequence[Fornecedor]:
+        return self.fornecedores_por_solucao.get((uf, solucao), ())
+
+    def get_fornecedores_por_custo(self, uf: str, solucao: SolucaoTipo) -> Sequence[Fornecedor]:
+        return self.fornecedores_por_custo.get((uf, solucao), ())
+
+    def get_melhor_fornecedor(self, uf: str, solucao: SolucaoTipo, consumo_kwh: float) -> Fornecedor | None:
+        indice = self.indices_melhor_oferta.get((uf, solucao))
+        return indice.melhor(consumo_kwh) if indice else None
+
+    def get_precos_por_custo(self, uf: str, solucao: SolucaoTipo) -> np.ndarray:
+        return self.precos_por_custo.get((uf, solucao), _SEM_PRECOS)
+
+
+_catalogo = Catalogo(ESTADOS, FORNECEDORES)
+_publicacao = threading.Lock()
+
+
+def get_catalogo() -> Catalogo:
+    return _catalogo
+
+
+def recarregar_catalogo(estados: Iterable[Estado], fornecedores: Iterable[Fornecedor]) -> Catalogo:
+    """Constrói um novo snapshot e o publica com a versão seguinte.
+
+    Quem já obteve o catálogo anterior continua com ele; caches que usam a versão na
+    chave deixam de acertar entradas antigas automaticamente.
+    """
+    return publicar_catalogo(Catalogo(estados, fornecedores))
+
+
+def publicar_catalogo(catalogo: Catalogo) -> Catalogo:
+    """Publica um snapshot já construído com a versão seguinte à do atual.
+
+    A troca é uma única atribuição: leitores nunca bloqueiam, e o lock só serializa
+    publicações concorrentes (p.ex. o vigia de snapshots e uma recarga do repositório).
+    """
+    global _catalogo
+    with _publicacao:
+        catalogo.versao = _catalogo.versao + 1
+        _catalogo = catalogo
+    return catalogo
+
+
 def get_estado(uf: str) -> Estado | None:
-    return next((e for e in ESTADOS if e.uf == uf), None)
+    return _catalogo.get_estado(uf)
 
 
-def get_fornecedores_por_estado(uf: str) -> List[Fornecedor]:
-    return [f for f in FORNECEDORES if f.estado == uf]
\ No newline at end of file
+def get_fornecedores_por_estado(uf: str) -> Sequence[Fornecedor]:
+    return _catalogo.get_fornecedores_por_estado(uf)
@@ -0,0 +1,382 @@
+import asyncio
+import codecs
+import csv
+import json
+import math
+import os
+import secrets
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import anyio
+from fastapi import APIRouter, HTTPException, Query, Request
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+from app.data import Catalogo
+from app.metricas import metricas
+from app.models import SimulacaoLote, SolucaoTipo
+from app.repositorio import obter_catalogo
+from app.schema import calcular_economia_lote
+from app.serializacao import serializar_json
+
+
+LOTE_LINHAS = int(os.getenv("EXPORTACAO_LOTE", "5000"))
+MAX_EXPORTACOES_REGISTRADAS = 100
+
+PREFIXOS = {SolucaoTipo.GD: "gd", SolucaoTipo.MERCADO_LIVRE: "ml"}
+COLUNAS_CSV = ["cliente_id", "uf", "consumo_kwh", "custo_atual_mensal", "custo_atual_anual"] + [
+    f"{prefixo}_{campo}"
+    for prefixo in PREFIXOS.values()
+    for campo in (
+        "fornecedor_id", "fornecedor_nome", "custo_com_fornecedor",
+        "economia_mensal", "economia_percentual", "economia_anual",
+    )
+] + ["erro"]
+
+# (cliente_id, uf, consumo_kwh, erro de leitura)
+Linha = Tuple[Optional[str], Optional[str], Optional[float], Optional[str]]
+
+
+class Progresso:
+    def __init__(self, formato: str):
+        self.id = secrets.token_hex(8)
+        self.formato = formato
+        self.estado = "em_andamento"
+        self.linhas_lidas = 0
+        self.linhas_processadas = 0
+        self.erros = 0
+        self.bytes_recebidos = 0
+        self.inicio = time.time()
+        self.fim: Optional[float] = None
+
+    def concluir(self, estado: str) -> None:
+        self.estado = estado
+        self.fim = time.time()
+
+    def como_dict(self) -> Dict[str, Any]:
+        duracao = (self.fim or time.time()) - self.inicio
+        return {
+            "id": self.id,
+            "formato": self.formato,
+            "estado": self.estado,
+            "linhas_lidas": self.linhas_lidas,
+            "linhas_processadas": self.linhas_processadas,
+            "erros": self.erros,
+            "bytes_recebidos": self.bytes_recebidos,
+            "duracao_segundos": round(duracao, 3),
+            "linhas_por_segundo": round(self.linhas_processadas / duracao, 1) if duracao > 0 else 0.0,
+        }
+
+
+class RegistroExportacoes:
+    """Progresso das exportações recentes, para consulta enquanto o stream está aberto."""
+
+    def __init__(self, tamanho_maximo: int = MAX_EXPORTACOES_REGISTRADAS):
+        self.tamanho_maximo = tamanho_maximo
+        self._exportacoes: "OrderedDict[str, Progresso]" = OrderedDict()
+
+    def criar(self, formato: str) -> Progresso:
+        progresso = Progresso(formato)
+        self._exportacoes[progresso.id] = progresso
+        while len(self._exportacoes) > self.tamanho_maximo:
+            self._exportacoes.popitem(last=False)
+        return progresso
+
+    def buscar(self, exportacao_id: str) -> Optional[Progresso]:
+        return self._exportacoes.get(exportacao_id)
+
+
+registro_exportacoes = RegistroExportacoes()
+
+
+class CorpoRequisicao:
+    """Único consumidor de `receive`: entrega o corpo em blocos e depois espera a desconexão.
+
+    O StreamingResponse padrão escuta `receive` em paralelo desde o início, o que roubaria
+    blocos do upload; aqui a escuta só começa quando o corpo terminou de ser lido.
+    """
+
+    def __init__(self, receive: Receive):
+        self._receive = receive
+        self.lido = asyncio.Event()
+        self.desconectado = False
+
+    async def blocos(self) -> AsyncIterator[bytes]:
+        try:
+            while True:
+                mensagem = await self._receive()
+                if mensagem["type"] == "http.disconnect":
+                    self.desconectado = True
+                    raise ClientDisconnect()
+                if mensagem.get("body"):
+                    yield mensagem["body"]
+                if not mensagem.get("more_body", False):
+                    return
+        finally:
+            self.lido.set()
+
+    async def aguardar_desconexao(self) -> None:
+        await self.lido.wait()
+        while not self.desconectado:
+            if (await self._receive())["type"] == "http.disconnect":
+                self.desconectado = True
+
+
+class RespostaExportacao(StreamingResponse):
+    def __init__(self, conteudo: AsyncIterator[bytes], corpo: CorpoRequisicao, **kwargs: Any):
+        super().__init__(conteudo, **kwargs)
+        self.corpo = corpo
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        async with anyio.create_task_group() as grupo:
+            async def transmitir() -> None:
+                await self.stream_response(send)
+                grupo.cancel_scope.cancel()
+
+            grupo.start_soon(transmitir)
+            await self.corpo.aguardar_desconexao()
+            grupo.cancel_scope.cancel()
+        # Em caso de desconexão o gerador fica suspenso; fechá-lo registra o cancelamento já
+        await self.body_iterator.aclose()
+
+
+async def ler_linhas(blocos: AsyncIterator[bytes], progresso: Progresso) -> AsyncIterator[str]:
+    decodificador = codecs.getincrementaldecoder("utf-8-sig")()
+    resto = ""
+    async for bloco in blocos:
+        progresso.bytes_recebidos += len(bloco)
+        partes = (resto + decodificador.decode(bloco)).split("\n")
+        resto = partes.pop()
+        for parte in partes:
+            yield parte.rstrip("\r")
+    resto += decodificador.decode(b"", final=True)
+    if resto:
+        yield resto.rstrip("\r")
+
+
+def _normalizar(cliente_id: Any, uf: Any, consumo: Any) -> Linha:
+    cliente_id = None if cliente_id in (None, "") else str(cliente_id)
+    if not uf:
+        return cliente_id, None, None, "UF ausente"
+    try:
+        consumo_kwh = float(consumo)
+    except (TypeError, ValueError):
+        consumo_kwh = math.nan
+    if not math.isfinite(consumo_kwh):
+        return cliente_id, str(uf), None, f"Consumo inválido: {consumo!r}"
+    return cliente_id, str(uf).strip().upper(), consumo_kwh, None
+
+
+async def ler_csv(linhas: AsyncIterator[str]) -> AsyncIterator[Linha]:
+    """CSV com cabeçalho (uf, consumo_kwh e, opcionalmente, cliente_id), separado por vírgula ou ponto e vírgula."""
+    cabecalho: Optional[List[str]] = None
+    delimitador = ","
+    async for linha in linhas:
+        if not linha.strip():
+            continue
+        if cabecalho is None:
+            delimitador = ";" if linha.count(";") > linha.count(",") else ","
+            cabecalho = [c.strip().lower() for c in next(csv.reader([linha], delimiter=delimitador))]
+            if "uf" not in cabecalho or "consumo_kwh" not in cabecalho:
+                raise ValueError("O CSV precisa das colunas uf e consumo_kwh")
+            i_uf, i_consumo = cabecalho.index("uf"), cabecalho.index("consumo_kwh")
+            i_id = next((cabecalho.index(c) for c in ("cliente_id", "id") if c in cabecalho), None)
+            continue
+        # O csv.reader só é necessário quando há aspas
+        valores = next(csv.reader([linha], delimiter=delimitador)) if '"' in linha else linha.split(delimitador)
+        if len(valores) <= max(i_uf, i_consumo):
+            yield None, None, None, "Linha com colunas faltando"
+            continue
+        cliente_id = valores[i_id].strip() if i_id is not None and i_id < len(valores) else None
+        yield _normalizar(cliente_id, valores[i_uf].strip(), valores[i_consumo].strip())
+
+
+async def ler_ndjson(linhas: AsyncIterator[str]) -> AsyncIterator[Linha]:
+    async for linha in linhas:
+        if not linha.strip():
+            continue
+        try:
+            registro = json.loads(linha)
+        except ValueError as erro:
+            yield None, None, None, f"JSON inválido: {erro}"
+            continue
+        if not isinstance(registro, dict):
+            yield None, None, None, "Cada linha deve ser um objeto JSON"
+            continue
+        consumo = registro.get("consumo_kwh", registro.get("consumoKwh"))
+        yield _normalizar(registro.get("cliente_id", registro.get("id")), registro.get("uf"), consumo)
+
+
+def _erro_simulacao(catalogo: Catalogo, uf: str, consumo_kwh: float) -> str:
+    if consumo_kwh <= 0:
+        return "Consumo deve ser maior que zero"
+    if catalogo.get_estado(uf) is None:
+        return f"Estado não encontrado: {uf}"
+    return f"Nenhum fornecedor disponível em {uf}"
+
+
+def _registro(linha: Linha, resultado: Optional[SimulacaoLote], erro: Optional[str]) -> Dict[str, Any]:
+    cliente_id, uf, consumo_kwh, _ = linha
+    registro: Dict[str, Any] = {"cliente_id": cliente_id, "uf": uf, "consumo_kwh": consumo_kwh}
+    if resultado is None:
+        registro["erro"] = erro
+        return registro
+    registro["custo_atual_mensal"] = round(resultado.custo_atual_mensal, 2)
+    registro["custo_atual_anual"] = round(resultado.custo_atual_anual, 2)
+    registro["economias"] = [
+        {
+            "solucao": economia.solucao.value,
+            "fornecedor_id": economia.fornecedor.id,
+            "fornecedor_nome": economia.fornecedor.nome,
+            "custo_com_fornecedor": round(economia.custo_com_fornecedor, 2),
+            "economia_mensal": round(economia.economia_mensal, 2),
+            "economia_percentual": round(economia.economia_percentual, 2),
+            "economia_anual": round(economia.economia_anual, 2),
+        }
+        for economia in resultado.melhores_economias
+    ]
+    return registro
+
+
+_SOLUCAO_VAZIA = "," * 5
+
+
+def _campo_csv(valor: Any) -> str:
+    if valor is None:
+        return ""
+    texto = str(valor)
+    if "," in texto or '"' in texto or "\n" in texto or "\r" in texto:
+        return '"' + texto.replace('"', '""') + '"'
+    return texto
+
+
+@lru_cache(maxsize=4096)
+def _fornecedor_csv(fornecedor_id: str, nome: str) -> str:
+    return f"{_campo_csv(fornecedor_id)},{_campo_csv(nome)}"
+
+
+def _linha_csv(linha: Linha, resultado: Optional[SimulacaoLote], erro: Optional[str]) -> str:
+    # Montada à mão (e não com csv.writer) porque domina o tempo das exportações grandes;
+    # valores monetários saem com duas casas, o mesmo arredondamento de round(x, 2)
+    cliente_id, uf, consumo_kwh, _ = linha
+    inicio = f"{_campo_csv(cliente_id)},{_campo_csv(uf)},{_campo_csv(consumo_kwh)}"
+    if resultado is None:
+        return f"{inicio},,,{','.join([_SOLUCAO_VAZIA] * len(PREFIXOS))},{_campo_csv(erro)}\n"
+    partes = [inicio, f"{resultado.custo_atual_mensal:.2f}", f"{resultado.custo_atual_anual:.2f}"]
+    por_solucao = {economia.solucao: economia for economia in resultado.melhores_economias}
+    for solucao in PREFIXOS:
+        economia = por_solucao.get(solucao)
+        if economia is None:
+            partes.append(_SOLUCAO_VAZIA)
+            continue
+        partes.append(
+            f"{_fornecedor_csv(economia.fornecedor.id, economia.fornecedor.nome)},{economia.custo_com_fornecedor:.2f},{economia.economia_mensal:.2f},"
+            f"{economia.economia_percentual:.2f},{economia.economia_anual:.2f}"
+        )
+    partes.append("\n")
+    return ",".join(partes)
+
+
+def processar_lote(lote: List[Linha], catalogo: Catalogo, formato: str) -> Tuple[bytes, int]:
+    """Calcula e formata um lote; devolve os bytes UTF-8 e o número de linhas com erro."""
+    validas = [(uf, consumo) for _, uf, consumo, erro in lote if erro is None]
+    resultados = iter(calcular_economia_lote(validas, catalogo) if validas else [])
+    montar = _registro if formato == "ndjson" else _linha_csv
+    saidas = []
+    erros = 0
+    for linha in lote:
+        erro = linha[3]
+        resultado = None
+        if erro is None:
+            resultado = next(resultados)
+            if resultado is None:
+                erro = _erro_simulacao(catalogo, linha[1], linha[2])
+        if erro is not None:
+            erros += 1
+        saidas.append(montar(linha, resultado, erro))
+
+    if formato == "ndjson":
+        return b"".join(serializar_json(r) + b"\n" for r in saidas), erros
+    return "".join(saidas).encode("utf-8"), erros
+
+
+async def simular_stream(
+    linhas: AsyncIterator[Linha], catalogo: Catalogo, formato: str, progresso: Progresso,
+    tamanho_lote: int = LOTE_LINHAS
+) -> AsyncIterator[bytes]:
+    """Lê, calcula e emite em lotes de `tamanho_lote` linhas: a memória não cresce com o arquivo."""
+
+    async def processar(lote: List[Linha]) -> bytes:
+        # Cálculo e formatação fora do event loop, que continua atendendo outras requisições
+        saida, erros = await asyncio.to_thread(processar_lote, lote, catalogo, formato)
+        progresso.erros += erros
+        progresso.linhas_processadas += len(lote)
+        metricas.incrementar("exportacao_linhas_total", len(lote), "Linhas processadas pela exportação em lote")
+        return saida
+
+    if formato == "csv":
+        yield (",".join(COLUNAS_CSV) + "\n").encode("utf-8")
+    lote: List[Linha] = []
+    async for linha in linhas:
+        progresso.linhas_lidas += 1
+        lote.append(linha)
+        if len(lote) >= tamanho_lote:
+            yield await processar(lote)
+            lote = []
+    if lote:
+        yield await processar(lote)
+
+
+router = APIRouter(prefix="/simulacoes", tags=["simulações em lote"])
+
+
+def _formato_entrada(content_type: str) -> str:
+    if "csv" in content_type:
+        return "csv"
+    if "json" in content_type:
+        return "ndjson"
+    raise HTTPException(status_code=415, detail="Envie text/csv ou application/x-ndjson")
+
+
+@router.post("/lote")
+async def exportar_lote(request: Request, formato: Optional[str] = Query(None, pattern="^(ndjson|csv)$")):
+    """Simula um arquivo de clientes enviado no corpo (CSV ou NDJSON) e devolve o resultado em stream."""
+    entrada = _formato_entrada(request.headers.get("content-type", ""))
+    formato = formato or ("csv" if "text/csv" in request.headers.get("accept", "") else "ndjson")
+    catalogo = await obter_catalogo()
+    progresso = registro_exportacoes.criar(formato)
+    corpo = CorpoRequisicao(request.receive)
+    linhas = ler_linhas(corpo.blocos(), progresso)
+    registros = ler_csv(linhas) if entrada == "csv" else ler_ndjson(linhas)
+
+    async def conteudo() -> AsyncIterator[bytes]:
+        estado = "cancelada"
+        try:
+            async for parte in simular_stream(registros, catalogo, formato, progresso, LOTE_LINHAS):
+                yield parte
+            estado = "concluida"
+        except ClientDisconnect:
+            return
+        except ValueError as erro:
+            # Cabeçalho já enviado: o erro vai como última linha do stream
+            estado = "falhou"
+            yield serializar_json({"erro": str(erro)}) + b"\n" if formato == "ndjson" else f"# erro: {erro}\n".encode("utf-8")
+        finally:
+            progresso.concluir(estado)
+            metricas.incrementar("exportacao_total", 1, "Exportações em lote por estado final", estado=estado)
+
+    return RespostaExportacao(
+        conteudo(), corpo,
+        media_type="text/csv; charset=utf-8" if formato == "csv" else "application/x-ndjson",
+        headers={"X-Exportacao-Id": progresso.id, "X-Catalogo-Versao": str(catalogo.versao)},
+    )
+
+
+@router.get("/lote/{exportacao_id}")
+async def progresso_lote(exportacao_id: str):
+    progresso = registro_exportacoes.buscar(exportacao_id)
+    if progresso is None:
+        raise HTTPException(status_code=404, detail="Exportação não encontrada")
+    return progresso.como_dict()
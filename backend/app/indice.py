@@ -0,0 +1,120 @@
+import math
+from bisect import bisect_right
+from typing import List, Sequence, Tuple
+from app.models import Fornecedor, SegmentoCusto, SolucaoTipo
+
+
+Reta = Tuple[float, float, int]
+
+
+def custo_curva(curva: Sequence[SegmentoCusto], consumo_kwh: float) -> float:
+    inicios = [s.inicio_kwh for s in curva]
+    segmento = curva[max(0, bisect_right(inicios, consumo_kwh) - 1)]
+    return segmento.fixo + segmento.preco_kwh * consumo_kwh
+
+
+# Envoltória como trechos: cada reta vence de `inicios[k]` até `inicios[k + 1]`
+Envoltoria = Tuple[List[float], List[Reta]]
+
+
+def _valor(reta: Reta, x: float) -> Tuple[float, float, int]:
+    # Empate no custo: vence quem fica mais barato depois de x, e então o menor índice (ordem do catálogo)
+    return reta[0] + reta[1] * x, reta[1], reta[2]
+
+
+def _envoltoria_curva(curva: Sequence[SegmentoCusto], indice: int) -> Envoltoria:
+    inicios: List[float] = []
+    retas: List[Reta] = []
+    for segmento in curva:
+        # O primeiro trecho também vale antes do seu início, como em custo_curva
+        inicio = segmento.inicio_kwh if inicios else 0.0
+        reta = (segmento.fixo, segmento.preco_kwh, indice)
+        if inicios and inicios[-1] == inicio:
+            retas[-1] = reta
+        else:
+            inicios.append(inicio)
+            retas.append(reta)
+    return inicios, retas
+
+
+def _intersecao(r1: Reta, r2: Reta) -> float:
+    return (r2[0] - r1[0]) / (r1[1] - r2[1])
+
+
+def _mesclar(a: Envoltoria, b: Envoltoria) -> Envoltoria:
+    """Mínimo de duas envoltórias em O(|a| + |b|): em cada intervalo entre inícios
+    consecutivos há uma reta de cada lado, que se cruzam no máximo uma vez."""
+    inicios: List[float] = []
+    retas: List[Reta] = []
+
+    def emitir(x: float, reta: Reta) -> None:
+        if retas and retas[-1] == reta:
+            return
+        if inicios and inicios[-1] == x:
+            retas.pop()
+            inicios.pop()
+            if retas and retas[-1] == reta:
+                return
+        inicios.append(x)
+        retas.append(reta)
+
+    (inicios_a, retas_a), (inicios_b, retas_b) = a, b
+    i = j = 0
+    x = 0.0
+    while True:
+        proximo_a = inicios_a[i + 1] if i + 1 < len(inicios_a) else math.inf
+        proximo_b = inicios_b[j + 1] if j + 1 < len(inicios_b) else math.inf
+        fim = min(proximo_a, proximo_b)
+        vencedora, outra = sorted((retas_a[i], retas_b[j]), key=lambda r: _valor(r, x))
+        emitir(x, vencedora)
+        if outra[1] < vencedora[1]:
+            corte = _intersecao(vencedora, outra)
+            if x < corte < fim:
+                emitir(corte, outra)
+        if fim == math.inf:
+            return inicios, retas
+        i += proximo_a == fim
+        j += proximo_b == fim
+        x = fim
+
+
+class IndicePrecoFixo:
+    """Com preço fixo por kWh o vencedor não depende do consumo: basta o argmin do preço."""
+
+    def __init__(self, fornecedores_por_custo: Sequence[Fornecedor]):
+        self.fornecedores_por_custo = fornecedores_por_custo
+
+    def melhor(self, consumo_kwh: float) -> Fornecedor:
+        return self.fornecedores_por_custo[0]
+
+
+class EnvelopeInferior:
+    """Envoltória inferior das curvas de custo lineares por trechos (taxa fixa, faixas).
+
+    Construída uma vez, mesclando as curvas duas a duas (divisão e conquista, O(S log N)
+    para S trechos de N curvas); cada consulta é uma bisseção nos inícios dos trechos.
+    """
+
+    def __init__(self, fornecedores: Sequence[Fornecedor], solucao: SolucaoTipo):
+        self.fornecedores = tuple(fornecedores)
+        envoltorias = [_envoltoria_curva(f.curva_custo(solucao), i) for i, f in enumerate(self.fornecedores)]
+        while len(envoltorias) > 1:
+            envoltorias = [
+                _mesclar(envoltorias[k], envoltorias[k + 1]) if k + 1 < len(envoltorias) else envoltorias[k]
+                for k in range(0, len(envoltorias), 2)
+            ]
+        self.inicios, self.retas = envoltorias[0] if envoltorias else ([0.0], [])
+
+    def melhor(self, consumo_kwh: float) -> Fornecedor:
+        return self.fornecedores[self.retas[max(0, bisect_right(self.inicios, consumo_kwh) - 1)][2]]
+
+
+def construir_indice(
+    fornecedores: Sequence[Fornecedor],
+    fornecedores_por_custo: Sequence[Fornecedor],
+    solucao: SolucaoTipo
+) -> IndicePrecoFixo | EnvelopeInferior:
+    curvas = [f.curva_custo(solucao) for f in fornecedores]
+    if all(len(c) == 1 and c[0].fixo == 0 for c in curvas):
+        return IndicePrecoFixo(fornecedores_por_custo)
+    return EnvelopeInferior(fornecedores, solucao)
@@ -1,25 +1,54 @@
-from fastapi import FastAPI
+import asyncio
+import os
+import secrets
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from strawberry.fastapi import GraphQLRouter
+from fastapi.responses import PlainTextResponse
 from app.schema import schema
+from app.contexto import get_contexto
+from app.router import ClarkeGraphQLRouter
+from app.metricas import metricas
+from app.rastreamento import MiddlewareRastreamento, rastreador
+from app import snapshot as snapshots
+from app.exportacao import router as exportacao_router
+from app.compressao import MiddlewareCompressao
+from app.serializacao import RespostaJSON
+
+
+@asynccontextmanager
+async def ciclo_de_vida(_app: FastAPI):
+    vigia = snapshots.vigia_snapshots
+    tarefa = asyncio.create_task(vigia.executar()) if vigia else None
+    yield
+    if tarefa:
+        tarefa.cancel()
 
 
 app = FastAPI(
     title="Clarke Energia API",
     description="API GraphQL para simulação de economia de energia",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=ciclo_de_vida,
+    default_response_class=RespostaJSON
 )
 
+app.add_middleware(MiddlewareCompressao)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["traceparent", "x-trace-id", "Retry-After", "X-Exportacao-Id"],
 )
+app.add_middleware(MiddlewareRastreamento)
 
-graphql_app = GraphQLRouter(schema, graphql_ide="graphiql")
+graphql_app = ClarkeGraphQLRouter(schema, graphql_ide="graphiql", context_getter=get_contexto)
 app.include_router(graphql_app, prefix="/graphql")
+app.include_router(exportacao_router)
 
 
 @app.get("/")
@@ -33,4 +62,46 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(metricas.exportar(), media_type="text/plain; version=0.0.4")
+
+
+def exigir_token_admin(x_admin_token: Optional[str]) -> None:
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        raise HTTPException(status_code=404, detail="Rotas de administração desabilitadas (ADMIN_TOKEN)")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token.encode(), token.encode()):
+        raise HTTPException(status_code=403, detail="Token de administração inválido")
+
+
+@app.get("/debug/traces")
+async def debug_traces(limite: int = Query(20, ge=1, le=200), x_admin_token: Optional[str] = Header(None)):
+    """Requisições amostradas mais lentas entre as mantidas em memória."""
+    exigir_token_admin(x_admin_token)
+    return {
+        "amostragem": rastreador.amostragem,
+        "traces": [trace.como_dict() for trace in rastreador.memoria.mais_lentos(limite)],
+    }
+
+
+@app.post("/admin/catalogo/recarregar")
+async def recarregar_catalogo(x_admin_token: Optional[str] = Header(None)):
+    """Relê o snapshot apontado por ATUAL e o publica sem interromper requisições."""
+    vigia = snapshots.vigia_snapshots
+    if vigia is None:
+        raise HTTPException(status_code=404, detail="Recarga de snapshots não configurada")
+    exigir_token_admin(x_admin_token)
+
+    catalogo = await vigia.atualizar_async(forcar=True)
+    if catalogo is None:
+        raise HTTPException(status_code=409, detail=vigia.erro or "Nenhum snapshot ativo")
+    return {
+        "versao": catalogo.versao,
+        "snapshot": vigia.carregado.name,
+        "estados": len(catalogo.estados),
+        "fornecedores": len(catalogo.fornecedores),
+    }
@@ -0,0 +1,207 @@
+import threading
+import time
+from bisect import bisect_left
+from inspect import isawaitable
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+from graphql import GraphQLResolveInfo
+from strawberry.extensions import SchemaExtension
+from app.cache import CacheLRU
+
+
+LIMITES_PADRAO = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_SERIES_POR_METRICA = 200
+
+Rotulos = Tuple[Tuple[str, str], ...]
+
+
+class Histograma:
+    """Histograma cumulativo no formato do Prometheus, com limites fixos."""
+
+    __slots__ = ("limites", "contagens", "soma", "total")
+
+    def __init__(self, limites: Tuple[float, ...] = LIMITES_PADRAO):
+        self.limites = limites
+        self.contagens = [0] * (len(limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor: float) -> None:
+        # Sem lock: sob o GIL um incremento perdido em disputa rara é aceitável para métricas
+        self.contagens[bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+
+class RegistroMetricas:
+    def __init__(self) -> None:
+        self.histogramas: Dict[str, Dict[Rotulos, Histograma]] = {}
+        self.contadores: Dict[str, Dict[Rotulos, float]] = {}
+        self.descricoes: Dict[str, str] = {}
+        self.caches: Dict[str, CacheLRU] = {}
+        self.coletores: List[Callable[[], List[Tuple[str, str, Rotulos, float]]]] = []
+        self._lock = threading.Lock()
+
+    def _rotulos(self, serie: Dict[Rotulos, Any], rotulos: Dict[str, str]) -> Rotulos:
+        chave = tuple(sorted(rotulos.items()))
+        if chave not in serie and len(serie) >= MAX_SERIES_POR_METRICA:
+            # Protege contra explosão de cardinalidade (p.ex. nomes de operação arbitrários)
+            return tuple((k, "outras") for k, _ in chave)
+        return chave
+
+    def observar(self, nome: str, valor: float, descricao: str = "", **rotulos: str) -> None:
+        series = self.histogramas.get(nome)
+        if series is None:
+            with self._lock:
+                series = self.histogramas.setdefault(nome, {})
+                self.descricoes.setdefault(nome, descricao)
+        chave = self._rotulos(series, rotulos)
+        histograma = series.get(chave)
+        if histograma is None:
+            with self._lock:
+                histograma = series.setdefault(chave, Histograma())
+        histograma.observar(valor)
+
+    def incrementar(self, nome: str, valor: float = 1, descricao: str = "", **rotulos: str) -> None:
+        series = self.contadores.get(nome)
+        if series is None:
+            with self._lock:
+                series = self.contadores.setdefault(nome, {})
+                self.descricoes.setdefault(nome, descricao)
+        chave = self._rotulos(series, rotulos)
+        series[chave] = series.get(chave, 0) + valor
+
+    def registrar_cache(self, nome: str, cache: CacheLRU) -> None:
+        self.caches[nome] = cache
+
+    def registrar_coletor(self, coletor: Callable[[], List[Tuple[str, str, Rotulos, float]]]) -> None:
+        """Coletor chamado a cada exportação: devolve (nome, tipo, rótulos, valor)."""
+        self.coletores.append(coletor)
+
+    def exportar(self) -> str:
+        linhas: List[str] = []
+
+        for nome, series in sorted(self.histogramas.items()):
+            linhas += [f"# HELP {nome} {self.descricoes.get(nome, '')}", f"# TYPE {nome} histogram"]
+            for rotulos, histograma in sorted(series.items()):
+                acumulado = 0
+                for limite, contagem in zip(histograma.limites, histograma.contagens):
+                    acumulado += contagem
+                    linhas.append(f"{nome}_bucket{_formatar(rotulos + (('le', repr(limite)),))} {acumulado}")
+                linhas.append(f"{nome}_bucket{_formatar(rotulos + (('le', '+Inf'),))} {histograma.total}")
+                linhas.append(f"{nome}_sum{_formatar(rotulos)} {histograma.soma}")
+                linhas.append(f"{nome}_count{_formatar(rotulos)} {histograma.total}")
+
+        for nome, series in sorted(self.contadores.items()):
+            linhas += [f"# HELP {nome} {self.descricoes.get(nome, '')}", f"# TYPE {nome} counter"]
+            for rotulos, valor in sorted(series.items()):
+                linhas.append(f"{nome}{_formatar(rotulos)} {valor}")
+
+        if self.caches:
+            for nome, tipo, descricao, valor in (
+                ("cache_acertos_total", "counter", "Acertos do cache", lambda c: c.acertos),
+                ("cache_falhas_total", "counter", "Falhas do cache", lambda c: c.falhas),
+                ("cache_remocoes_total", "counter", "Itens removidos por LRU ou TTL", lambda c: c.remocoes),
+                ("cache_itens", "gauge", "Itens no cache", len),
+                ("cache_taxa_acerto", "gauge", "Acertos / consultas", lambda c: c.taxa_acerto),
+            ):
+                linhas += [f"# HELP {nome} {descricao}", f"# TYPE {nome} {tipo}"]
+                for cache_nome, cache in sorted(self.caches.items()):
+                    linhas.append(f"{nome}{_formatar((('cache', cache_nome),))} {valor(cache)}")
+
+        tipos_emitidos = set()
+        for coletor in self.coletores:
+            for nome, tipo, rotulos, valor in coletor():
+                if nome not in tipos_emitidos:
+                    linhas.append(f"# TYPE {nome} {tipo}")
+                    tipos_emitidos.add(nome)
+                linhas.append(f"{nome}{_formatar(rotulos)} {valor}")
+
+        return "\n".join(linhas) + "\n"
+
+
+def _formatar(rotulos: Rotulos) -> str:
+    if not rotulos:
+        return ""
+    pares = ",".join(
+        f'{chave}="{valor.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for chave, valor in rotulos
+    )
+    return "{" + pares + "}"
+
+
+metricas = RegistroMetricas()
+
+
+class MetricasGraphQL(SchemaExtension):
+    """Latência por fase da operação (parse, validate, execute) e por resolver, e erros.
+
+    Só resolvers próprios são medidos; campos escalares servidos pelo resolver padrão
+    passam direto, o que mantém o custo baixo mesmo com listas grandes.
+    """
+
+    _campos_com_resolver: Dict[Tuple[str, str], bool] = {}
+
+    def _operacao(self) -> str:
+        return self.execution_context.operation_name or "anonima"
+
+    def _medir(self, fase: str) -> Iterator[None]:
+        inicio = time.perf_counter()
+        yield
+        metricas.observar(
+            "graphql_fase_segundos", time.perf_counter() - inicio,
+            "Duração de cada fase da operação GraphQL", operacao=self._operacao(), fase=fase
+        )
+
+    def on_operation(self) -> Iterator[None]:
+        inicio = time.perf_counter()
+        yield
+        operacao = self._operacao()
+        metricas.observar(
+            "graphql_operacao_segundos", time.perf_counter() - inicio,
+            "Duração total da operação GraphQL", operacao=operacao
+        )
+        erros = self.execution_context.errors
+        if erros:
+            metricas.incrementar(
+                "graphql_erros_total", len(erros), "Erros retornados pelas operações GraphQL", operacao=operacao
+            )
+
+    def on_parse(self) -> Iterator[None]:
+        yield from self._medir("parse")
+
+    def on_validate(self) -> Iterator[None]:
+        yield from self._medir("validate")
+
+    def on_execute(self) -> Iterator[None]:
+        yield from self._medir("execute")
+
+    def resolve(self, _next: Callable, root: Any, info: GraphQLResolveInfo, *args: Any, **kwargs: Any) -> Any:
+        chave = (info.parent_type.name, info.field_name)
+        medir = self._campos_com_resolver.get(chave)
+        if medir is None:
+            definicao = info.parent_type.fields[info.field_name].extensions.get("strawberry-definition")
+            medir = self._campos_com_resolver[chave] = getattr(definicao, "base_resolver", None) is not None
+        if not medir:
+            return _next(root, info, *args, **kwargs)
+
+        campo = f"{chave[0]}.{chave[1]}"
+        inicio = time.perf_counter()
+        resultado = _next(root, info, *args, **kwargs)
+        if isawaitable(resultado):
+            return _aguardar(resultado, campo, inicio)
+        _observar_resolver(campo, inicio)
+        return resultado
+
+
+async def _aguardar(resultado: Any, campo: str, inicio: float) -> Any:
+    try:
+        return await resultado
+    finally:
+        _observar_resolver(campo, inicio)
+
+
+def _observar_resolver(campo: str, inicio: float) -> None:
+    metricas.observar(
+        "graphql_resolver_segundos", time.perf_counter() - inicio,
+        "Duração dos resolvers GraphQL", campo=campo
+    )
@@ -1,5 +1,6 @@
-from typing import List, Optional
-from pydantic import BaseModel, Field
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from pydantic import BaseModel, Field, TypeAdapter, model_validator
 from enum import Enum
 
 
@@ -8,6 +9,87 @@ class SolucaoTipo(str, Enum):
     MERCADO_LIVRE = "Mercado Livre"
 
 
+class SegmentoCusto(NamedTuple):
+    """Trecho linear da curva de custo: vale de `inicio_kwh` até o início do próximo trecho."""
+    inicio_kwh: float
+    fixo: float
+    preco_kwh: float
+
+
+class BandeiraTarifaria(str, Enum):
+    VERDE = "verde"
+    AMARELA = "amarela"
+    VERMELHA_1 = "vermelha_1"
+    VERMELHA_2 = "vermelha_2"
+
+
+class FaixaConsumo(BaseModel):
+    """Bloco de consumo mensal; `ate_kwh` vazio fecha a última faixa."""
+    ate_kwh: Optional[float] = Field(None, gt=0)
+    tarifa_kwh: float = Field(ge=0)
+
+
+class EstruturaTarifaria(BaseModel):
+    """Tarifa por posto horário, faixas de consumo, demanda, taxa fixa mensal e adicionais de bandeira.
+
+    Sem faixas, a energia fora de ponta usa `tarifa_fora_ponta_kwh`; com faixas, ela é
+    cobrada pelos blocos sobre o total mensal fora de ponta. A ponta vale das
+    `inicio_ponta` às `fim_ponta` horas (exclusive), só em dias úteis por padrão.
+    """
+    tarifa_fora_ponta_kwh: float = Field(ge=0)
+    tarifa_ponta_kwh: Optional[float] = Field(None, ge=0)
+    inicio_ponta: int = Field(18, ge=0, le=23)
+    fim_ponta: int = Field(21, ge=1, le=24)
+    ponta_fim_de_semana: bool = False
+    faixas: List[FaixaConsumo] = []
+    tarifa_demanda_kw: float = Field(0.0, ge=0)
+    taxa_fixa_mensal: float = Field(0.0, ge=0)
+    adicional_bandeira_kwh: Dict[BandeiraTarifaria, float] = {}
+
+    @model_validator(mode="after")
+    def _validar(self) -> "EstruturaTarifaria":
+        if self.fim_ponta <= self.inicio_ponta:
+            raise ValueError("fim_ponta deve ser maior que inicio_ponta")
+        if self.faixas:
+            limites = [f.ate_kwh for f in self.faixas[:-1]]
+            if None in limites or self.faixas[-1].ate_kwh is not None:
+                raise ValueError("Só a última faixa pode (e deve) ficar sem ate_kwh")
+            if limites != sorted(set(limites)):
+                raise ValueError("Os limites das faixas devem ser crescentes")
+        return self
+
+    @classmethod
+    def plana(cls, tarifa_kwh: float) -> "EstruturaTarifaria":
+        return cls.model_construct(tarifa_fora_ponta_kwh=tarifa_kwh)
+
+    def sem_posto_horario(self, tarifa_plana_kwh: float) -> "EstruturaTarifaria":
+        """A estrutura para consumo sem discriminação horária: sem tarifa de ponta, a energia
+        fora das faixas vale `tarifa_plana_kwh`."""
+        if self.tarifa_ponta_kwh is None:
+            return self
+        return self.model_copy(update={"tarifa_ponta_kwh": None, "tarifa_fora_ponta_kwh": tarifa_plana_kwh})
+
+    def curva_custo(self) -> Tuple[SegmentoCusto, ...]:
+        """Custo mensal pelo consumo, todo fora de ponta, sem demanda e com bandeira verde."""
+        adicional = self.adicional_bandeira_kwh.get(BandeiraTarifaria.VERDE, 0.0)
+        if not self.faixas:
+            return (SegmentoCusto(0.0, self.taxa_fixa_mensal, self.tarifa_fora_ponta_kwh + adicional),)
+        trechos = []
+        inicio = acumulado = 0.0
+        for faixa in self.faixas:
+            # Na faixa: o que as anteriores cobraram + tarifa × (consumo - início)
+            fixo = self.taxa_fixa_mensal + acumulado - inicio * faixa.tarifa_kwh
+            trechos.append(SegmentoCusto(inicio, fixo, faixa.tarifa_kwh + adicional))
+            if faixa.ate_kwh is not None:
+                acumulado += (faixa.ate_kwh - inicio) * faixa.tarifa_kwh
+                inicio = faixa.ate_kwh
+        return tuple(trechos)
+
+    @property
+    def janela_ponta(self) -> Tuple[int, int, bool]:
+        return (self.inicio_ponta, self.fim_ponta, self.ponta_fim_de_semana)
+
+
 class Fornecedor(BaseModel):
     id: str
     nome: str
@@ -18,12 +100,38 @@ class Fornecedor(BaseModel):
     custo_kwh_ml: Optional[float] = None
     total_clientes: int
     avaliacao_media: float = Field(ge=0, le=5)
+    estruturas_tarifarias: Dict[SolucaoTipo, EstruturaTarifaria] = {}
+
+    def custo_kwh(self, solucao: SolucaoTipo) -> float:
+        custo = self.custo_kwh_gd if solucao == SolucaoTipo.GD else self.custo_kwh_ml
+        return custo or 0
+
+    def estrutura_tarifaria(self, solucao: SolucaoTipo) -> EstruturaTarifaria:
+        estrutura = self.estruturas_tarifarias.get(solucao)
+        return estrutura if estrutura is not None else EstruturaTarifaria.plana(self.custo_kwh(solucao))
+
+    def curva_custo(self, solucao: SolucaoTipo) -> Tuple[SegmentoCusto, ...]:
+        estrutura = self.estruturas_tarifarias.get(solucao)
+        if estrutura is None:
+            return (SegmentoCusto(0.0, 0.0, self.custo_kwh(solucao)),)
+        # Só com o consumo mensal a ponta dá lugar ao preço plano, como nos perfis mensais (app/tarifas.py)
+        return estrutura.sem_posto_horario(self.custo_kwh(solucao)).curva_custo()
+
+
+# Serialização das estruturas por solução (coluna JSON do SQLite, manifesto dos snapshots)
+ESTRUTURAS_POR_SOLUCAO = TypeAdapter(Dict[SolucaoTipo, EstruturaTarifaria])
 
 
 class Estado(BaseModel):
     uf: str
     nome: str
     tarifa_base_kwh: float
+    estrutura_tarifaria: Optional[EstruturaTarifaria] = None
+
+    def estrutura(self) -> EstruturaTarifaria:
+        if self.estrutura_tarifaria is not None:
+            return self.estrutura_tarifaria
+        return EstruturaTarifaria.plana(self.tarifa_base_kwh)
 
 
 class EconomiaFornecedor(BaseModel):
@@ -33,4 +141,65 @@ class EconomiaFornecedor(BaseModel):
     custo_com_fornecedor: float
     economia_mensal: float
     economia_percentual: float
-    economia_anual: float
\ No newline at end of file
+    economia_anual: float
+
+
+# Tipos internos do cálculo: tuplas leves, sem validação. A validação pydantic acontece
+# na entrada dos dados (Fornecedor, Estado); daqui em diante os valores já são confiáveis.
+class EconomiaCalculada(NamedTuple):
+    fornecedor: Fornecedor
+    solucao: SolucaoTipo
+    custo_atual: float
+    custo_com_fornecedor: float
+    economia_mensal: float
+    economia_percentual: float
+    economia_anual: float
+
+
+class SimulacaoLote(NamedTuple):
+    uf: str
+    consumo_kwh: float
+    custo_atual_mensal: float
+    custo_atual_anual: float
+    melhores_economias: List[EconomiaCalculada]
+
+
+class CurvaSolucaoCalculada(NamedTuple):
+    """Preços de uma solução, na ordem de custo do catálogo, e os pontos de consumo da curva.
+
+    As linhas fornecedor × pontos são calculadas quando pedidas, sem montar a matriz inteira.
+    """
+    solucao: SolucaoTipo
+    fornecedores: Sequence[Fornecedor]
+    precos: np.ndarray
+    consumos: np.ndarray
+    custo_atual: np.ndarray
+
+
+class ConsumoMensal(NamedTuple):
+    """Perfis de carga agregados por mês (matrizes perfis × 12) para uma janela de ponta."""
+    energia_ponta: np.ndarray
+    energia_fora_ponta: np.ndarray
+    demanda_kw: np.ndarray
+
+
+class TarifacaoSolucao(NamedTuple):
+    """Custos fornecedores × perfis × meses de uma solução, na ordem de custo do catálogo."""
+    solucao: SolucaoTipo
+    fornecedores: Sequence[Fornecedor]
+    custo_mensal: np.ndarray
+    economia_anual: np.ndarray
+
+
+class ProjecaoSolucaoCalculada(NamedTuple):
+    """Matrizes fornecedores × meses do contrato de uma solução, na ordem de custo do catálogo.
+
+    `payback_meses` é -1 para quem não recupera o custo de migração dentro do prazo.
+    """
+    solucao: SolucaoTipo
+    fornecedores: Sequence[Fornecedor]
+    custo_mensal: np.ndarray
+    economia_mensal: np.ndarray
+    economia_acumulada: np.ndarray
+    payback_meses: np.ndarray
+    vpl: np.ndarray
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+from typing import Dict, Iterator, Optional
+from strawberry.extensions import SchemaExtension
+from app.cache import CacheLRU
+
+
+def hash_consulta(consulta: str) -> str:
+    return hashlib.sha256(consulta.encode("utf-8")).hexdigest()
+
+
+class ErroConsultaPersistida(Exception):
+    def __init__(self, mensagem: str, codigo: str):
+        super().__init__(mensagem)
+        self.mensagem = mensagem
+        self.codigo = codigo
+
+
+class RegistroConsultas:
+    """Automatic Persisted Queries: documentos conhecidos, indexados pelo sha256 do texto.
+
+    No modo normal o cliente registra uma consulta enviando hash e texto juntos depois de
+    receber PersistedQueryNotFound. No modo lista de permissão apenas os documentos
+    carregados de antemão são aceitos, com ou sem hash, e nenhum registro novo é feito.
+    """
+
+    def __init__(
+        self,
+        consultas: Optional[Dict[str, str]] = None,
+        somente_lista: bool = False,
+        tamanho_maximo: int = 10_000
+    ):
+        self.somente_lista = somente_lista
+        self.fixas: Dict[str, str] = {}
+        self.registradas = CacheLRU(tamanho_maximo=tamanho_maximo, ttl_segundos=None)
+        for consulta in (consultas or {}).values():
+            self.fixas[hash_consulta(consulta)] = consulta
+
+    @classmethod
+    def de_arquivo(cls, caminho: str, **kwargs) -> "RegistroConsultas":
+        """Carrega um JSON {sha256: consulta} ou uma lista de consultas."""
+        with open(caminho, encoding="utf-8") as arquivo:
+            dados = json.load(arquivo)
+        consultas = dados if isinstance(dados, dict) else {str(i): c for i, c in enumerate(dados)}
+        return cls(consultas, **kwargs)
+
+    def buscar(self, hash_sha256: str) -> Optional[str]:
+        return self.fixas.get(hash_sha256) or self.registradas.get(hash_sha256)
+
+    def registrar(self, hash_sha256: str, consulta: str) -> None:
+        if hash_consulta(consulta) != hash_sha256:
+            raise ErroConsultaPersistida("provided sha does not match query", "PERSISTED_QUERY_HASH_MISMATCH")
+        if hash_sha256 in self.fixas:
+            return
+        if self.somente_lista:
+            raise ErroConsultaPersistida("PersistedQueryNotAllowed", "PERSISTED_QUERY_NOT_ALLOWED")
+        self.registradas.set(hash_sha256, consulta)
+
+    def resolver(self, dados: dict) -> dict:
+        """Completa `query` a partir de extensions.persistedQuery e aplica a lista de permissão."""
+        extensoes = dados.get("extensions") or {}
+        if isinstance(extensoes, str):
+            extensoes = json.loads(extensoes)
+        persistida = extensoes.get("persistedQuery")
+        consulta = dados.get("query")
+
+        if not persistida:
+            if consulta and self.somente_lista and hash_consulta(consulta) not in self.fixas:
+                raise ErroConsultaPersistida("PersistedQueryNotAllowed", "PERSISTED_QUERY_NOT_ALLOWED")
+            return dados
+
+        if persistida.get("version") != 1:
+            raise ErroConsultaPersistida("Unsupported persisted query version", "PERSISTED_QUERY_NOT_SUPPORTED")
+        hash_sha256 = persistida.get("sha256Hash", "")
+
+        if consulta:
+            self.registrar(hash_sha256, consulta)
+            return dados
+
+        consulta = self.buscar(hash_sha256)
+        if consulta is None:
+            raise ErroConsultaPersistida("PersistedQueryNotFound", "PERSISTED_QUERY_NOT_FOUND")
+        return {**dados, "query": consulta}
+
+
+def criar_registro_padrao() -> RegistroConsultas:
+    somente_lista = os.getenv("APQ_SOMENTE_LISTA", "0") == "1"
+    tamanho_maximo = int(os.getenv("APQ_TAMANHO", "10000"))
+    caminho = os.getenv("APQ_LISTA")
+    if caminho:
+        return RegistroConsultas.de_arquivo(caminho, somente_lista=somente_lista, tamanho_maximo=tamanho_maximo)
+    return RegistroConsultas(somente_lista=somente_lista, tamanho_maximo=tamanho_maximo)
+
+
+cache_documentos = CacheLRU(
+    tamanho_maximo=int(os.getenv("DOCUMENTOS_CACHE_TAMANHO", "512")),
+    ttl_segundos=None
+)
+
+
+class CacheDocumentos(SchemaExtension):
+    """Reaproveita o documento já analisado e validado de uma consulta, pelo hash do texto.
+
+    Documentos que falham na validação não entram no cache.
+    """
+
+    def on_parse(self) -> Iterator[None]:
+        contexto = self.execution_context
+        self.chave = hash_consulta(contexto.query) if contexto.query else None
+        self.documento = cache_documentos.get(self.chave) if self.chave else None
+        if self.documento is not None:
+            contexto.graphql_document = self.documento
+        yield
+
+    def on_validate(self) -> Iterator[None]:
+        contexto = self.execution_context
+        if self.documento is not None:
+            # Validação já feita para este documento: errors vazio faz o strawberry pulá-la
+            contexto.errors = []
+            yield
+            return
+        yield
+        if self.chave and not contexto.errors and contexto.graphql_document is not None:
+            cache_documentos.set(self.chave, contexto.graphql_document)
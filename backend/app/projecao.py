@@ -0,0 +1,83 @@
+from typing import List, NamedTuple, Optional, Tuple
+import numpy as np
+from app.data import Catalogo
+from app.models import ProjecaoSolucaoCalculada, SolucaoTipo
+
+MESES_POR_ANO = 12
+MAX_ANOS_PROJECAO = 30
+
+
+class CenarioContrato(NamedTuple):
+    """Taxas anuais em percentual. Os reajustes incidem a cada aniversário do contrato."""
+    anos: int
+    reajuste_tarifa_percentual: float = 0.0
+    reajuste_contrato_percentual: float = 0.0
+    taxa_desconto_percentual: float = 0.0
+    custo_migracao: float = 0.0
+
+
+def validar_cenario(cenario: CenarioContrato) -> None:
+    if not 1 <= cenario.anos <= MAX_ANOS_PROJECAO:
+        raise ValueError(f"anos deve estar entre 1 e {MAX_ANOS_PROJECAO}")
+    taxas = (
+        cenario.reajuste_tarifa_percentual, cenario.reajuste_contrato_percentual, cenario.taxa_desconto_percentual
+    )
+    if not all(np.isfinite(taxas)) or min(taxas) <= -100:
+        raise ValueError("As taxas devem ser números finitos maiores que -100%")
+    if not np.isfinite(cenario.custo_migracao) or cenario.custo_migracao < 0:
+        raise ValueError("custoMigracao não pode ser negativo")
+
+
+def fatores_reajuste(percentual: float, meses: int) -> np.ndarray:
+    """Fator acumulado de cada mês: constante dentro do ano, composto a cada aniversário."""
+    return (1 + percentual / 100) ** (np.arange(meses) // MESES_POR_ANO)
+
+
+def fatores_desconto(percentual: float, meses: int) -> np.ndarray:
+    """Valor presente de cada mês, com a taxa anual convertida na mensal equivalente."""
+    return (1 + percentual / 100) ** (-np.arange(1, meses + 1) / MESES_POR_ANO)
+
+
+def projetar_contrato(
+    uf: str, consumo_kwh: float, cenario: CenarioContrato, catalogo: Catalogo
+) -> Optional[Tuple[np.ndarray, List[ProjecaoSolucaoCalculada]]]:
+    """Custo atual por mês e, por solução, as matrizes fornecedores × meses do contrato."""
+    validar_cenario(cenario)
+    if consumo_kwh <= 0:
+        return None
+    estado = catalogo.get_estado(uf)
+    if not estado or not catalogo.get_fornecedores_por_estado(uf):
+        return None
+
+    meses = cenario.anos * MESES_POR_ANO
+    # Sem reajuste os fatores são 1.0 e os valores do primeiro ano coincidem com simularEconomia
+    custo_atual = consumo_kwh * estado.tarifa_base_kwh * fatores_reajuste(cenario.reajuste_tarifa_percentual, meses)
+    reajuste_contrato = fatores_reajuste(cenario.reajuste_contrato_percentual, meses)
+    desconto = fatores_desconto(cenario.taxa_desconto_percentual, meses)
+
+    # Por linearidade, acumulados e VPL saem das somas dos fatores, sem varrer a matriz de novo
+    atual_acumulado = np.cumsum(custo_atual)
+    reajuste_acumulado = np.cumsum(reajuste_contrato)
+    atual_presente = custo_atual @ desconto
+    reajuste_presente = reajuste_contrato @ desconto
+
+    projecoes = []
+    for solucao in SolucaoTipo:
+        precos = catalogo.get_precos_por_custo(uf, solucao)
+        if not len(precos):
+            continue
+        custo_inicial = precos * consumo_kwh
+        custo = custo_inicial[:, None] * reajuste_contrato[None, :]
+        acumulada = atual_acumulado[None, :] - custo_inicial[:, None] * reajuste_acumulado[None, :]
+        recuperado = acumulada >= cenario.custo_migracao
+        payback = np.where(recuperado.any(axis=1), recuperado.argmax(axis=1) + 1, -1)
+        projecoes.append(ProjecaoSolucaoCalculada(
+            solucao=solucao,
+            fornecedores=catalogo.get_fornecedores_por_custo(uf, solucao),
+            custo_mensal=custo,
+            economia_mensal=custo_atual[None, :] - custo,
+            economia_acumulada=acumulada,
+            payback_meses=payback,
+            vpl=atual_presente - custo_inicial * reajuste_presente - cenario.custo_migracao,
+        ))
+    return custo_atual, projecoes
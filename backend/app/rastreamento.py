@@ -0,0 +1,280 @@
+import json
+import os
+import random
+import secrets
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from inspect import isawaitable
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+from graphql import GraphQLResolveInfo
+from strawberry.extensions import SchemaExtension
+
+
+MAX_SPANS_POR_TRACE = 1000
+
+
+class Trace:
+    __slots__ = ("trace_id", "spans", "descartados")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List["Span"] = []
+        self.descartados = 0
+
+    @property
+    def raiz(self) -> "Span":
+        return self.spans[0]
+
+    def como_dict(self) -> Dict[str, Any]:
+        raiz = self.raiz
+        fases: Dict[str, float] = {}
+        for span in self.spans[1:]:
+            fases[span.nome] = fases.get(span.nome, 0.0) + span.duracao_ms
+        return {
+            "trace_id": self.trace_id,
+            "nome": raiz.nome,
+            "inicio": raiz.inicio_epoch,
+            "duracao_ms": raiz.duracao_ms,
+            "atributos": raiz.atributos,
+            "fases_ms": {nome: round(duracao, 3) for nome, duracao in fases.items()},
+            "spans_descartados": self.descartados,
+            "spans": [span.como_dict() for span in self.spans],
+        }
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "pai_id", "nome", "atributos", "inicio", "inicio_epoch", "fim", "_token")
+
+    def __init__(self, trace: Trace, nome: str, pai_id: Optional[str], atributos: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.pai_id = pai_id
+        self.nome = nome
+        self.atributos = atributos
+        self.inicio = time.perf_counter()
+        self.inicio_epoch = time.time()
+        self.fim: Optional[float] = None
+        self._token = None
+        if len(trace.spans) < MAX_SPANS_POR_TRACE:
+            trace.spans.append(self)
+        else:
+            trace.descartados += 1
+
+    @property
+    def duracao_ms(self) -> float:
+        return ((self.fim or time.perf_counter()) - self.inicio) * 1000
+
+    def finalizar(self) -> None:
+        self.fim = time.perf_counter()
+
+    def __enter__(self) -> "Span":
+        self._token = _span_atual.set(self)
+        return self
+
+    def __exit__(self, tipo: Any, valor: Any, rastro: Any) -> None:
+        self.finalizar()
+        if valor is not None:
+            self.atributos["erro"] = repr(valor)
+        _span_atual.reset(self._token)
+
+    def como_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "pai_id": self.pai_id,
+            "nome": self.nome,
+            "inicio_ms": round((self.inicio - self.trace.raiz.inicio) * 1000, 3),
+            "duracao_ms": round(self.duracao_ms, 3),
+            "atributos": self.atributos,
+        }
+
+
+class _SpanNulo:
+    """Usado fora de requisições amostradas: não mede nem aloca nada."""
+
+    atributos: Dict[str, Any] = {}
+
+    def __enter__(self) -> "_SpanNulo":
+        return self
+
+    def __exit__(self, tipo: Any, valor: Any, rastro: Any) -> None:
+        return None
+
+
+_SPAN_NULO = _SpanNulo()
+_span_atual: ContextVar[Optional[Span]] = ContextVar("span_atual", default=None)
+
+
+def span(nome: str, **atributos: Any) -> Span | _SpanNulo:
+    pai = _span_atual.get()
+    if pai is None:
+        return _SPAN_NULO
+    return Span(pai.trace, nome, pai.span_id, atributos)
+
+
+def trace_atual() -> Optional[Trace]:
+    atual = _span_atual.get()
+    return atual.trace if atual else None
+
+
+class ExportadorMemoria:
+    """Mantém os traces mais recentes num buffer circular."""
+
+    def __init__(self, capacidade: int = 500):
+        self.traces: Deque[Trace] = deque(maxlen=capacidade)
+
+    def exportar(self, trace: Trace) -> None:
+        self.traces.append(trace)
+
+    def mais_lentos(self, limite: int = 20) -> List[Trace]:
+        return sorted(list(self.traces), key=lambda t: t.raiz.duracao_ms, reverse=True)[:limite]
+
+
+class ExportadorArquivo:
+    """Grava um trace por linha (JSON Lines)."""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+
+    def exportar(self, trace: Trace) -> None:
+        linha = json.dumps(trace.como_dict(), ensure_ascii=False, default=str)
+        with self._lock, open(self.caminho, "a", encoding="utf-8") as arquivo:
+            arquivo.write(linha + "\n")
+
+
+class Rastreador:
+    """`confiar_cabecalhos` aceita a amostragem forçada por traceparent/X-Trace-Sampled; sem
+    isso qualquer cliente poderia ligar o rastreamento de todas as suas requisições. Pedir
+    para não amostrar vale sempre."""
+
+    def __init__(
+        self, amostragem: float = 0.0, exportadores: Optional[List[Any]] = None, confiar_cabecalhos: bool = False
+    ):
+        self.amostragem = amostragem
+        self.confiar_cabecalhos = confiar_cabecalhos
+        self.memoria = ExportadorMemoria(int(os.getenv("TRACING_CAPACIDADE", "500")))
+        self.exportadores = exportadores if exportadores is not None else [self.memoria]
+
+    def amostrar(self, forcado: Optional[bool]) -> bool:
+        if forcado is False or (forcado and self.confiar_cabecalhos):
+            return forcado
+        return self.amostragem > 0 and random.random() < self.amostragem
+
+    def iniciar(self, nome: str, trace_id: Optional[str] = None, pai_id: Optional[str] = None, **atributos: Any) -> Span:
+        return Span(Trace(trace_id or secrets.token_hex(16)), nome, pai_id, atributos)
+
+    def exportar(self, trace: Trace) -> None:
+        for exportador in self.exportadores:
+            exportador.exportar(trace)
+
+
+def criar_rastreador_padrao() -> Rastreador:
+    rastreador = Rastreador(
+        amostragem=float(os.getenv("TRACING_AMOSTRAGEM", "0.01")),
+        confiar_cabecalhos=os.getenv("TRACING_CONFIAR_CABECALHOS", "0") == "1"
+    )
+    if os.getenv("TRACING_ARQUIVO"):
+        rastreador.exportadores.append(ExportadorArquivo(os.environ["TRACING_ARQUIVO"]))
+    return rastreador
+
+
+rastreador = criar_rastreador_padrao()
+
+
+def extrair_contexto(cabecalhos: Dict[str, str]) -> Tuple[Optional[str], Optional[str], Optional[bool]]:
+    """(trace_id, span pai, amostragem forçada) a partir de traceparent (W3C) ou X-Trace-Id."""
+    traceparent = cabecalhos.get("traceparent")
+    if traceparent:
+        partes = traceparent.strip().split("-")
+        if len(partes) == 4 and len(partes[1]) == 32 and len(partes[2]) == 16:
+            try:
+                amostrado = int(partes[3], 16) & 1 == 1
+            except ValueError:
+                amostrado = None
+            return partes[1], partes[2], amostrado
+    trace_id = cabecalhos.get("x-trace-id")
+    forcado = cabecalhos.get("x-trace-sampled")
+    return trace_id, None, (forcado == "1") if forcado is not None else None
+
+
+class MiddlewareRastreamento:
+    """Middleware ASGI: abre o span raiz, mede recebimento e envio e propaga o trace id."""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        cabecalhos = {chave.decode("latin-1").lower(): valor.decode("latin-1") for chave, valor in scope["headers"]}
+        trace_id, pai_id, forcado = extrair_contexto(cabecalhos)
+        if not rastreador.amostrar(forcado):
+            return await self.app(scope, receive, send)
+
+        raiz = rastreador.iniciar(
+            f"{scope['method']} {scope['path']}", trace_id, pai_id,
+            metodo=scope["method"], caminho=scope["path"]
+        )
+
+        async def receive_rastreado() -> Dict[str, Any]:
+            with span("asgi.receive"):
+                return await receive()
+
+        async def send_rastreado(mensagem: Dict[str, Any]) -> None:
+            if mensagem["type"] == "http.response.start":
+                raiz.atributos["status"] = mensagem["status"]
+                mensagem = {
+                    **mensagem,
+                    "headers": [
+                        *mensagem.get("headers", []),
+                        (b"traceparent", f"00-{raiz.trace.trace_id}-{raiz.span_id}-01".encode()),
+                        (b"x-trace-id", raiz.trace.trace_id.encode()),
+                    ],
+                }
+            with span("asgi.send"):
+                await send(mensagem)
+
+        try:
+            with raiz:
+                await self.app(scope, receive_rastreado, send_rastreado)
+        finally:
+            rastreador.exportar(raiz.trace)
+
+
+class RastreamentoGraphQL(SchemaExtension):
+    """Spans das fases GraphQL e dos resolvers de primeiro nível (estados, simularEconomia...)."""
+
+    def _fase(self, nome: str) -> Iterator[None]:
+        with span(nome, operacao=self.execution_context.operation_name):
+            yield
+
+    def on_parse(self) -> Iterator[None]:
+        yield from self._fase("graphql.parse")
+
+    def on_validate(self) -> Iterator[None]:
+        yield from self._fase("graphql.validate")
+
+    def on_execute(self) -> Iterator[None]:
+        yield from self._fase("graphql.execute")
+
+    def resolve(self, _next: Callable, root: Any, info: GraphQLResolveInfo, *args: Any, **kwargs: Any) -> Any:
+        if info.path.prev is not None or _span_atual.get() is None:
+            return _next(root, info, *args, **kwargs)
+        with span(f"resolver.{info.parent_type.name}.{info.field_name}", alias=info.path.key) as atual:
+            resultado = _next(root, info, *args, **kwargs)
+        if isawaitable(resultado):
+            return _concluir(resultado, atual)
+        return resultado
+
+
+async def _concluir(resultado: Any, atual: Span) -> Any:
+    """Reabre o span do resolver enquanto a parte assíncrona executa."""
+    token = _span_atual.set(atual)
+    try:
+        return await resultado
+    finally:
+        atual.finalizar()
+        _span_atual.reset(token)
@@ -0,0 +1,461 @@
+import argparse
+import asyncio
+import csv
+import os
+import queue
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+from app.models import ESTRUTURAS_POR_SOLUCAO, Estado, EstruturaTarifaria, Fornecedor, SolucaoTipo
+from app.data import ESTADOS, FORNECEDORES, Catalogo, get_catalogo, recarregar_catalogo
+from app.rastreamento import span
+
+
+SEPARADOR_SOLUCOES = "|"
+MAX_PARAMETROS = 900
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS estados (
+    uf TEXT PRIMARY KEY,
+    nome TEXT NOT NULL,
+    tarifa_base_kwh REAL NOT NULL,
+    estrutura_tarifaria TEXT
+);
+
+CREATE TABLE IF NOT EXISTS fornecedores (
+    id TEXT PRIMARY KEY,
+    nome TEXT NOT NULL,
+    logo TEXT NOT NULL,
+    estado TEXT NOT NULL,
+    custo_kwh_gd REAL,
+    custo_kwh_ml REAL,
+    total_clientes INTEGER NOT NULL,
+    avaliacao_media REAL NOT NULL CHECK (avaliacao_media BETWEEN 0 AND 5),
+    estruturas_tarifarias TEXT
+);
+
+CREATE TABLE IF NOT EXISTS fornecedor_solucoes (
+    fornecedor_id TEXT NOT NULL REFERENCES fornecedores(id) ON DELETE CASCADE,
+    solucao TEXT NOT NULL,
+    posicao INTEGER NOT NULL,
+    PRIMARY KEY (fornecedor_id, solucao)
+);
+
+CREATE INDEX IF NOT EXISTS idx_fornecedores_estado ON fornecedores(estado);
+CREATE INDEX IF NOT EXISTS idx_fornecedor_solucoes_solucao ON fornecedor_solucoes(solucao, fornecedor_id);
+
+CREATE TABLE IF NOT EXISTS metadados (
+    chave TEXT PRIMARY KEY,
+    valor INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO metadados (chave, valor) VALUES ('versao', 0);
+"""
+
+# Colunas adicionadas depois da primeira versão do esquema, criadas em bancos antigos
+COLUNAS_ADICIONAIS = (
+    ("estados", "estrutura_tarifaria", "TEXT"),
+    ("fornecedores", "estruturas_tarifarias", "TEXT"),
+)
+
+# Qualquer escrita, inclusive feita fora da aplicação, avança a versão dos dados
+GATILHOS = "\n".join(
+    f"""
+CREATE TRIGGER IF NOT EXISTS versao_{tabela}_{operacao.lower()} AFTER {operacao} ON {tabela}
+BEGIN
+    UPDATE metadados SET valor = valor + 1 WHERE chave = 'versao';
+END;"""
+    for tabela in ("estados", "fornecedores", "fornecedor_solucoes")
+    for operacao in ("INSERT", "UPDATE", "DELETE")
+)
+
+
+class Repositorio(ABC):
+    """Fonte dos dados do catálogo. Os métodos assíncronos não bloqueiam o event loop.
+
+    Só a carga do catálogo passa por aqui; as buscas das requisições usam o Catalogo em memória.
+    """
+
+    @abstractmethod
+    def listar_estados(self) -> List[Estado]:
+        ...
+
+    @abstractmethod
+    def listar_fornecedores(self) -> List[Fornecedor]:
+        ...
+
+    @abstractmethod
+    def buscar_fornecedores(self, ids: Sequence[str]) -> List[Optional[Fornecedor]]:
+        ...
+
+    @abstractmethod
+    def versao_dados(self) -> int:
+        ...
+
+    async def _executar(self, funcao: Callable[..., Any], *args: Any) -> Any:
+        return funcao(*args)
+
+    async def listar_estados_async(self) -> List[Estado]:
+        return await self._executar(self.listar_estados)
+
+    async def listar_fornecedores_async(self) -> List[Fornecedor]:
+        return await self._executar(self.listar_fornecedores)
+
+    async def versao_dados_async(self) -> int:
+        return await self._executar(self.versao_dados)
+
+
+class RepositorioMemoria(Repositorio):
+    """Repositório sobre listas Python, usado como semente e em testes."""
+
+    def __init__(self, estados: Iterable[Estado], fornecedores: Iterable[Fornecedor]):
+        self.estados = list(estados)
+        self.fornecedores = list(fornecedores)
+        self._por_id = {f.id: f for f in self.fornecedores}
+
+    def listar_estados(self) -> List[Estado]:
+        return list(self.estados)
+
+    def listar_fornecedores(self) -> List[Fornecedor]:
+        return list(self.fornecedores)
+
+    def buscar_fornecedores(self, ids: Sequence[str]) -> List[Optional[Fornecedor]]:
+        return [self._por_id.get(i) for i in ids]
+
+    def versao_dados(self) -> int:
+        return 0
+
+
+class RepositorioSQLite(Repositorio):
+    """Catálogo persistido em SQLite, com pool de conexões usado a partir de threads."""
+
+    def __init__(self, caminho: str | Path, tamanho_pool: int = 4):
+        self.caminho = str(caminho)
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        for _ in range(tamanho_pool):
+            conexao = sqlite3.connect(self.caminho, check_same_thread=False, isolation_level=None)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute("PRAGMA foreign_keys = ON")
+            conexao.execute("PRAGMA busy_timeout = 5000")
+            self._pool.put(conexao)
+        with self._conexao() as conexao:
+            conexao.execute("PRAGMA journal_mode = WAL")
+
+    @contextmanager
+    def _conexao(self) -> Iterator[sqlite3.Connection]:
+        conexao = self._pool.get()
+        try:
+            yield conexao
+        finally:
+            self._pool.put(conexao)
+
+    @contextmanager
+    def _transacao(self) -> Iterator[sqlite3.Connection]:
+        with self._conexao() as conexao:
+            conexao.execute("BEGIN")
+            try:
+                yield conexao
+            except BaseException:
+                conexao.execute("ROLLBACK")
+                raise
+            conexao.execute("COMMIT")
+
+    async def _executar(self, funcao: Callable[..., Any], *args: Any) -> Any:
+        return await asyncio.to_thread(funcao, *args)
+
+    def fechar(self) -> None:
+        while not self._pool.empty():
+            self._pool.get_nowait().close()
+
+    def criar_tabelas(self) -> None:
+        with self._conexao() as conexao:
+            conexao.executescript(ESQUEMA + GATILHOS)
+            for tabela, coluna, tipo in COLUNAS_ADICIONAIS:
+                existentes = {linha["name"] for linha in conexao.execute(f"PRAGMA table_info({tabela})")}
+                if coluna not in existentes:
+                    conexao.execute(f"ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}")
+
+    def vazio(self) -> bool:
+        with self._conexao() as conexao:
+            return conexao.execute("SELECT 1 FROM estados LIMIT 1").fetchone() is None
+
+    def salvar_estados(self, estados: Iterable[Estado]) -> int:
+        linhas = [
+            (e.uf, e.nome, e.tarifa_base_kwh,
+             e.estrutura_tarifaria.model_dump_json() if e.estrutura_tarifaria is not None else None)
+            for e in estados
+        ]
+        with self._transacao() as conexao:
+            conexao.executemany(
+                """
+                INSERT INTO estados (uf, nome, tarifa_base_kwh, estrutura_tarifaria) VALUES (?, ?, ?, ?)
+                ON CONFLICT(uf) DO UPDATE SET
+                    nome = excluded.nome,
+                    tarifa_base_kwh = excluded.tarifa_base_kwh,
+                    estrutura_tarifaria = excluded.estrutura_tarifaria
+                """,
+                linhas
+            )
+        return len(linhas)
+
+    def salvar_fornecedores(self, fornecedores: Iterable[Fornecedor]) -> int:
+        fornecedores = list(fornecedores)
+        with self._transacao() as conexao:
+            conexao.executemany(
+                """
+                INSERT INTO fornecedores (
+                    id, nome, logo, estado, custo_kwh_gd, custo_kwh_ml, total_clientes, avaliacao_media,
+                    estruturas_tarifarias
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    nome = excluded.nome,
+                    logo = excluded.logo,
+                    estado = excluded.estado,
+                    custo_kwh_gd = excluded.custo_kwh_gd,
+                    custo_kwh_ml = excluded.custo_kwh_ml,
+                    total_clientes = excluded.total_clientes,
+                    avaliacao_media = excluded.avaliacao_media,
+                    estruturas_tarifarias = excluded.estruturas_tarifarias
+                """,
+                [
+                    (f.id, f.nome, f.logo, f.estado, f.custo_kwh_gd, f.custo_kwh_ml,
+                     f.total_clientes, f.avaliacao_media,
+                     ESTRUTURAS_POR_SOLUCAO.dump_json(f.estruturas_tarifarias).decode()
+                     if f.estruturas_tarifarias else None)
+                    for f in fornecedores
+                ]
+            )
+            conexao.executemany(
+                "DELETE FROM fornecedor_solucoes WHERE fornecedor_id = ?",
+                [(f.id,) for f in fornecedores]
+            )
+            conexao.executemany(
+                "INSERT INTO fornecedor_solucoes (fornecedor_id, solucao, posicao) VALUES (?, ?, ?)",
+                [
+                    (f.id, solucao.value, posicao)
+                    for f in fornecedores
+                    for posicao, solucao in enumerate(f.solucoes)
+                ]
+            )
+        return len(fornecedores)
+
+    def semear(self, estados: Iterable[Estado] = ESTADOS, fornecedores: Iterable[Fornecedor] = FORNECEDORES) -> None:
+        self.salvar_estados(estados)
+        self.salvar_fornecedores(fornecedores)
+
+    def importar_csv_estados(self, caminho: str | Path) -> int:
+        with open(caminho, newline="", encoding="utf-8") as arquivo:
+            return self.salvar_estados(_estado_do_csv(linha) for linha in csv.DictReader(arquivo))
+
+    def importar_csv_fornecedores(self, caminho: str | Path) -> int:
+        with open(caminho, newline="", encoding="utf-8") as arquivo:
+            return self.salvar_fornecedores(_fornecedor_do_csv(linha) for linha in csv.DictReader(arquivo))
+
+    def listar_estados(self) -> List[Estado]:
+        with self._conexao() as conexao:
+            linhas = conexao.execute(
+                "SELECT uf, nome, tarifa_base_kwh, estrutura_tarifaria FROM estados ORDER BY rowid"
+            ).fetchall()
+        return [
+            Estado.model_construct(
+                **{**dict(linha), "estrutura_tarifaria": _estrutura(linha["estrutura_tarifaria"])}
+            )
+            for linha in linhas
+        ]
+
+    def listar_fornecedores(self) -> List[Fornecedor]:
+        return self._consultar_fornecedores("", ())
+
+    def buscar_fornecedores(self, ids: Sequence[str]) -> List[Optional[Fornecedor]]:
+        encontrados = {}
+        for inicio in range(0, len(ids), MAX_PARAMETROS):
+            parte = tuple(ids[inicio:inicio + MAX_PARAMETROS])
+            for fornecedor in self._consultar_fornecedores(
+                f"WHERE f.id IN ({', '.join('?' * len(parte))})", parte
+            ):
+                encontrados[fornecedor.id] = fornecedor
+        return [encontrados.get(i) for i in ids]
+
+    def listar_fornecedores_por_solucao(self, uf: str, solucao: SolucaoTipo) -> List[Fornecedor]:
+        return self._consultar_fornecedores(
+            "WHERE f.estado = ? AND f.id IN (SELECT fornecedor_id FROM fornecedor_solucoes WHERE solucao = ?)",
+            (uf, solucao.value)
+        )
+
+    def _consultar_fornecedores(self, filtro: str, parametros: Tuple[Any, ...]) -> List[Fornecedor]:
+        with self._conexao() as conexao:
+            linhas = conexao.execute(
+                f"""
+                SELECT f.id, f.nome, f.logo, f.estado, f.custo_kwh_gd, f.custo_kwh_ml,
+                       f.total_clientes, f.avaliacao_media, f.estruturas_tarifarias,
+                       (SELECT group_concat(solucao, '{SEPARADOR_SOLUCOES}')
+                          FROM (SELECT solucao FROM fornecedor_solucoes s
+                                 WHERE s.fornecedor_id = f.id ORDER BY posicao)) AS solucoes
+                  FROM fornecedores f
+                {filtro}
+                 ORDER BY f.rowid
+                """,
+                parametros
+            ).fetchall()
+        # Os dados já foram validados na importação; aqui só remontamos os modelos
+        return [
+            Fornecedor.model_construct(
+                **{
+                    **dict(linha),
+                    "solucoes": _solucoes(linha["solucoes"]),
+                    "estruturas_tarifarias": _estruturas(linha["estruturas_tarifarias"]),
+                }
+            )
+            for linha in linhas
+        ]
+
+    def versao_dados(self) -> int:
+        with self._conexao() as conexao:
+            return conexao.execute("SELECT valor FROM metadados WHERE chave = 'versao'").fetchone()[0]
+
+
+def _solucoes(valor: Optional[str]) -> List[SolucaoTipo]:
+    return [SolucaoTipo(s) for s in valor.split(SEPARADOR_SOLUCOES)] if valor else []
+
+
+def _estrutura(valor: Optional[str]) -> Optional[EstruturaTarifaria]:
+    return EstruturaTarifaria.model_validate_json(valor) if valor else None
+
+
+def _estruturas(valor: Optional[str]) -> dict:
+    return ESTRUTURAS_POR_SOLUCAO.validate_json(valor) if valor else {}
+
+
+def _estado_do_csv(linha: dict) -> Estado:
+    return Estado(
+        **{
+            **{chave: valor for chave, valor in linha.items() if valor != ""},
+            "estrutura_tarifaria": _estrutura(linha.get("estrutura_tarifaria"))
+        }
+    )
+
+
+def _fornecedor_do_csv(linha: dict) -> Fornecedor:
+    return Fornecedor(
+        **{
+            **{chave: valor for chave, valor in linha.items() if valor != ""},
+            "solucoes": _solucoes(linha.get("solucoes")),
+            "estruturas_tarifarias": _estruturas(linha.get("estruturas_tarifarias"))
+        }
+    )
+
+
+INTERVALO_VERIFICACAO = float(os.getenv("CATALOGO_INTERVALO_VERIFICACAO", "1.0"))
+
+_repositorio: Optional[Repositorio] = None
+_versao_carregada: Optional[int] = None
+_ultima_verificacao = 0.0
+
+
+def criar_repositorio_padrao() -> Repositorio:
+    caminho = os.getenv("CATALOGO_DB")
+    if not caminho:
+        return RepositorioMemoria(ESTADOS, FORNECEDORES)
+    repositorio = RepositorioSQLite(caminho, tamanho_pool=int(os.getenv("CATALOGO_DB_POOL", "4")))
+    repositorio.criar_tabelas()
+    if repositorio.vazio():
+        repositorio.semear()
+    return repositorio
+
+
+def get_repositorio() -> Repositorio:
+    global _repositorio, _versao_carregada
+    if _repositorio is None:
+        _repositorio = criar_repositorio_padrao()
+        if isinstance(_repositorio, RepositorioMemoria):
+            # O catálogo de app.data já foi construído a partir das mesmas listas
+            _versao_carregada = _repositorio.versao_dados()
+    return _repositorio
+
+
+def configurar_repositorio(repositorio: Repositorio) -> Catalogo:
+    global _repositorio, _versao_carregada, _ultima_verificacao
+    _repositorio = repositorio
+    _versao_carregada = repositorio.versao_dados()
+    _ultima_verificacao = time.monotonic()
+    return recarregar_catalogo(repositorio.listar_estados(), repositorio.listar_fornecedores())
+
+
+def pre_carregar_catalogo() -> Catalogo:
+    """Carrega o catálogo no processo mestre, antes do fork dos workers.
+
+    As conexões SQLite não podem atravessar o fork, então o repositório usado aqui é
+    fechado; cada worker abre o seu no primeiro acesso e, como a versão carregada já
+    é conhecida, só reconstrói o catálogo se os dados mudarem depois disso.
+    """
+    global _repositorio
+    repositorio = criar_repositorio_padrao()
+    try:
+        catalogo = configurar_repositorio(repositorio)
+    finally:
+        if isinstance(repositorio, RepositorioSQLite):
+            repositorio.fechar()
+        _repositorio = None
+    return catalogo
+
+
+async def obter_catalogo() -> Catalogo:
+    """Catálogo em memória, recarregado do repositório quando os dados mudam.
+
+    A versão dos dados é consultada no máximo uma vez por CATALOGO_INTERVALO_VERIFICACAO
+    segundos, então o caminho quente continua sem acesso ao banco.
+    """
+    global _versao_carregada, _ultima_verificacao
+    repositorio = get_repositorio()
+    agora = time.monotonic()
+    if _versao_carregada is not None and agora - _ultima_verificacao < INTERVALO_VERIFICACAO:
+        return get_catalogo()
+
+    _ultima_verificacao = agora
+    with span("catalogo.versao_dados"):
+        versao = await repositorio.versao_dados_async()
+    if versao != _versao_carregada:
+        with span("catalogo.recarregar", versao=versao):
+            estados, fornecedores = await asyncio.gather(
+                repositorio.listar_estados_async(), repositorio.listar_fornecedores_async()
+            )
+            # A reconstrução dos índices fica fora do event loop; a publicação é uma troca atômica
+            await asyncio.to_thread(recarregar_catalogo, estados, fornecedores)
+        _versao_carregada = versao
+    return get_catalogo()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Gerencia o catálogo SQLite de estados e fornecedores")
+    parser.add_argument("--db", default=os.getenv("CATALOGO_DB", "catalogo.db"))
+    subcomandos = parser.add_subparsers(dest="comando", required=True)
+    subcomandos.add_parser("semear", help="Cria as tabelas e grava os dados de app/data.py")
+    importar = subcomandos.add_parser("importar", help="Importa estados e/ou fornecedores de CSV")
+    importar.add_argument(
+        "--estados", help="CSV com colunas uf,nome,tarifa_base_kwh e, opcionalmente, estrutura_tarifaria (JSON)"
+    )
+    importar.add_argument(
+        "--fornecedores",
+        help="CSV com colunas id,nome,logo,estado,solucoes,custo_kwh_gd,custo_kwh_ml,"
+             f"total_clientes,avaliacao_media (solucoes separadas por '{SEPARADOR_SOLUCOES}') e, opcionalmente, "
+             "estruturas_tarifarias (JSON por solução)"
+    )
+    args = parser.parse_args(argv)
+
+    repositorio = RepositorioSQLite(args.db, tamanho_pool=1)
+    repositorio.criar_tabelas()
+    if args.comando == "semear":
+        repositorio.semear()
+        print(f"Catálogo semeado em {args.db}")
+    else:
+        if args.estados:
+            print(f"{repositorio.importar_csv_estados(args.estados)} estados importados")
+        if args.fornecedores:
+            print(f"{repositorio.importar_csv_fornecedores(args.fornecedores)} fornecedores importados")
+    repositorio.fechar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,275 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, Hashable, Mapping, Optional, Tuple, Union
+from fastapi import Request, Response
+from graphql import DocumentNode, GraphQLError, GraphQLSyntaxError, OperationType, parse
+from graphql.utilities import strip_ignored_characters
+from strawberry.fastapi import GraphQLRouter
+from strawberry.http import GraphQLHTTPResponse, GraphQLRequestData
+from strawberry.http.types import QueryParams
+from strawberry.types import ExecutionResult
+from strawberry.types.unset import UNSET
+from app.admissao import AdmissaoNegada, ControleAdmissao
+from app.cache import CacheLRU, VooUnico
+from app.custo import analisar_custo, operacao_selecionada
+from app.metricas import metricas
+from app.rastreamento import span
+from app.serializacao import serializar_json
+from app.persistidas import (
+    ErroConsultaPersistida, RegistroConsultas, cache_documentos, criar_registro_padrao, hash_consulta
+)
+
+# max-age (segundos) das consultas GET por campo raiz; a operação usa o menor entre os
+# seus campos e não é cacheável se algum não estiver aqui. O ETag cobre a revalidação
+# depois de uma troca de catálogo, então os prazos só limitam quanto a borda serve sem perguntar.
+POLITICAS_CACHE: Dict[str, int] = {
+    "estados": 300,
+    "simularEconomia": 60,
+    "compararEstados": 60,
+    "curvaEconomia": 60,
+    "projecaoContrato": 60,
+    "simularEconomiaLote": 0,
+    "simularTarifas": 0,
+}
+
+
+def etag_operacao(consulta: str, variaveis: Optional[Mapping[str, Any]], operacao: Optional[str], catalogo: str) -> str:
+    """ETag forte: o resultado de uma consulta depende só do documento, das variáveis e do catálogo."""
+    resumo = hashlib.blake2b(digest_size=16)
+    variaveis_normalizadas = json.dumps(variaveis or {}, sort_keys=True, separators=(",", ":"))
+    for parte in (consulta, variaveis_normalizadas, operacao or "", catalogo):
+        resumo.update(parte.encode("utf-8"))
+        resumo.update(b"\x00")
+    return f'"{resumo.hexdigest()}"'
+
+
+def etag_corresponde(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # If-None-Match usa comparação fraca: W/"x" corresponde a "x"
+    candidatos = [c.strip().removeprefix("W/") for c in if_none_match.split(",")]
+    return "*" in candidatos or etag in candidatos
+
+
+def max_age_operacao(
+    documento: DocumentNode, operacao: Optional[str], politicas: Mapping[str, int]
+) -> Optional[int]:
+    """max-age da operação selecionada, ou None se ela não for uma query cacheável."""
+    selecionada = operacao_selecionada(documento, operacao)
+    if selecionada is None or selecionada.operation != OperationType.QUERY:
+        return None
+    idades = []
+    for selecao in selecionada.selection_set.selections:
+        nome = getattr(getattr(selecao, "name", None), "value", None)
+        if nome is None or nome not in politicas:
+            # Fragmentos e campos sem política tornam a operação não cacheável
+            return None
+        idades.append(politicas[nome])
+    return min(idades, default=None)
+
+
+def cache_control(max_age: int) -> str:
+    return f"public, max-age={max_age}" if max_age > 0 else "no-cache"
+
+
+# Texto → texto sem espaços e comentários; strip_ignored_characters custa centenas de µs
+cache_normalizadas = CacheLRU(
+    tamanho_maximo=int(os.getenv("DOCUMENTOS_CACHE_TAMANHO", "512")),
+    ttl_segundos=None
+)
+
+
+def normalizar_consulta(consulta: str) -> str:
+    chave = hash_consulta(consulta)
+    normalizada = cache_normalizadas.get(chave)
+    if normalizada is None:
+        try:
+            normalizada = strip_ignored_characters(consulta)
+        except GraphQLSyntaxError:
+            normalizada = consulta
+        cache_normalizadas.set(chave, normalizada)
+    return normalizada
+
+
+def documento_consulta(consulta: str) -> Optional[DocumentNode]:
+    documento = cache_documentos.get(hash_consulta(consulta))
+    if documento is None:
+        try:
+            documento = parse(consulta)
+        except GraphQLSyntaxError:
+            return None
+    return documento
+
+
+def identificar_cliente(request: Request) -> str:
+    """Cliente para o limite de taxa: o cabeçalho ADMISSAO_CABECALHO_CLIENTE (p.ex.
+    X-Forwarded-For atrás de um proxy confiável) ou o IP da conexão."""
+    cabecalho = os.getenv("ADMISSAO_CABECALHO_CLIENTE")
+    valor = request.headers.get(cabecalho) if cabecalho else None
+    if valor:
+        return valor.split(",")[0].strip()
+    return request.client.host if request.client else "desconhecido"
+
+
+def chave_operacao(dados: GraphQLRequestData, catalogo_versao: int) -> Hashable:
+    """Operações com a mesma chave têm o mesmo resultado: mesmo documento normalizado,
+    variáveis, operação e versão do catálogo."""
+    variaveis = json.dumps(dados.variables or {}, sort_keys=True, separators=(",", ":"))
+    return (normalizar_consulta(dados.query or ""), variaveis, dados.operation_name, catalogo_versao)
+
+
+class ClarkeGraphQLRouter(GraphQLRouter):
+    """GraphQLRouter com Automatic Persisted Queries, cache HTTP das queries via GET,
+    controle de admissão ponderado pelo custo e coalescência das queries idênticas em
+    andamento (single-flight)."""
+
+    def __init__(
+        self,
+        *args: Any,
+        consultas_persistidas: Optional[RegistroConsultas] = None,
+        politicas_cache: Optional[Mapping[str, int]] = None,
+        coalescer: bool = True,
+        admissao: Optional[ControleAdmissao] = None,
+        **kwargs: Any
+    ):
+        super().__init__(*args, **kwargs)
+        self.consultas_persistidas = consultas_persistidas or criar_registro_padrao()
+        self.politicas_cache = POLITICAS_CACHE if politicas_cache is None else politicas_cache
+        self.voo_unico = VooUnico() if coalescer else None
+        if self.voo_unico is not None:
+            metricas.registrar_coletor(self._coletar_voo_unico)
+        self.admissao = admissao or ControleAdmissao.do_ambiente()
+        if self.admissao is not None:
+            metricas.registrar_coletor(self.admissao.coletar)
+
+    def should_render_graphql_ide(self, request: Any) -> bool:
+        return request.query_params.get("extensions") is None and super().should_render_graphql_ide(request)
+
+    def parse_json(self, data: Union[str, bytes]) -> Any:
+        return self._resolver_persistida(super().parse_json(data))
+
+    def parse_query_params(self, params: QueryParams) -> dict:
+        return self._resolver_persistida(super().parse_query_params(params))
+
+    def _resolver_persistida(self, dados: Any) -> Any:
+        if isinstance(dados, dict) and ("query" in dados or "extensions" in dados):
+            return self.consultas_persistidas.resolver(dados)
+        return dados
+
+    async def run(self, request: Request, context: Any = UNSET, root_value: Any = UNSET) -> Response:
+        try:
+            return await self._run_com_cache(request, context, root_value)
+        except AdmissaoNegada as erro:
+            corpo = {"errors": [{"message": erro.motivo, "extensions": {"code": "SOBRECARGA"}}]}
+            return Response(
+                serializar_json(corpo), status_code=429, media_type="application/json",
+                headers={"Retry-After": erro.retry_after}
+            )
+
+    async def _run_com_cache(self, request: Request, context: Any, root_value: Any) -> Response:
+        """Nas queries via GET, responde 304 sem executar quando o ETag do cliente ainda vale
+        e marca as respostas sem erros com ETag e Cache-Control."""
+        politica = self._politica_get(request, context)
+        if politica is None:
+            return await super().run(request, context, root_value)
+
+        etag, max_age = politica
+        cabecalhos = {"ETag": etag, "Cache-Control": cache_control(max_age)}
+        if etag_corresponde(request.headers.get("if-none-match"), etag):
+            metricas.incrementar("graphql_cache_http_total", descricao="Queries GET por resultado", resultado="304")
+            return Response(status_code=304, headers=cabecalhos)
+
+        resposta = await super().run(request, context, root_value)
+        if resposta.status_code == 200 and not getattr(request.state, "graphql_com_erros", True):
+            resposta.headers.update(cabecalhos)
+            metricas.incrementar("graphql_cache_http_total", descricao="Queries GET por resultado", resultado="200")
+        return resposta
+
+    def _politica_get(self, request: Request, context: Any) -> Optional[Tuple[str, int]]:
+        if request.method != "GET" or context is UNSET or self.should_render_graphql_ide(request):
+            return None
+        try:
+            dados = self.parse_query_params(request.query_params)
+        except (ErroConsultaPersistida, ValueError):
+            # A execução normal devolve o erro
+            return None
+        consulta = dados.get("query")
+        documento = documento_consulta(consulta) if consulta else None
+        if documento is None:
+            return None
+        operacao = dados.get("operationName")
+        max_age = max_age_operacao(documento, operacao, self.politicas_cache)
+        if max_age is None:
+            return None
+        return etag_operacao(consulta, dados.get("variables"), operacao, context.catalogo.impressao), max_age
+
+    async def process_result(self, request: Request, result: ExecutionResult) -> GraphQLHTTPResponse:
+        request.state.graphql_com_erros = bool(result.errors)
+        return await super().process_result(request, result)
+
+    async def parse_http_body(self, request: Any) -> GraphQLRequestData:
+        # execute_operation lê o corpo antes de delegar ao strawberry, que o lê de novo
+        estado = request.request.state
+        dados = getattr(estado, "dados_graphql", None)
+        if dados is None:
+            dados = estado.dados_graphql = await super().parse_http_body(request)
+        return dados
+
+    async def execute_operation(self, request: Any, context: Any, root_value: Any) -> ExecutionResult:
+        """A execução do strawberry dentro do controle de admissão, com queries idênticas
+        simultâneas esperando a mesma execução."""
+        executar_strawberry = super().execute_operation
+        try:
+            dados = await self.parse_http_body(self.request_adapter_class(request))
+        except ErroConsultaPersistida as erro:
+            return ExecutionResult(
+                data=None,
+                errors=[GraphQLError(erro.mensagem, extensions={"code": erro.codigo})]
+            )
+        except (json.JSONDecodeError, KeyError):
+            # O strawberry lê o corpo de novo e responde o 400 adequado
+            return await executar_strawberry(request, context, root_value)
+
+        documento = documento_consulta(dados.query) if dados.query else None
+        selecionada = operacao_selecionada(documento, dados.operation_name) if documento else None
+        custo = 1.0
+        if self.admissao is not None and dados.query:
+            if documento is not None and context is not UNSET:
+                custo = analisar_custo(
+                    documento, self.schema._schema, dados.variables, dados.operation_name, context.catalogo
+                ).custo
+            self.admissao.verificar_cliente(identificar_cliente(request), custo)
+
+        async def executar() -> ExecutionResult:
+            if self.admissao is None:
+                return await executar_strawberry(request, context, root_value)
+            async with self.admissao.vaga(custo):
+                return await executar_strawberry(request, context, root_value)
+
+        # Só queries são compartilhadas: mutations teriam efeito por requisição
+        if (
+            self.voo_unico is None or context is UNSET or dados.protocol != "http"
+            or selecionada is None or selecionada.operation != OperationType.QUERY
+        ):
+            return await executar()
+        chave = (chave_operacao(dados, context.catalogo.versao), request.method)
+        metricas.incrementar(
+            "graphql_voo_unico_total", descricao="Operações GraphQL executadas ou coalescidas em uma já em andamento",
+            resultado="coalescida" if chave in self.voo_unico else "executada"
+        )
+        return await self.voo_unico.executar(chave, executar)
+
+    def _coletar_voo_unico(self) -> list:
+        return [("graphql_voo_unico_em_andamento", "gauge", (), len(self.voo_unico))]
+
+    def encode_json(self, response_data: GraphQLHTTPResponse) -> bytes:
+        inicio = time.perf_counter()
+        with span("graphql.serializacao"):
+            corpo = serializar_json(response_data)
+        metricas.observar(
+            "graphql_serializacao_segundos", time.perf_counter() - inicio,
+            "Tempo de serialização JSON das respostas GraphQL"
+        )
+        return corpo
@@ -1,7 +1,64 @@
+import dataclasses
+import os
 import strawberry
-from typing import List, Optional
-from app.models import SolucaoTipo, EconomiaFornecedor, Fornecedor, Estado
-from app.data import ESTADOS, get_estado, get_fornecedores_por_estado
+import numpy as np
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from app.models import (
+    BandeiraTarifaria, SolucaoTipo, CurvaSolucaoCalculada, EconomiaCalculada, Estado, EstruturaTarifaria, Fornecedor,
+    ProjecaoSolucaoCalculada, SimulacaoLote, TarifacaoSolucao
+)
+from app.data import Catalogo, get_catalogo
+from app.indice import custo_curva
+from app.cache import CacheLRU
+from app.custo import MAX_PERFIS_TARIFA, MAX_PONTOS_CURVA, LimiteCusto
+from app.persistidas import CacheDocumentos, cache_documentos
+from app.metricas import MetricasGraphQL, metricas
+from app.rastreamento import RastreamentoGraphQL
+from app.tarifas import ANO_PADRAO, PerfisCarga, precificar_perfis
+from app.projecao import CenarioContrato, projetar_contrato
+
+# Limita o tamanho das matrizes clientes × fornecedores calculadas de uma vez
+MAX_CELULAS_LOTE = 1_000_000
+
+cache_simulacoes = CacheLRU(
+    tamanho_maximo=int(os.getenv("SIMULACAO_CACHE_TAMANHO", "4096")),
+    ttl_segundos=float(os.getenv("SIMULACAO_CACHE_TTL", "300"))
+)
+
+
+BandeiraTarifariaEnum = strawberry.enum(BandeiraTarifaria, name="BandeiraTarifaria")
+
+
+@strawberry.type
+class FaixaConsumoType:
+    ate_kwh: Optional[float]
+    tarifa_kwh: float
+
+
+@strawberry.type
+class AdicionalBandeiraType:
+    bandeira: BandeiraTarifariaEnum
+    adicional_kwh: float
+
+
+@strawberry.type
+class EstruturaTarifariaType:
+    tarifa_fora_ponta_kwh: float
+    tarifa_ponta_kwh: Optional[float]
+    inicio_ponta: int
+    fim_ponta: int
+    ponta_fim_de_semana: bool
+    faixas: List[FaixaConsumoType]
+    tarifa_demanda_kw: float
+    taxa_fixa_mensal: float
+    adicionais_bandeira: List[AdicionalBandeiraType]
+
+
+@strawberry.type
+class EstruturaTarifariaSolucaoType:
+    solucao: str
+    estrutura: EstruturaTarifariaType
 
 
 @strawberry.type
@@ -15,6 +72,7 @@ class FornecedorType:
     custo_kwh_ml: Optional[float]
     total_clientes: int
     avaliacao_media: float
+    estruturas_tarifarias: List[EstruturaTarifariaSolucaoType]
 
 
 @strawberry.type
@@ -22,55 +80,385 @@ class EstadoType:
     uf: str
     nome: str
     tarifa_base_kwh: float
+    estrutura_tarifaria: Optional[EstruturaTarifariaType]
 
 
 @strawberry.type
 class EconomiaFornecedorType:
-    fornecedor: FornecedorType
+    fornecedor_id: strawberry.Private[str]
     solucao: str
     custo_atual: float
     custo_com_fornecedor: float
     economia_mensal: float
     economia_percentual: float
     economia_anual: float
+    
+    @strawberry.field
+    async def fornecedor(self, info: strawberry.Info) -> FornecedorType:
+        return await carregar_fornecedor(info, self.fornecedor_id)
+
+
+def memorizar(calculos: Dict[str, Any], chave: str, calcular: Callable[[], Any]) -> Any:
+    if chave not in calculos:
+        calculos[chave] = calcular()
+    return calculos[chave]
 
 
 @strawberry.type
 class SolucaoDisponivel:
     tipo: str
-    fornecedores: List[FornecedorType]
-    melhor_economia: Optional[EconomiaFornecedorType]
+    uf: strawberry.Private[str]
+    solucao: strawberry.Private[SolucaoTipo]
+    consumo_kwh: strawberry.Private[float]
+    calculos: strawberry.Private[Dict[str, Any]] = dataclasses.field(default_factory=dict)
+    
+    @strawberry.field
+    def total_fornecedores(self, info: strawberry.Info) -> int:
+        return len(info.context.catalogo.get_fornecedores_por_solucao(self.uf, self.solucao))
+    
+    @strawberry.field
+    async def fornecedores(
+        self, info: strawberry.Info, limite: Optional[int] = None, deslocamento: int = 0
+    ) -> List[FornecedorType]:
+        """Lista completa ou uma página dela, para carregar o resumo antes da lista."""
+        if deslocamento < 0 or (limite is not None and limite < 0):
+            raise ValueError("limite e deslocamento não podem ser negativos")
+        todos = info.context.catalogo.get_fornecedores_por_solucao(self.uf, self.solucao)
+        pagina = todos[deslocamento:] if limite is None else todos[deslocamento:deslocamento + limite]
+        return await carregar_fornecedores(info, [f.id for f in pagina])
+    
+    @strawberry.field
+    def melhor_economia(self, info: strawberry.Info) -> Optional[EconomiaFornecedorType]:
+        return memorizar(
+            self.calculos, "melhor_economia",
+            lambda: calcular_melhor_economia(info.context.catalogo, self.uf, self.solucao, self.consumo_kwh)
+        )
 
 
 @strawberry.type
 class ResultadoSimulacao:
-    estado: EstadoType
+    """Resultado preguiçoso: cada campo só é calculado se a consulta pedir por ele.
+
+    Os cálculos ficam memorizados no objeto, que é compartilhado pelo cache de simulações
+    entre requisições da mesma versão do catálogo.
+    """
+    uf: strawberry.Private[str]
+    tarifa_base_kwh: strawberry.Private[float]
+    consumo_kwh: float
+    total_fornecedores: int
+    calculos: strawberry.Private[Dict[str, Any]] = dataclasses.field(default_factory=dict)
+    
+    @strawberry.field
+    async def estado(self, info: strawberry.Info) -> EstadoType:
+        return await carregar_estado(info, self.uf)
+    
+    @strawberry.field
+    def custo_atual_mensal(self) -> float:
+        return round(self.consumo_kwh * self.tarifa_base_kwh, 2)
+    
+    @strawberry.field
+    def custo_atual_anual(self) -> float:
+        return round(self.consumo_kwh * self.tarifa_base_kwh * 12, 2)
+    
+    @strawberry.field
+    def solucoes_disponiveis(self, info: strawberry.Info) -> List[SolucaoDisponivel]:
+        catalogo = info.context.catalogo
+        return memorizar(
+            self.calculos, "solucoes_disponiveis",
+            lambda: [
+                SolucaoDisponivel(
+                    tipo=solucao.value, uf=self.uf, solucao=solucao, consumo_kwh=self.consumo_kwh
+                )
+                for solucao in SolucaoTipo
+                if catalogo.get_fornecedores_por_solucao(self.uf, solucao)
+            ]
+        )
+
+
+@strawberry.input
+class SimulacaoInput:
+    uf: str
+    consumo_kwh: float
+
+
+@strawberry.type
+class ResultadoSimulacaoLote:
+    uf: str
     consumo_kwh: float
     custo_atual_mensal: float
     custo_atual_anual: float
-    solucoes_disponiveis: List[SolucaoDisponivel]
-    total_fornecedores: int
+    melhores_economias: List[EconomiaFornecedorType]
+
+
+def arredondar(valores: np.ndarray) -> List[float]:
+    return [round(v, 2) for v in valores.tolist()]
+
+
+@strawberry.type
+class CurvaFornecedor:
+    curva: strawberry.Private[CurvaSolucaoCalculada]
+    linha: strawberry.Private[int]
+    
+    def custo(self) -> np.ndarray:
+        # Mesmas operações de calcular_economia, elemento a elemento
+        return self.curva.precos[self.linha] * self.curva.consumos
+    
+    def economia(self) -> np.ndarray:
+        return self.curva.custo_atual - self.custo()
+    
+    @strawberry.field
+    async def fornecedor(self, info: strawberry.Info) -> FornecedorType:
+        return await carregar_fornecedor(info, self.curva.fornecedores[self.linha].id)
+    
+    @strawberry.field
+    def custo_com_fornecedor(self) -> List[float]:
+        return arredondar(self.custo())
+    
+    @strawberry.field
+    def economia_mensal(self) -> List[float]:
+        return arredondar(self.economia())
+    
+    @strawberry.field
+    def economia_percentual(self) -> List[float]:
+        custo_atual = self.curva.custo_atual
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return arredondar(np.where(custo_atual > 0, self.economia() / custo_atual * 100, 0.0))
+
+
+@strawberry.type
+class CurvaSolucao:
+    tipo: str
+    curva: strawberry.Private[CurvaSolucaoCalculada]
+    
+    @strawberry.field
+    def melhor_economia_mensal(self) -> List[float]:
+        # Preços em ordem crescente e consumos não negativos: o primeiro é o melhor em todos os pontos
+        return CurvaFornecedor(curva=self.curva, linha=0).economia_mensal()
+    
+    @strawberry.field
+    def fornecedores(self) -> List[CurvaFornecedor]:
+        return [CurvaFornecedor(curva=self.curva, linha=i) for i in range(len(self.curva.fornecedores))]
+
+
+@strawberry.type
+class CurvaEconomia:
+    """Economia em vários pontos de consumo; as listas de cada fornecedor seguem `consumos_kwh`."""
+    uf: str
+    consumos_kwh: List[float]
+    custo_atual: strawberry.Private[np.ndarray]
+    curvas: strawberry.Private[List[CurvaSolucaoCalculada]]
+    
+    @strawberry.field
+    def custo_atual_mensal(self) -> List[float]:
+        return arredondar(self.custo_atual)
+    
+    @strawberry.field
+    def solucoes(self) -> List[CurvaSolucao]:
+        return [CurvaSolucao(tipo=curva.solucao.value, curva=curva) for curva in self.curvas]
+
+
+@strawberry.type
+class ComparacaoEstado:
+    uf: str
+    consumo_kwh: float
+    custo_atual_mensal: float
+    custo_atual_anual: float
+    melhor_gd: Optional[EconomiaFornecedorType]
+    melhor_mercado_livre: Optional[EconomiaFornecedorType]
+    melhor_economia: Optional[EconomiaFornecedorType]
+    
+    @strawberry.field
+    async def estado(self, info: strawberry.Info) -> EstadoType:
+        return await carregar_estado(info, self.uf)
+
+
+@strawberry.type
+class ProjecaoFornecedor:
+    projecao: strawberry.Private[ProjecaoSolucaoCalculada]
+    linha: strawberry.Private[int]
+    
+    @strawberry.field
+    async def fornecedor(self, info: strawberry.Info) -> FornecedorType:
+        return await carregar_fornecedor(info, self.projecao.fornecedores[self.linha].id)
+    
+    @strawberry.field
+    def custo_mensal(self) -> List[float]:
+        return arredondar(self.projecao.custo_mensal[self.linha])
+    
+    @strawberry.field
+    def economia_mensal(self) -> List[float]:
+        return arredondar(self.projecao.economia_mensal[self.linha])
+    
+    @strawberry.field
+    def economia_acumulada(self) -> List[float]:
+        return arredondar(self.projecao.economia_acumulada[self.linha])
+    
+    @strawberry.field
+    def economia_total(self) -> float:
+        return round(float(self.projecao.economia_acumulada[self.linha, -1]), 2)
+    
+    @strawberry.field
+    def payback_meses(self) -> Optional[int]:
+        """Mês em que a economia acumulada cobre o custo de migração; nulo se não cobrir no prazo."""
+        payback = int(self.projecao.payback_meses[self.linha])
+        return payback if payback > 0 else None
+    
+    @strawberry.field
+    def vpl(self) -> float:
+        return round(float(self.projecao.vpl[self.linha]), 2)
+
+
+@strawberry.type
+class ProjecaoSolucao:
+    tipo: str
+    projecao: strawberry.Private[ProjecaoSolucaoCalculada]
+    
+    @strawberry.field
+    def melhor_vpl(self) -> ProjecaoFornecedor:
+        return ProjecaoFornecedor(projecao=self.projecao, linha=int(self.projecao.vpl.argmax()))
+    
+    @strawberry.field
+    def fornecedores(self) -> List[ProjecaoFornecedor]:
+        return [ProjecaoFornecedor(projecao=self.projecao, linha=i) for i in range(len(self.projecao.fornecedores))]
+
+
+@strawberry.type
+class ProjecaoContrato:
+    """Projeção mês a mês do contrato; as listas têm `anos` × 12 posições."""
+    uf: str
+    consumo_kwh: float
+    anos: int
+    custo_atual: strawberry.Private[np.ndarray]
+    projecoes: strawberry.Private[List[ProjecaoSolucaoCalculada]]
+    
+    @strawberry.field
+    def custo_atual_mensal(self) -> List[float]:
+        return arredondar(self.custo_atual)
+    
+    @strawberry.field
+    def custo_atual_total(self) -> float:
+        return round(float(self.custo_atual.sum()), 2)
+    
+    @strawberry.field
+    def solucoes(self) -> List[ProjecaoSolucao]:
+        return [ProjecaoSolucao(tipo=p.solucao.value, projecao=p) for p in self.projecoes]
+
+
+@strawberry.input
+class PerfilCargaInput:
+    """Consumo de um cliente: as horas do ano (kWh) ou os 12 meses, com a demanda opcional."""
+    consumo_horario_kwh: Optional[List[float]] = None
+    consumo_mensal_kwh: Optional[List[float]] = None
+    demanda_mensal_kw: Optional[List[float]] = None
+
+
+@strawberry.type
+class OfertaTarifa:
+    tarifacao: strawberry.Private[TarifacaoSolucao]
+    linha: strawberry.Private[int]
+    perfil: strawberry.Private[int]
+    custo_atual_anual: strawberry.Private[float]
+    
+    @strawberry.field
+    async def fornecedor(self, info: strawberry.Info) -> FornecedorType:
+        return await carregar_fornecedor(info, self.tarifacao.fornecedores[self.linha].id)
+    
+    @strawberry.field
+    def custo_mensal(self) -> List[float]:
+        return arredondar(self.tarifacao.custo_mensal[self.linha, self.perfil])
+    
+    @strawberry.field
+    def custo_anual(self) -> float:
+        return round(float(self.tarifacao.custo_mensal[self.linha, self.perfil].sum()), 2)
+    
+    @strawberry.field
+    def economia_anual(self) -> float:
+        return round(float(self.tarifacao.economia_anual[self.linha, self.perfil]), 2)
+    
+    @strawberry.field
+    def economia_percentual(self) -> float:
+        if self.custo_atual_anual <= 0:
+            return 0.0
+        return round(float(self.tarifacao.economia_anual[self.linha, self.perfil]) / self.custo_atual_anual * 100, 2)
+
+
+@strawberry.type
+class TarifaSolucao:
+    tipo: str
+    tarifacao: strawberry.Private[TarifacaoSolucao]
+    perfil: strawberry.Private[int]
+    custo_atual_anual: strawberry.Private[float]
+    
+    def _oferta(self, linha: int) -> OfertaTarifa:
+        return OfertaTarifa(
+            tarifacao=self.tarifacao, linha=linha, perfil=self.perfil, custo_atual_anual=self.custo_atual_anual
+        )
+    
+    @strawberry.field
+    def melhor_oferta(self) -> OfertaTarifa:
+        return self._oferta(int(self.tarifacao.economia_anual[:, self.perfil].argmax()))
+    
+    @strawberry.field
+    def ofertas(self, limite: Optional[int] = None) -> List[OfertaTarifa]:
+        """Ofertas da maior para a menor economia anual."""
+        if limite is not None and limite < 0:
+            raise ValueError("limite não pode ser negativo")
+        # Ordenação estável: em caso de empate prevalece a ordem de custo do catálogo
+        ordem = np.argsort(-self.tarifacao.economia_anual[:, self.perfil], kind="stable")
+        return [self._oferta(int(linha)) for linha in ordem[:limite]]
+
+
+@strawberry.type
+class ResultadoTarifa:
+    uf: str
+    consumo: strawberry.Private[np.ndarray]
+    custo_atual: strawberry.Private[np.ndarray]
+    perfil: strawberry.Private[int]
+    tarifacoes: strawberry.Private[List[TarifacaoSolucao]]
+    
+    @strawberry.field
+    def consumo_mensal_kwh(self) -> List[float]:
+        return arredondar(self.consumo)
+    
+    @strawberry.field
+    def consumo_anual_kwh(self) -> float:
+        return round(float(self.consumo.sum()), 2)
+    
+    @strawberry.field
+    def custo_atual_mensal(self) -> List[float]:
+        return arredondar(self.custo_atual)
+    
+    @strawberry.field
+    def custo_atual_anual(self) -> float:
+        return round(float(self.custo_atual.sum()), 2)
+    
+    @strawberry.field
+    def solucoes(self) -> List[TarifaSolucao]:
+        custo_atual_anual = float(self.custo_atual.sum())
+        return [
+            TarifaSolucao(
+                tipo=t.solucao.value, tarifacao=t, perfil=self.perfil, custo_atual_anual=custo_atual_anual
+            )
+            for t in self.tarifacoes
+        ]
 
 
 def calcular_economia(
     fornecedor: Fornecedor,
     solucao: SolucaoTipo,
     consumo_kwh: float,
-    tarifa_base: float
-) -> EconomiaFornecedor:
+    tarifa_base: float,
+    custo_com_fornecedor: Optional[float] = None
+) -> EconomiaCalculada:
     custo_atual = consumo_kwh * tarifa_base
     
-    custo_kwh_fornecedor = (
-        fornecedor.custo_kwh_gd if solucao == SolucaoTipo.GD 
-        else fornecedor.custo_kwh_ml
-    ) or 0
-    
-    custo_com_fornecedor = consumo_kwh * custo_kwh_fornecedor
+    if custo_com_fornecedor is None:
+        custo_com_fornecedor = consumo_kwh * fornecedor.custo_kwh(solucao)
     economia_mensal = custo_atual - custo_com_fornecedor
     economia_percentual = (economia_mensal / custo_atual * 100) if custo_atual > 0 else 0
     economia_anual = economia_mensal * 12
     
-    return EconomiaFornecedor(
+    return EconomiaCalculada(
         fornecedor=fornecedor,
         solucao=solucao,
         custo_atual=custo_atual,
@@ -81,23 +469,247 @@ def calcular_economia(
     )
 
 
+def calcular_economia_lote(
+    entradas: Sequence[Tuple[str, float]],
+    catalogo: Optional[Catalogo] = None
+) -> List[Optional[SimulacaoLote]]:
+    catalogo = catalogo or get_catalogo()
+    resultados: List[Optional[SimulacaoLote]] = [None] * len(entradas)
+    
+    indices_por_uf: Dict[str, List[int]] = defaultdict(list)
+    for i, (uf, consumo_kwh) in enumerate(entradas):
+        if consumo_kwh > 0:
+            indices_por_uf[uf].append(i)
+    
+    for uf, indices in indices_por_uf.items():
+        estado = catalogo.get_estado(uf)
+        if not estado or not catalogo.get_fornecedores_por_estado(uf):
+            continue
+        
+        consumos = np.array([entradas[i][1] for i in indices], dtype=np.float64)
+        custos_atuais = consumos * estado.tarifa_base_kwh
+        melhores: List[List[EconomiaCalculada]] = [[] for _ in indices]
+        
+        for solucao in SolucaoTipo:
+            precos = catalogo.get_precos_por_custo(uf, solucao)
+            if not len(precos):
+                continue
+            fornecedores = catalogo.get_fornecedores_por_custo(uf, solucao)
+            
+            passo = max(1, MAX_CELULAS_LOTE // len(precos))
+            for inicio in range(0, len(indices), passo):
+                fim = inicio + passo
+                consumo = consumos[inicio:fim]
+                custo_atual = custos_atuais[inicio:fim]
+                
+                # Matriz clientes × fornecedores com as mesmas operações de calcular_economia
+                custo_com_fornecedor = consumo[:, None] * precos[None, :]
+                economia = custo_atual[:, None] - custo_com_fornecedor
+                melhor = economia.argmax(axis=1)
+                linhas = np.arange(len(melhor))
+                
+                economia_mensal = economia[linhas, melhor]
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    economia_percentual = np.where(
+                        custo_atual > 0, economia_mensal / custo_atual * 100, 0.0
+                    )
+                
+                colunas = zip(
+                    melhor.tolist(),
+                    custo_atual.tolist(),
+                    custo_com_fornecedor[linhas, melhor].tolist(),
+                    economia_mensal.tolist(),
+                    economia_percentual.tolist(),
+                    (economia_mensal * 12).tolist()
+                )
+                for k, (j, atual, com_fornecedor, mensal, percentual, anual) in enumerate(colunas):
+                    melhores[inicio + k].append(EconomiaCalculada(
+                        fornecedor=fornecedores[j],
+                        solucao=solucao,
+                        custo_atual=atual,
+                        custo_com_fornecedor=com_fornecedor,
+                        economia_mensal=mensal,
+                        economia_percentual=percentual,
+                        economia_anual=anual
+                    ))
+        
+        for k, i in enumerate(indices):
+            custo_atual_mensal = float(custos_atuais[k])
+            resultados[i] = SimulacaoLote(
+                uf=uf,
+                consumo_kwh=entradas[i][1],
+                custo_atual_mensal=custo_atual_mensal,
+                custo_atual_anual=custo_atual_mensal * 12,
+                melhores_economias=melhores[k]
+            )
+    
+    return resultados
+
+
+def comparar_estados(
+    entradas: Sequence[Tuple[str, float]],
+    catalogo: Optional[Catalogo] = None
+) -> List[SimulacaoLote]:
+    """Melhor oferta de cada solução para cada (uf, consumo), ordenado pela maior economia.
+
+    Uma matriz entradas × fornecedores por solução, montada a partir da matriz de preços
+    estados × fornecedores do catálogo. Entradas com UF desconhecida ou consumo não
+    positivo ficam de fora.
+    """
+    catalogo = catalogo or get_catalogo()
+    validas = [(uf, consumo) for uf, consumo in entradas if consumo > 0 and uf in catalogo.linha_por_uf]
+    linhas = np.array([catalogo.linha_por_uf[uf] for uf, _ in validas], dtype=np.intp)
+    consumos = np.array([consumo for _, consumo in validas], dtype=np.float64)
+    custos_atuais = consumos * catalogo.tarifas[linhas]
+    melhores: List[List[EconomiaCalculada]] = [[] for _ in validas]
+    
+    for solucao in SolucaoTipo:
+        precos_por_estado = catalogo.precos_por_estado[solucao]
+        if not precos_por_estado.shape[1]:
+            continue
+        
+        passo = max(1, MAX_CELULAS_LOTE // precos_por_estado.shape[1])
+        for inicio in range(0, len(validas), passo):
+            fim = inicio + passo
+            consumo = consumos[inicio:fim]
+            custo_atual = custos_atuais[inicio:fim]
+            
+            # Colunas +inf (estado com menos fornecedores) resultam em economia -inf e nunca vencem
+            custo_com_fornecedor = consumo[:, None] * precos_por_estado[linhas[inicio:fim]]
+            economia = custo_atual[:, None] - custo_com_fornecedor
+            melhor = economia.argmax(axis=1)
+            indices = np.arange(len(melhor))
+            
+            economia_mensal = economia[indices, melhor]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                economia_percentual = np.where(
+                    custo_atual > 0, economia_mensal / custo_atual * 100, 0.0
+                )
+            
+            colunas = zip(
+                melhor.tolist(),
+                custo_atual.tolist(),
+                custo_com_fornecedor[indices, melhor].tolist(),
+                economia_mensal.tolist(),
+                economia_percentual.tolist(),
+                (economia_mensal * 12).tolist()
+            )
+            for k, (j, atual, com_fornecedor, mensal, percentual, anual) in enumerate(colunas, start=inicio):
+                if com_fornecedor == np.inf:
+                    continue
+                melhores[k].append(EconomiaCalculada(
+                    fornecedor=catalogo.get_fornecedores_por_custo(validas[k][0], solucao)[j],
+                    solucao=solucao,
+                    custo_atual=atual,
+                    custo_com_fornecedor=com_fornecedor,
+                    economia_mensal=mensal,
+                    economia_percentual=percentual,
+                    economia_anual=anual
+                ))
+    
+    resultados = [
+        SimulacaoLote(
+            uf=uf,
+            consumo_kwh=consumo_kwh,
+            custo_atual_mensal=custo_atual_mensal,
+            custo_atual_anual=custo_atual_mensal * 12,
+            melhores_economias=melhores[k]
+        )
+        for k, ((uf, consumo_kwh), custo_atual_mensal) in enumerate(zip(validas, custos_atuais.tolist()))
+    ]
+    resultados.sort(
+        key=lambda r: max((e.economia_mensal for e in r.melhores_economias), default=-np.inf),
+        reverse=True
+    )
+    return resultados
+
+
 def converter_fornecedor(fornecedor: Fornecedor) -> FornecedorType:
     return FornecedorType(
         id=fornecedor.id,
         nome=fornecedor.nome,
         logo=fornecedor.logo,
         estado=fornecedor.estado,
-        solucoes=[s.value for s in fornecedor.solucoes],
+        solucoes=tuple(s.value for s in fornecedor.solucoes),
         custo_kwh_gd=fornecedor.custo_kwh_gd,
         custo_kwh_ml=fornecedor.custo_kwh_ml,
         total_clientes=fornecedor.total_clientes,
-        avaliacao_media=fornecedor.avaliacao_media
+        avaliacao_media=fornecedor.avaliacao_media,
+        estruturas_tarifarias=[
+            EstruturaTarifariaSolucaoType(solucao=solucao.value, estrutura=converter_estrutura(estrutura))
+            for solucao, estrutura in fornecedor.estruturas_tarifarias.items()
+        ]
     )
 
 
-def converter_economia(economia: EconomiaFornecedor) -> EconomiaFornecedorType:
+def converter_estado(estado: Estado) -> EstadoType:
+    return EstadoType(
+        uf=estado.uf,
+        nome=estado.nome,
+        tarifa_base_kwh=estado.tarifa_base_kwh,
+        estrutura_tarifaria=(
+            converter_estrutura(estado.estrutura_tarifaria) if estado.estrutura_tarifaria is not None else None
+        )
+    )
+
+
+def converter_estrutura(estrutura: EstruturaTarifaria) -> EstruturaTarifariaType:
+    return EstruturaTarifariaType(
+        tarifa_fora_ponta_kwh=estrutura.tarifa_fora_ponta_kwh,
+        tarifa_ponta_kwh=estrutura.tarifa_ponta_kwh,
+        inicio_ponta=estrutura.inicio_ponta,
+        fim_ponta=estrutura.fim_ponta,
+        ponta_fim_de_semana=estrutura.ponta_fim_de_semana,
+        faixas=[FaixaConsumoType(ate_kwh=f.ate_kwh, tarifa_kwh=f.tarifa_kwh) for f in estrutura.faixas],
+        tarifa_demanda_kw=estrutura.tarifa_demanda_kw,
+        taxa_fixa_mensal=estrutura.taxa_fixa_mensal,
+        adicionais_bandeira=[
+            AdicionalBandeiraType(bandeira=bandeira, adicional_kwh=adicional)
+            for bandeira, adicional in estrutura.adicional_bandeira_kwh.items()
+        ]
+    )
+
+
+def fornecedor_type(catalogo: Catalogo, fornecedor: Fornecedor) -> FornecedorType:
+    """Um único FornecedorType por fornecedor e versão do catálogo, compartilhado entre requisições."""
+    tipos = catalogo.derivados["fornecedor_type"]
+    tipo = tipos.get(fornecedor.id)
+    if tipo is None:
+        tipo = tipos[fornecedor.id] = converter_fornecedor(fornecedor)
+    return tipo
+
+
+def estado_type(catalogo: Catalogo, estado: Estado) -> EstadoType:
+    tipos = catalogo.derivados["estado_type"]
+    tipo = tipos.get(estado.uf)
+    if tipo is None:
+        tipo = tipos[estado.uf] = converter_estado(estado)
+    return tipo
+
+
+async def carregar_fornecedores(info: strawberry.Info, ids: List[str]) -> List[FornecedorType]:
+    """Fornecedores pelo DataLoader da operação; um id que não está no catálogo vira erro do campo."""
+    fornecedores = await info.context.fornecedores.load_many(ids)
+    faltando = [i for i, f in zip(ids, fornecedores) if f is None]
+    if faltando:
+        raise ValueError(f"Fornecedor não encontrado: {', '.join(faltando)}")
+    return [fornecedor_type(info.context.catalogo, f) for f in fornecedores]
+
+
+async def carregar_fornecedor(info: strawberry.Info, fornecedor_id: str) -> FornecedorType:
+    return (await carregar_fornecedores(info, [fornecedor_id]))[0]
+
+
+async def carregar_estado(info: strawberry.Info, uf: str) -> EstadoType:
+    estado = await info.context.estados.load(uf)
+    if estado is None:
+        raise ValueError(f"Estado não encontrado: {uf}")
+    return estado_type(info.context.catalogo, estado)
+
+
+def converter_economia(economia: EconomiaCalculada) -> EconomiaFornecedorType:
     return EconomiaFornecedorType(
-        fornecedor=converter_fornecedor(economia.fornecedor),
+        fornecedor_id=economia.fornecedor.id,
         solucao=economia.solucao.value,
         custo_atual=round(economia.custo_atual, 2),
         custo_com_fornecedor=round(economia.custo_com_fornecedor, 2),
@@ -107,74 +719,258 @@ def converter_economia(economia: EconomiaFornecedor) -> EconomiaFornecedorType:
     )
 
 
+def converter_simulacao_lote(simulacao: SimulacaoLote) -> ResultadoSimulacaoLote:
+    return ResultadoSimulacaoLote(
+        uf=simulacao.uf,
+        consumo_kwh=simulacao.consumo_kwh,
+        custo_atual_mensal=round(simulacao.custo_atual_mensal, 2),
+        custo_atual_anual=round(simulacao.custo_atual_anual, 2),
+        melhores_economias=[converter_economia(e) for e in simulacao.melhores_economias]
+    )
+
+
+def converter_comparacao(simulacao: SimulacaoLote) -> ComparacaoEstado:
+    por_solucao = {e.solucao: converter_economia(e) for e in simulacao.melhores_economias}
+    melhor = max(simulacao.melhores_economias, key=lambda e: e.economia_mensal, default=None)
+    return ComparacaoEstado(
+        uf=simulacao.uf,
+        consumo_kwh=simulacao.consumo_kwh,
+        custo_atual_mensal=round(simulacao.custo_atual_mensal, 2),
+        custo_atual_anual=round(simulacao.custo_atual_anual, 2),
+        melhor_gd=por_solucao.get(SolucaoTipo.GD),
+        melhor_mercado_livre=por_solucao.get(SolucaoTipo.MERCADO_LIVRE),
+        melhor_economia=por_solucao[melhor.solucao] if melhor else None
+    )
+
+
+def calcular_melhor_economia(
+    catalogo: Catalogo,
+    uf: str,
+    solucao: SolucaoTipo,
+    consumo_kwh: float
+) -> Optional[EconomiaFornecedorType]:
+    estado = catalogo.get_estado(uf)
+    vencedor = catalogo.get_melhor_fornecedor(uf, solucao, consumo_kwh)
+    if not estado or not vencedor:
+        return None
+    # Pela mesma curva que escolheu o vencedor no índice
+    custo = custo_curva(vencedor.curva_custo(solucao), consumo_kwh)
+    return converter_economia(
+        calcular_economia(vencedor, solucao, consumo_kwh, estado.tarifa_base_kwh, custo)
+    )
+
+
+def simular(uf: str, consumo_kwh: float, catalogo: Catalogo) -> Optional[ResultadoSimulacao]:
+    if consumo_kwh <= 0:
+        return None
+    
+    estado = catalogo.get_estado(uf)
+    if not estado:
+        return None
+    
+    fornecedores = catalogo.get_fornecedores_por_estado(uf)
+    if not fornecedores:
+        return None
+    
+    return ResultadoSimulacao(
+        uf=estado.uf,
+        tarifa_base_kwh=estado.tarifa_base_kwh,
+        consumo_kwh=consumo_kwh,
+        total_fornecedores=len(fornecedores)
+    )
+
+
+def pontos_curva(
+    pontos: Optional[List[float]],
+    consumo_minimo: Optional[float],
+    consumo_maximo: Optional[float],
+    passos: int
+) -> np.ndarray:
+    if pontos is not None:
+        consumos = np.array(pontos, dtype=np.float64)
+    elif consumo_minimo is not None and consumo_maximo is not None:
+        if not 2 <= passos <= MAX_PONTOS_CURVA:
+            raise ValueError(f"passos deve estar entre 2 e {MAX_PONTOS_CURVA}")
+        if consumo_maximo <= consumo_minimo:
+            raise ValueError("consumoMaximo deve ser maior que consumoMinimo")
+        consumos = np.linspace(consumo_minimo, consumo_maximo, passos)
+    else:
+        raise ValueError("Informe pontos ou consumoMinimo e consumoMaximo")
+    
+    if len(consumos) > MAX_PONTOS_CURVA:
+        raise ValueError(f"No máximo {MAX_PONTOS_CURVA} pontos por curva")
+    if not np.all(np.isfinite(consumos)) or np.any(consumos < 0):
+        raise ValueError("Os consumos devem ser números finitos e não negativos")
+    return consumos
+
+
+def calcular_curva_economia(uf: str, consumos: np.ndarray, catalogo: Catalogo) -> Optional[CurvaEconomia]:
+    """Curva por solução; cada linha fornecedor × pontos só é calculada quando a resposta a pede."""
+    estado = catalogo.get_estado(uf)
+    if not estado or not catalogo.get_fornecedores_por_estado(uf):
+        return None
+    
+    custo_atual = consumos * estado.tarifa_base_kwh
+    curvas = [
+        CurvaSolucaoCalculada(
+            solucao=solucao,
+            fornecedores=catalogo.get_fornecedores_por_custo(uf, solucao),
+            precos=catalogo.get_precos_por_custo(uf, solucao),
+            consumos=consumos,
+            custo_atual=custo_atual
+        )
+        for solucao in SolucaoTipo if len(catalogo.get_precos_por_custo(uf, solucao))
+    ]
+    return CurvaEconomia(uf=estado.uf, consumos_kwh=consumos.tolist(), custo_atual=custo_atual, curvas=curvas)
+
+
+def simular_tarifas(
+    uf: str,
+    perfis: Sequence[PerfilCargaInput],
+    catalogo: Catalogo,
+    ano: int = ANO_PADRAO,
+    bandeiras: Optional[Sequence[BandeiraTarifaria]] = None
+) -> Optional[List[ResultadoTarifa]]:
+    """Precifica os perfis em lote: os horários numa matriz e os mensais em outra."""
+    if len(perfis) > MAX_PERFIS_TARIFA:
+        raise ValueError(f"No máximo {MAX_PERFIS_TARIFA} perfis por consulta")
+    estado = catalogo.get_estado(uf)
+    if not estado:
+        return None
+    
+    horarios, mensais = [], []
+    for i, perfil in enumerate(perfis):
+        if (perfil.consumo_horario_kwh is None) == (perfil.consumo_mensal_kwh is None):
+            raise ValueError("Cada perfil deve ter consumoHorarioKwh ou consumoMensalKwh")
+        (horarios if perfil.consumo_horario_kwh is not None else mensais).append(i)
+    
+    grupos = []
+    if horarios:
+        if any(perfis[i].demanda_mensal_kw is not None for i in horarios):
+            raise ValueError("A demanda dos perfis horários é calculada a partir das horas")
+        grupos.append((horarios, PerfisCarga(
+            horarios=[perfis[i].consumo_horario_kwh for i in horarios], ano=ano
+        )))
+    if mensais:
+        demandas = [perfis[i].demanda_mensal_kw for i in mensais]
+        demanda_kw = None if all(d is None for d in demandas) else [
+            d if d is not None else [0.0] * 12 for d in demandas
+        ]
+        grupos.append((mensais, PerfisCarga(
+            mensais=[perfis[i].consumo_mensal_kwh for i in mensais], demanda_kw=demanda_kw
+        )))
+    
+    resultados: List[Optional[ResultadoTarifa]] = [None] * len(perfis)
+    for indices, carga in grupos:
+        custo_atual, tarifacoes = precificar_perfis(estado, catalogo, carga, bandeiras)
+        consumo = carga.energia_mensal()
+        for linha, i in enumerate(indices):
+            resultados[i] = ResultadoTarifa(
+                uf=estado.uf, consumo=consumo[linha], custo_atual=custo_atual[linha],
+                perfil=linha, tarifacoes=tarifacoes
+            )
+    return resultados
+
+
 @strawberry.type
 class Query:
     
     @strawberry.field
-    def estados(self) -> List[EstadoType]:
+    def estados(self, info: strawberry.Info) -> List[EstadoType]:
+        catalogo = info.context.catalogo
+        return [estado_type(catalogo, e) for e in catalogo.estados]
+    
+    @strawberry.field
+    def simular_economia(
+        self, info: strawberry.Info, uf: str, consumo_kwh: float
+    ) -> Optional[ResultadoSimulacao]:
+        catalogo = info.context.catalogo
+        return cache_simulacoes.get_or_set(
+            (uf, consumo_kwh, catalogo.versao),
+            lambda: simular(uf, consumo_kwh, catalogo)
+        )
+    
+    @strawberry.field
+    def simular_economia_lote(
+        self, info: strawberry.Info, entradas: List[SimulacaoInput]
+    ) -> List[Optional[ResultadoSimulacaoLote]]:
+        simulacoes = calcular_economia_lote(
+            [(e.uf, e.consumo_kwh) for e in entradas], info.context.catalogo
+        )
         return [
-            EstadoType(uf=e.uf, nome=e.nome, tarifa_base_kwh=e.tarifa_base_kwh)
-            for e in ESTADOS
+            converter_simulacao_lote(simulacao) if simulacao else None
+            for simulacao in simulacoes
         ]
     
     @strawberry.field
-    def simular_economia(self, uf: str, consumo_kwh: float) -> Optional[ResultadoSimulacao]:
-        if consumo_kwh <= 0:
-            return None
-        
-        estado = get_estado(uf)
-        if not estado:
-            return None
-        
-        fornecedores = get_fornecedores_por_estado(uf)
-        if not fornecedores:
+    def comparar_estados(
+        self,
+        info: strawberry.Info,
+        consumo_kwh: Optional[float] = None,
+        unidades: Optional[List[SimulacaoInput]] = None
+    ) -> List[ComparacaoEstado]:
+        catalogo = info.context.catalogo
+        if (consumo_kwh is None) == (unidades is None):
+            raise ValueError("Informe consumoKwh (mesmo consumo em todos os estados) ou unidades")
+        entradas = (
+            [(e.uf, consumo_kwh) for e in catalogo.estados] if unidades is None
+            else [(u.uf, u.consumo_kwh) for u in unidades]
+        )
+        return [converter_comparacao(c) for c in comparar_estados(entradas, catalogo)]
+    
+    @strawberry.field
+    def curva_economia(
+        self,
+        info: strawberry.Info,
+        uf: str,
+        pontos: Optional[List[float]] = None,
+        consumo_minimo: Optional[float] = None,
+        consumo_maximo: Optional[float] = None,
+        passos: int = 50
+    ) -> Optional[CurvaEconomia]:
+        consumos = pontos_curva(pontos, consumo_minimo, consumo_maximo, passos)
+        return calcular_curva_economia(uf, consumos, info.context.catalogo)
+    
+    @strawberry.field
+    def simular_tarifas(
+        self,
+        info: strawberry.Info,
+        uf: str,
+        perfis: List[PerfilCargaInput],
+        ano: int = ANO_PADRAO,
+        bandeiras: Optional[List[BandeiraTarifariaEnum]] = None
+    ) -> Optional[List[ResultadoTarifa]]:
+        """Custos e ofertas pelas estruturas tarifárias, com uma bandeira por mês (verde por padrão)."""
+        return simular_tarifas(uf, perfis, info.context.catalogo, ano, bandeiras)
+    
+    @strawberry.field
+    def projecao_contrato(
+        self,
+        info: strawberry.Info,
+        uf: str,
+        consumo_kwh: float,
+        anos: int = 5,
+        reajuste_tarifa_percentual: float = 0.0,
+        reajuste_contrato_percentual: float = 0.0,
+        taxa_desconto_percentual: float = 0.0,
+        custo_migracao: float = 0.0
+    ) -> Optional[ProjecaoContrato]:
+        """Custo, economia acumulada, payback e VPL de cada fornecedor ao longo do contrato."""
+        cenario = CenarioContrato(
+            anos, reajuste_tarifa_percentual, reajuste_contrato_percentual, taxa_desconto_percentual, custo_migracao
+        )
+        projecao = projetar_contrato(uf, consumo_kwh, cenario, info.context.catalogo)
+        if projecao is None:
             return None
-        
-        custo_atual_mensal = consumo_kwh * estado.tarifa_base_kwh
-        custo_atual_anual = custo_atual_mensal * 12
-        
-        solucoes_map: dict[SolucaoTipo, List[Fornecedor]] = {
-            SolucaoTipo.GD: [],
-            SolucaoTipo.MERCADO_LIVRE: []
-        }
-        
-        for fornecedor in fornecedores:
-            for solucao in fornecedor.solucoes:
-                solucoes_map[solucao].append(fornecedor)
-        
-        solucoes_disponiveis: List[SolucaoDisponivel] = []
-        
-        for solucao_tipo, fornecedores_solucao in solucoes_map.items():
-            if not fornecedores_solucao:
-                continue
-            
-            economias = [
-                calcular_economia(f, solucao_tipo, consumo_kwh, estado.tarifa_base_kwh)
-                for f in fornecedores_solucao
-            ]
-            
-            melhor = max(economias, key=lambda e: e.economia_mensal)
-            
-            solucoes_disponiveis.append(
-                SolucaoDisponivel(
-                    tipo=solucao_tipo.value,
-                    fornecedores=[converter_fornecedor(f) for f in fornecedores_solucao],
-                    melhor_economia=converter_economia(melhor)
-                )
-            )
-        
-        return ResultadoSimulacao(
-            estado=EstadoType(
-                uf=estado.uf,
-                nome=estado.nome,
-                tarifa_base_kwh=estado.tarifa_base_kwh
-            ),
-            consumo_kwh=consumo_kwh,
-            custo_atual_mensal=round(custo_atual_mensal, 2),
-            custo_atual_anual=round(custo_atual_anual, 2),
-            solucoes_disponiveis=solucoes_disponiveis,
-            total_fornecedores=len(fornecedores)
+        custo_atual, projecoes = projecao
+        return ProjecaoContrato(
+            uf=uf, consumo_kwh=consumo_kwh, anos=anos, custo_atual=custo_atual, projecoes=projecoes
         )
 
 
-schema = strawberry.Schema(query=Query)
\ No newline at end of file
+metricas.registrar_cache("simulacoes", cache_simulacoes)
+metricas.registrar_cache("documentos", cache_documentos)
+
+schema = strawberry.Schema(
+    query=Query, extensions=[MetricasGraphQL, RastreamentoGraphQL, CacheDocumentos, LimiteCusto]
+)
\ No newline at end of file
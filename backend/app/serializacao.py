@@ -0,0 +1,42 @@
+import json
+import os
+from typing import Any, Callable, Dict, Optional
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson é opcional
+    orjson = None
+
+
+def _dumps_padrao(dados: Any) -> bytes:
+    return json.dumps(dados, ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode("utf-8")
+
+
+def _dumps_orjson(dados: Any) -> bytes:
+    return orjson.dumps(dados, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+SERIALIZADORES: Dict[str, Callable[[Any], bytes]] = {"json": _dumps_padrao}
+if orjson is not None:
+    SERIALIZADORES["orjson"] = _dumps_orjson
+
+
+def escolher_serializador(nome: Optional[str] = None) -> Callable[[Any], bytes]:
+    """Serializador JSON → bytes UTF-8. `auto` usa orjson quando instalado."""
+    nome = nome or os.getenv("JSON_SERIALIZADOR", "auto")
+    if nome == "auto":
+        nome = "orjson" if "orjson" in SERIALIZADORES else "json"
+    if nome not in SERIALIZADORES:
+        raise ValueError(f"Serializador desconhecido ou não instalado: {nome}")
+    return SERIALIZADORES[nome]
+
+
+serializar_json = escolher_serializador()
+
+
+class RespostaJSON(JSONResponse):
+    """Resposta padrão das rotas FastAPI, com o mesmo serializador do GraphQL."""
+
+    def render(self, content: Any) -> bytes:
+        return serializar_json(content)
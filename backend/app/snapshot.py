@@ -0,0 +1,249 @@
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from app.models import ESTRUTURAS_POR_SOLUCAO, Estado, EstruturaTarifaria, Fornecedor
+from app.data import COLUNAS_FORNECEDORES, Catalogo, FornecedoresColunares, publicar_catalogo
+
+
+FORMATO = 1
+PONTEIRO = "ATUAL"
+
+COLUNAS_ESTADOS = {"uf": "U", "nome": "U", "tarifa_base_kwh": "f8"}
+
+
+class ErroSnapshot(ValueError):
+    pass
+
+
+def _nome_versao(versao: int) -> str:
+    return f"{versao:08d}"
+
+
+def listar_versoes(raiz: str | Path) -> List[int]:
+    raiz = Path(raiz)
+    if not raiz.is_dir():
+        return []
+    return sorted(int(d.name) for d in raiz.iterdir() if d.is_dir() and d.name.isdigit())
+
+
+def snapshot_atual(raiz: str | Path) -> Optional[Path]:
+    ponteiro = Path(raiz) / PONTEIRO
+    if not ponteiro.exists():
+        return None
+    return Path(raiz) / ponteiro.read_text().strip()
+
+
+def ativar_snapshot(raiz: str | Path, versao: int) -> Path:
+    """Aponta ATUAL para uma versão existente (também serve para rollback)."""
+    raiz = Path(raiz)
+    diretorio = raiz / _nome_versao(versao)
+    if not (diretorio / "manifest.json").exists():
+        raise ErroSnapshot(f"Snapshot {versao} não encontrado em {raiz}")
+    temporario = raiz / f".{PONTEIRO}.tmp"
+    temporario.write_text(diretorio.name)
+    os.replace(temporario, raiz / PONTEIRO)
+    return diretorio
+
+
+def _salvar_coluna(diretorio: Path, tabela: str, coluna: str, valores: Sequence, tipo: str) -> None:
+    array = np.asarray(valores, dtype=str if tipo == "U" else tipo)
+    np.save(diretorio / f"{tabela}.{coluna}.npy", array, allow_pickle=False)
+
+
+def salvar_snapshot(
+    raiz: str | Path, estados: Iterable[Estado], fornecedores: Iterable[Fornecedor],
+    versao: Optional[int] = None, ativar: bool = True
+) -> Path:
+    """Grava um snapshot colunar em `raiz/<versao>/` e, por padrão, o torna o atual.
+
+    O diretório é montado com outro nome e renomeado no fim, então um vigia nunca
+    enxerga um snapshot pela metade.
+    """
+    raiz = Path(raiz)
+    raiz.mkdir(parents=True, exist_ok=True)
+    versao = versao if versao is not None else max(listar_versoes(raiz), default=0) + 1
+    destino = raiz / _nome_versao(versao)
+    if destino.exists():
+        raise ErroSnapshot(f"Snapshot {versao} já existe em {raiz}")
+
+    estados = list(estados)
+    fornecedores = list(fornecedores)
+    temporario = raiz / f".{destino.name}.tmp"
+    shutil.rmtree(temporario, ignore_errors=True)
+    temporario.mkdir()
+
+    colunas_estados = {
+        "uf": [e.uf for e in estados],
+        "nome": [e.nome for e in estados],
+        "tarifa_base_kwh": [e.tarifa_base_kwh for e in estados],
+    }
+    colunas_fornecedores = FornecedoresColunares.de_modelos(fornecedores).colunas
+    for tabela, colunas, tipos in (
+        ("estados", colunas_estados, COLUNAS_ESTADOS),
+        ("fornecedores", colunas_fornecedores, COLUNAS_FORNECEDORES),
+    ):
+        for coluna, tipo in tipos.items():
+            _salvar_coluna(temporario, tabela, coluna, colunas[coluna], tipo)
+
+    # Poucas linhas têm estrutura tarifária: ficam no manifesto em vez de colunas de texto largas
+    estruturas = {
+        "estados": {
+            e.uf: e.estrutura_tarifaria.model_dump(mode="json")
+            for e in estados if e.estrutura_tarifaria is not None
+        },
+        "fornecedores": {
+            f.id: ESTRUTURAS_POR_SOLUCAO.dump_python(f.estruturas_tarifarias, mode="json")
+            for f in fornecedores if f.estruturas_tarifarias
+        },
+    }
+    manifesto = {
+        "formato": FORMATO,
+        "versao": versao,
+        "criado_em": datetime.now(timezone.utc).isoformat(),
+        "estados": {"linhas": len(estados), "colunas": list(COLUNAS_ESTADOS)},
+        "fornecedores": {"linhas": len(fornecedores), "colunas": list(COLUNAS_FORNECEDORES)},
+        "estruturas_tarifarias": estruturas,
+    }
+    (temporario / "manifest.json").write_text(json.dumps(manifesto, indent=2, ensure_ascii=False))
+    os.rename(temporario, destino)
+
+    if ativar:
+        ativar_snapshot(raiz, versao)
+    return destino
+
+
+def ler_manifesto(diretorio: str | Path) -> Dict:
+    caminho = Path(diretorio) / "manifest.json"
+    if not caminho.exists():
+        raise ErroSnapshot(f"{diretorio} não contém manifest.json")
+    manifesto = json.loads(caminho.read_text())
+    if manifesto.get("formato") != FORMATO:
+        raise ErroSnapshot(f"Formato de snapshot não suportado: {manifesto.get('formato')}")
+    return manifesto
+
+
+def ler_colunas(diretorio: str | Path, tabela: str) -> Dict[str, np.ndarray]:
+    """Colunas de uma tabela mapeadas em memória (somente leitura, sem cópia)."""
+    diretorio = Path(diretorio)
+    manifesto = ler_manifesto(diretorio)
+    colunas = {
+        coluna: np.load(diretorio / f"{tabela}.{coluna}.npy", mmap_mode="r", allow_pickle=False)
+        for coluna in manifesto[tabela]["colunas"]
+    }
+    if any(len(array) != manifesto[tabela]["linhas"] for array in colunas.values()):
+        raise ErroSnapshot(f"Colunas de {tabela} com tamanhos divergentes do manifesto em {diretorio}")
+    return colunas
+
+
+def carregar_snapshot(diretorio: str | Path) -> Catalogo:
+    """Constrói um Catalogo a partir das colunas mapeadas, sem revalidar linha a linha.
+
+    Os dados foram validados quando o snapshot foi gravado. Os índices e preços do
+    Catalogo saem direto das colunas; cada Fornecedor só é montado quando é lido.
+    """
+    e = ler_colunas(diretorio, "estados")
+    estruturas = ler_manifesto(diretorio).get("estruturas_tarifarias", {})
+    estruturas_estados = {
+        uf: EstruturaTarifaria.model_validate(estrutura) for uf, estrutura in estruturas.get("estados", {}).items()
+    }
+    estruturas_fornecedores = {
+        id_: ESTRUTURAS_POR_SOLUCAO.validate_python(por_solucao)
+        for id_, por_solucao in estruturas.get("fornecedores", {}).items()
+    }
+    # Uma linha por UF: poucos modelos
+    estados = [
+        Estado.model_construct(
+            uf=uf, nome=nome, tarifa_base_kwh=tarifa, estrutura_tarifaria=estruturas_estados.get(uf)
+        )
+        for uf, nome, tarifa in zip(e["uf"].tolist(), e["nome"].tolist(), e["tarifa_base_kwh"].tolist())
+    ]
+    fornecedores = FornecedoresColunares(ler_colunas(diretorio, "fornecedores"), estruturas_fornecedores)
+    return Catalogo(estados, fornecedores)
+
+
+class VigiaSnapshots:
+    """Observa o ponteiro ATUAL de um diretório de snapshots e publica as novas versões.
+
+    A construção roda fora do event loop; a publicação é a troca atômica de
+    `app.data.publicar_catalogo`, então requisições em andamento seguem com o catálogo
+    que capturaram no contexto.
+    """
+
+    def __init__(self, raiz: str | Path, intervalo_segundos: float = 5.0):
+        self.raiz = Path(raiz)
+        self.intervalo_segundos = intervalo_segundos
+        self.carregado: Optional[Path] = None
+        self.erro: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def atualizar(self, forcar: bool = False) -> Optional[Catalogo]:
+        with self._lock:
+            atual = None
+            try:
+                atual = snapshot_atual(self.raiz)
+                if atual is None or (atual == self.carregado and not forcar):
+                    return None
+                catalogo = carregar_snapshot(atual)
+            except (OSError, ValueError) as erro:
+                self.erro = f"{atual.name if atual else self.raiz}: {erro}"
+                return None
+            self.carregado, self.erro = atual, None
+            return publicar_catalogo(catalogo)
+
+    async def atualizar_async(self, forcar: bool = False) -> Optional[Catalogo]:
+        return await asyncio.to_thread(self.atualizar, forcar)
+
+    async def executar(self) -> None:
+        while True:
+            try:
+                await self.atualizar_async()
+            except Exception as erro:
+                # Um erro inesperado não pode matar o vigia: fica registrado e a próxima volta tenta de novo
+                self.erro = repr(erro)
+            await asyncio.sleep(self.intervalo_segundos)
+
+
+def criar_vigia_padrao() -> Optional[VigiaSnapshots]:
+    raiz = os.getenv("CATALOGO_SNAPSHOTS")
+    if not raiz:
+        return None
+    return VigiaSnapshots(raiz, float(os.getenv("CATALOGO_SNAPSHOTS_INTERVALO", "5")))
+
+
+vigia_snapshots = criar_vigia_padrao()
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Gera e ativa snapshots colunares do catálogo")
+    parser.add_argument("--raiz", default=os.getenv("CATALOGO_SNAPSHOTS", "snapshots"))
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("exportar", help="grava o catálogo do repositório (CATALOGO_DB ou app.data) como nova versão")
+    ativar = comandos.add_parser("ativar", help="aponta ATUAL para uma versão existente")
+    ativar.add_argument("versao", type=int)
+    comandos.add_parser("listar", help="lista as versões disponíveis")
+    args = parser.parse_args(argv)
+
+    if args.comando == "exportar":
+        from app.repositorio import criar_repositorio_padrao
+
+        repositorio = criar_repositorio_padrao()
+        destino = salvar_snapshot(args.raiz, repositorio.listar_estados(), repositorio.listar_fornecedores())
+        print(f"Snapshot gravado e ativado: {destino}")
+    elif args.comando == "ativar":
+        print(f"Snapshot ativo: {ativar_snapshot(args.raiz, args.versao)}")
+    else:
+        atual = snapshot_atual(args.raiz)
+        for versao in listar_versoes(args.raiz):
+            marcador = "*" if atual is not None and atual.name == _nome_versao(versao) else " "
+            print(f"{marcador} {versao}")
+
+
+if __name__ == "__main__":
+    main()
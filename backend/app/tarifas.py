@@ -0,0 +1,212 @@
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from app.models import (
+    BandeiraTarifaria, ConsumoMensal, Estado, EstruturaTarifaria, FaixaConsumo, Fornecedor, SolucaoTipo,
+    TarifacaoSolucao
+)
+from app.data import Catalogo
+
+ANO_PADRAO = 2025
+MESES = 12
+JANELA_PADRAO = EstruturaTarifaria.plana(0.0).janela_ponta
+
+
+class Calendario(NamedTuple):
+    """Agregador horas × 24 (colunas 0-11: energia na ponta por mês; 12-23: fora de ponta)."""
+    agregador: np.ndarray
+    inicio_mes: np.ndarray
+
+
+def horas_no_ano(ano: int) -> int:
+    return int((np.datetime64(f"{ano + 1}-01-01") - np.datetime64(f"{ano}-01-01")).astype(int)) * 24
+
+
+@lru_cache(maxsize=32)
+def calendario(ano: int, janela: Tuple[int, int, bool]) -> Calendario:
+    inicio_ponta, fim_ponta, ponta_fim_de_semana = janela
+    horas = np.arange(
+        np.datetime64(f"{ano}-01-01T00"), np.datetime64(f"{ano + 1}-01-01T00"), dtype="datetime64[h]"
+    )
+    mes = horas.astype("datetime64[M]").astype(np.int64) % MESES
+    hora = horas.astype(np.int64) % 24
+    # 1970-01-01 foi uma quinta-feira: 0 = segunda
+    dia_semana = (horas.astype("datetime64[D]").astype(np.int64) + 3) % 7
+    ponta = (hora >= inicio_ponta) & (hora < fim_ponta)
+    if not ponta_fim_de_semana:
+        ponta &= dia_semana < 5
+
+    agregador = np.zeros((len(horas), 2 * MESES))
+    agregador[np.arange(len(horas)), np.where(ponta, mes, mes + MESES)] = 1.0
+    agregador.flags.writeable = False
+    inicio_mes = np.searchsorted(mes, np.arange(MESES))
+    inicio_mes.flags.writeable = False
+    return Calendario(agregador, inicio_mes)
+
+
+def agregar_horario(perfis: np.ndarray, ano: int, janela: Tuple[int, int, bool]) -> ConsumoMensal:
+    """Energia na ponta e fora dela e demanda máxima (kWh na hora = kW médio) por mês."""
+    agregador, inicio_mes = calendario(ano, janela)
+    energia = perfis @ agregador
+    return ConsumoMensal(
+        energia_ponta=energia[:, :MESES],
+        energia_fora_ponta=energia[:, MESES:],
+        demanda_kw=np.maximum.reduceat(perfis, inicio_mes, axis=1),
+    )
+
+
+class PerfisCarga:
+    """Lote de perfis de carga de um mesmo tipo: horários (N × horas do ano) ou mensais (N × 12).
+
+    A agregação por mês depende só da janela de ponta, então é feita uma vez por janela
+    e reaproveitada por todas as estruturas tarifárias que a compartilham.
+    """
+
+    def __init__(
+        self,
+        horarios: Optional[np.ndarray] = None,
+        mensais: Optional[np.ndarray] = None,
+        demanda_kw: Optional[np.ndarray] = None,
+        ano: int = ANO_PADRAO
+    ):
+        if (horarios is None) == (mensais is None):
+            raise ValueError("Informe perfis horários ou mensais")
+        self.ano = ano
+        self.horarios = None if horarios is None else _matriz(horarios, horas_no_ano(ano), f"horário de {ano}")
+        self.mensais = None if mensais is None else _matriz(mensais, MESES, "mensal")
+        total = len(self.horarios if self.horarios is not None else self.mensais)
+        if demanda_kw is not None:
+            if self.mensais is None:
+                raise ValueError("A demanda dos perfis horários é calculada a partir das horas")
+            demanda_kw = _matriz(demanda_kw, MESES, "de demanda")
+            if len(demanda_kw) != total:
+                raise ValueError("Informe a demanda de todos os perfis mensais")
+        self.demanda_kw = demanda_kw
+        self.total = total
+        self._por_janela: Dict[Tuple[int, int, bool], ConsumoMensal] = {}
+
+    def consumo(self, janela: Tuple[int, int, bool] = JANELA_PADRAO) -> ConsumoMensal:
+        consumo = self._por_janela.get(janela)
+        if consumo is None:
+            if self.horarios is not None:
+                consumo = agregar_horario(self.horarios, self.ano, janela)
+            else:
+                # Sem discriminação horária todo o consumo fica fora de ponta; estruturas com tarifa
+                # de ponta não se aplicam a esses perfis (ver estrutura_para_perfis)
+                zeros = np.zeros_like(self.mensais)
+                consumo = ConsumoMensal(
+                    zeros, self.mensais, self.demanda_kw if self.demanda_kw is not None else zeros
+                )
+            self._por_janela[janela] = consumo
+        return consumo
+
+    def energia_mensal(self) -> np.ndarray:
+        consumo = self.consumo()
+        return consumo.energia_ponta + consumo.energia_fora_ponta
+
+
+def _matriz(valores, colunas: int, descricao: str) -> np.ndarray:
+    matriz = np.asarray(valores, dtype=np.float64)
+    if matriz.ndim != 2 or matriz.shape[1] != colunas:
+        raise ValueError(f"Cada perfil {descricao} deve ter {colunas} valores")
+    if not np.all(np.isfinite(matriz)) or np.any(matriz < 0):
+        raise ValueError("Os perfis devem conter números finitos e não negativos")
+    return matriz
+
+
+def custo_faixas(energia: np.ndarray, faixas: Sequence[FaixaConsumo]) -> np.ndarray:
+    limites = np.array([np.inf if f.ate_kwh is None else f.ate_kwh for f in faixas])
+    inferiores = np.concatenate(([0.0], limites[:-1]))
+    tarifas = np.array([f.tarifa_kwh for f in faixas])
+    na_faixa = np.clip(energia[..., None] - inferiores, 0.0, limites - inferiores)
+    return na_faixa @ tarifas
+
+
+def adicionais_bandeira(estrutura: EstruturaTarifaria, bandeiras: Sequence[BandeiraTarifaria]) -> np.ndarray:
+    return np.array([estrutura.adicional_bandeira_kwh.get(b, 0.0) for b in bandeiras])
+
+
+def estrutura_para_perfis(
+    estrutura: EstruturaTarifaria, tarifa_plana_kwh: float, perfis: PerfisCarga
+) -> EstruturaTarifaria:
+    """Perfis mensais não dizem quanto foi consumido na ponta: com eles a tarifa de ponta dá
+    lugar à tarifa plana (a mesma de simularEconomia); faixas, demanda e adicionais de
+    bandeira continuam valendo."""
+    if perfis.horarios is not None:
+        return estrutura
+    return estrutura.sem_posto_horario(tarifa_plana_kwh)
+
+
+def custo_mensal(
+    estrutura: EstruturaTarifaria, perfis: PerfisCarga, bandeiras: Sequence[BandeiraTarifaria]
+) -> np.ndarray:
+    """Custo de cada perfil em cada mês (N × 12) sob uma estrutura tarifária."""
+    consumo = perfis.consumo(estrutura.janela_ponta)
+    if estrutura.faixas:
+        custo = custo_faixas(consumo.energia_fora_ponta, estrutura.faixas)
+    else:
+        custo = consumo.energia_fora_ponta * estrutura.tarifa_fora_ponta_kwh
+    tarifa_ponta = estrutura.tarifa_ponta_kwh
+    custo = consumo.energia_ponta * (
+        estrutura.tarifa_fora_ponta_kwh if tarifa_ponta is None else tarifa_ponta
+    ) + custo
+    if estrutura.adicional_bandeira_kwh:
+        custo += (consumo.energia_ponta + consumo.energia_fora_ponta) * adicionais_bandeira(estrutura, bandeiras)
+    if estrutura.tarifa_demanda_kw:
+        custo += consumo.demanda_kw * estrutura.tarifa_demanda_kw
+    if estrutura.taxa_fixa_mensal:
+        custo += estrutura.taxa_fixa_mensal
+    return custo
+
+
+def custo_fornecedores(
+    fornecedores: Sequence[Fornecedor],
+    precos: np.ndarray,
+    solucao: SolucaoTipo,
+    perfis: PerfisCarga,
+    bandeiras: Sequence[BandeiraTarifaria]
+) -> np.ndarray:
+    """Custos fornecedores × perfis × meses. Preços planos saem de um único produto externo;
+    só os fornecedores com estrutura própria são avaliados um a um.
+
+    Adicionais de bandeira fazem parte da estrutura tarifária: o preço plano de um fornecedor
+    é o do contrato, com a bandeira já embutida, e só quem declara `adicional_bandeira_kwh`
+    na própria estrutura o repassa.
+    """
+    custos = precos[:, None, None] * perfis.energia_mensal()[None, :, :]
+    for i, fornecedor in enumerate(fornecedores):
+        estrutura = fornecedor.estruturas_tarifarias.get(solucao)
+        if estrutura is not None:
+            custos[i] = custo_mensal(estrutura_para_perfis(estrutura, float(precos[i]), perfis), perfis, bandeiras)
+    return custos
+
+
+def precificar_perfis(
+    estado: Estado,
+    catalogo: Catalogo,
+    perfis: PerfisCarga,
+    bandeiras: Optional[Sequence[BandeiraTarifaria]] = None
+) -> Tuple[np.ndarray, List[TarifacaoSolucao]]:
+    """Custo atual (N × 12) e, por solução, o custo de cada fornecedor do estado."""
+    bandeiras = list(bandeiras) if bandeiras is not None else [BandeiraTarifaria.VERDE] * MESES
+    if len(bandeiras) != MESES:
+        raise ValueError(f"Informe uma bandeira para cada um dos {MESES} meses")
+
+    estrutura = estrutura_para_perfis(estado.estrutura(), estado.tarifa_base_kwh, perfis)
+    custo_atual = custo_mensal(estrutura, perfis, bandeiras)
+    custo_atual_anual = custo_atual.sum(axis=1)
+    solucoes = []
+    for solucao in SolucaoTipo:
+        fornecedores = catalogo.get_fornecedores_por_custo(estado.uf, solucao)
+        if not fornecedores:
+            continue
+        custos = custo_fornecedores(
+            fornecedores, catalogo.get_precos_por_custo(estado.uf, solucao), solucao, perfis, bandeiras
+        )
+        solucoes.append(TarifacaoSolucao(
+            solucao=solucao,
+            fornecedores=fornecedores,
+            custo_mensal=custos,
+            economia_anual=custo_atual_anual[None, :] - custos.sum(axis=2),
+        ))
+    return custo_atual, solucoes
@@ -0,0 +1,79 @@
+"""Serialização e bytes na rede das respostas típicas.
+
+Para a consulta completa de simularEconomia do frontend e para um lote NDJSON de
+/simulacoes/lote, mede o tempo de cada serializador disponível e o tamanho do corpo
+sem compressão, com gzip e com brotli (quando instalado), com os níveis do middleware.
+
+    python -m benchmarks.bench_serializacao --fornecedores 2000 --linhas 5000
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Any, Callable, List, Tuple
+from app.compressao import NIVEL_GZIP, QUALIDADE_BROTLI, codificacoes_disponiveis, comprimir_unico
+from app.contexto import Contexto
+from app.data import Catalogo
+from app.exportacao import Linha, processar_lote
+from app.schema import schema
+from app.serializacao import SERIALIZADORES
+from benchmarks.bench_simulacao import SIMULAR_ECONOMIA
+from benchmarks.sintetico import gerar_catalogo
+
+
+def cronometrar(funcao: Callable[[], Any], repeticoes: int) -> float:
+    funcao()
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes
+
+
+def resposta_simulacao(catalogo: Catalogo, uf: str) -> dict:
+    resultado = asyncio.run(schema.execute(
+        SIMULAR_ECONOMIA, variable_values={"uf": uf, "consumoKwh": 5000},
+        context_value=Contexto(catalogo)
+    ))
+    assert resultado.errors is None, resultado.errors
+    return {"data": resultado.data}
+
+
+def linhas_lote(catalogo: Catalogo, quantidade: int) -> List[Linha]:
+    ufs = [e.uf for e in catalogo.estados]
+    return [(f"c{i}", ufs[i % len(ufs)], float(500 + i % 5000), None) for i in range(quantidade)]
+
+
+def medir(nome: str, dados: Any, repeticoes: int) -> None:
+    print(f"\n{nome}")
+    corpo = b""
+    for serializador, dumps in SERIALIZADORES.items():
+        duracao = cronometrar(lambda: dumps(dados), repeticoes)
+        corpo = dumps(dados)
+        print(f"  {serializador:<10} {duracao * 1e3:>10.2f} ms")
+    tamanhos: List[Tuple[str, int, float]] = [("identity", len(corpo), 0.0)]
+    for codificacao in codificacoes_disponiveis():
+        comprimir = lambda: comprimir_unico(codificacao, corpo, NIVEL_GZIP, QUALIDADE_BROTLI)
+        tamanhos.append((codificacao, len(comprimir()), cronometrar(comprimir, repeticoes)))
+    for codificacao, tamanho, duracao in tamanhos:
+        print(f"  {codificacao:<10} {tamanho / 1024:>10.1f} KiB {tamanho / len(corpo):>7.1%} {duracao * 1e3:>8.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fornecedores", type=int, default=2000)
+    parser.add_argument("--linhas", type=int, default=5000)
+    parser.add_argument("--uf", default="SP")
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    catalogo = Catalogo(*gerar_catalogo(args.fornecedores))
+    medir(f"simularEconomia ({args.uf}, {args.fornecedores} fornecedores)",
+          resposta_simulacao(catalogo, args.uf), args.repeticoes)
+
+    saida, _ = processar_lote(linhas_lote(catalogo, args.linhas), catalogo, "ndjson")
+    registros = [json.loads(l) for l in saida.splitlines()]
+    medir(f"lote NDJSON ({args.linhas} linhas)", registros, max(1, args.repeticoes // 4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Microbenchmark do caminho quente de simularEconomia.
+
+Compara, por chamada, o tempo e as alocações dos objetos intermediários antigos (um
+EconomiaFornecedor pydantic e um FornecedorType novo por fornecedor) com os atuais
+(EconomiaCalculada e FornecedorType compartilhado por versão do catálogo), e mede a
+consulta completa do frontend com o cache de simulações desligado.
+
+    python -m benchmarks.bench_simulacao --fornecedores 2000
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from typing import Any, Callable, List
+from app.contexto import Contexto
+from app.data import Catalogo
+from app.models import EconomiaFornecedor
+from app.schema import (
+    cache_simulacoes, calcular_economia, converter_fornecedor, fornecedor_type, schema
+)
+from benchmarks.sintetico import gerar_catalogo
+
+
+SIMULAR_ECONOMIA = """
+    query SimularEconomia($uf: String!, $consumoKwh: Float!) {
+        simularEconomia(uf: $uf, consumoKwh: $consumoKwh) {
+            estado { uf nome tarifaBaseKwh }
+            consumoKwh
+            custoAtualMensal
+            custoAtualAnual
+            totalFornecedores
+            solucoesDisponiveis {
+                tipo
+                melhorEconomia {
+                    fornecedor { nome logo avaliacaoMedia totalClientes }
+                    economiaMensal
+                    economiaPercentual
+                    economiaAnual
+                }
+                fornecedores {
+                    id nome logo solucoes custoKwhGd custoKwhMl totalClientes avaliacaoMedia
+                }
+            }
+        }
+    }
+"""
+
+
+def medir(funcao: Callable[[], Any], repeticoes: int) -> dict:
+    """Tempo médio por chamada e memória retida por chamada, mantendo os resultados vivos.
+
+    O tempo é medido numa rodada sem tracemalloc, que distorceria os números.
+    """
+    funcao()
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    duracao = time.perf_counter() - inicio
+
+    resultados: List[Any] = []
+    tracemalloc.start()
+    antes = tracemalloc.take_snapshot()
+    for _ in range(repeticoes):
+        resultados.append(funcao())
+    depois = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    diferenca = depois.compare_to(antes, "filename")
+    return {
+        "us_por_chamada": duracao / repeticoes * 1e6,
+        "blocos_por_chamada": sum(d.count_diff for d in diferenca) / repeticoes,
+        "bytes_por_chamada": sum(d.size_diff for d in diferenca) / repeticoes,
+    }
+
+
+def imprimir(nome: str, medida: dict) -> None:
+    print(
+        f"{nome:<46} {medida['us_por_chamada']:>10.1f} us "
+        f"{medida['blocos_por_chamada']:>10.1f} blocos {medida['bytes_por_chamada']:>12.0f} B"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fornecedores", type=int, default=2000)
+    parser.add_argument("--uf", default="SP")
+    parser.add_argument("--consumo", type=float, default=30000)
+    parser.add_argument("--repeticoes", type=int, default=200)
+    args = parser.parse_args()
+
+    catalogo = Catalogo(*gerar_catalogo(args.fornecedores))
+    estado = catalogo.get_estado(args.uf)
+    grupos = [
+        (solucao, fornecedores)
+        for (uf, solucao), fornecedores in catalogo.fornecedores_por_solucao.items()
+        if uf == args.uf
+    ]
+    total = sum(len(f) for _, f in grupos)
+    print(f"{args.uf}: {total} pares fornecedor × solução, {args.repeticoes} repetições\n")
+
+    def calculo_pydantic():
+        return [
+            EconomiaFornecedor(**calcular_economia(f, s, args.consumo, estado.tarifa_base_kwh)._asdict())
+            for s, fornecedores in grupos for f in fornecedores
+        ]
+
+    def calculo_tupla():
+        return [
+            calcular_economia(f, s, args.consumo, estado.tarifa_base_kwh)
+            for s, fornecedores in grupos for f in fornecedores
+        ]
+
+    def conversao_nova():
+        return [converter_fornecedor(f) for _, fornecedores in grupos for f in fornecedores]
+
+    def conversao_compartilhada():
+        return [fornecedor_type(catalogo, f) for _, fornecedores in grupos for f in fornecedores]
+
+    imprimir("cálculo: EconomiaFornecedor (pydantic)", medir(calculo_pydantic, args.repeticoes))
+    imprimir("cálculo: EconomiaCalculada (NamedTuple)", medir(calculo_tupla, args.repeticoes))
+    imprimir("conversão: FornecedorType novo", medir(conversao_nova, args.repeticoes))
+    imprimir("conversão: FornecedorType compartilhado", medir(conversao_compartilhada, args.repeticoes))
+
+    loop = asyncio.new_event_loop()
+
+    def consulta():
+        cache_simulacoes.limpar()
+        resultado = loop.run_until_complete(schema.execute(
+            SIMULAR_ECONOMIA,
+            variable_values={"uf": args.uf, "consumoKwh": args.consumo},
+            context_value=Contexto(catalogo)
+        ))
+        assert resultado.errors is None, resultado.errors
+        return resultado.data
+
+    imprimir("simularEconomia completa (sem cache)", medir(consulta, max(1, args.repeticoes // 10)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Vazão do motor tarifário: perfis horários (8760 pontos) precificados por segundo.
+
+Mede a agregação por mês (produto de matrizes com o calendário) e a precificação
+completa de um estado com estrutura horossazonal contra todos os seus fornecedores.
+
+    python -m benchmarks.bench_tarifas --perfis 2000 --fornecedores 2000
+"""
+import argparse
+import time
+import numpy as np
+from app.data import Catalogo
+from app.tarifas import ANO_PADRAO, JANELA_PADRAO, PerfisCarga, agregar_horario, horas_no_ano, precificar_perfis
+from benchmarks.sintetico import gerar_catalogo
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--perfis", type=int, default=2000)
+    parser.add_argument("--fornecedores", type=int, default=2000)
+    parser.add_argument("--uf", default="SP")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args()
+
+    catalogo = Catalogo(*gerar_catalogo(args.fornecedores))
+    estado = catalogo.get_estado(args.uf)
+    matriz = np.random.default_rng(42).gamma(2.0, 0.5, (args.perfis, horas_no_ano(ANO_PADRAO)))
+    total = len(catalogo.get_fornecedores_por_estado(args.uf))
+    print(f"{args.uf}: {args.perfis} perfis horários × {total} fornecedores, {args.repeticoes} repetições\n")
+
+    agregar_horario(matriz, ANO_PADRAO, JANELA_PADRAO)
+    inicio = time.perf_counter()
+    for _ in range(args.repeticoes):
+        agregar_horario(matriz, ANO_PADRAO, JANELA_PADRAO)
+    duracao = (time.perf_counter() - inicio) / args.repeticoes
+    print(f"{'agregação mensal':<28} {duracao * 1e3:>10.1f} ms {args.perfis / duracao:>12.0f} perfis/s")
+
+    inicio = time.perf_counter()
+    for _ in range(args.repeticoes):
+        precificar_perfis(estado, catalogo, PerfisCarga(horarios=matriz))
+    duracao = (time.perf_counter() - inicio) / args.repeticoes
+    print(f"{'precificação completa':<28} {duracao * 1e3:>10.1f} ms {args.perfis / duracao:>12.0f} perfis/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""Teste de carga da API GraphQL com baseline versionado.
+
+Roda em processo contra o app ASGI, trocando o catálogo por catálogos sintéticos de
+vários tamanhos, ou contra um uvicorn em execução (--url). Para cada cenário mede vazão
+e latências p50/p95/p99, grava os resultados em JSON e, com --baseline, falha (código 1)
+se algum cenário piorar além do limite configurado.
+
+    python -m benchmarks.carga --tamanhos 10 1000 100000 --saida benchmarks/resultados.json
+    python -m benchmarks.carga --baseline benchmarks/baseline.json --limite 0.25
+    python -m benchmarks.carga --url http://localhost:8000 --cenarios simularEconomia
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+import httpx
+from app.data import ESTADOS
+
+
+ESTADOS_QUERY = "query GetEstados { estados { uf nome tarifaBaseKwh } }"
+
+SIMULAR_ECONOMIA = """
+    query SimularEconomia($uf: String!, $consumoKwh: Float!) {
+        simularEconomia(uf: $uf, consumoKwh: $consumoKwh) {
+            estado { uf nome tarifaBaseKwh }
+            consumoKwh
+            custoAtualMensal
+            custoAtualAnual
+            totalFornecedores
+            solucoesDisponiveis {
+                tipo
+                melhorEconomia {
+                    fornecedor { nome logo avaliacaoMedia totalClientes }
+                    economiaMensal
+                    economiaPercentual
+                    economiaAnual
+                }
+                fornecedores {
+                    id nome logo solucoes custoKwhGd custoKwhMl totalClientes avaliacaoMedia
+                }
+            }
+        }
+    }
+"""
+
+SIMULAR_ECONOMIA_LOTE = """
+    query SimularEconomiaLote($entradas: [SimulacaoInput!]!) {
+        simularEconomiaLote(entradas: $entradas) {
+            uf
+            custoAtualMensal
+            melhoresEconomias { solucao economiaMensal fornecedor { id } }
+        }
+    }
+"""
+
+METRICAS_COMPARADAS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def _uf(gerador: random.Random) -> str:
+    return gerador.choice(ESTADOS).uf
+
+
+def _consumo(gerador: random.Random) -> float:
+    # Mistura valores comuns (que acertam o cache) com valores arbitrários
+    if gerador.random() < 0.5:
+        return gerador.choice([100, 500, 1000, 5000, 30000])
+    return round(gerador.uniform(50, 100_000), 2)
+
+
+def montar_cenarios(tamanho_lote: int) -> Dict[str, Callable[[random.Random], dict]]:
+    return {
+        "estados": lambda g: {"query": ESTADOS_QUERY},
+        "simularEconomia": lambda g: {
+            "query": SIMULAR_ECONOMIA,
+            "variables": {"uf": _uf(g), "consumoKwh": _consumo(g)},
+        },
+        "simularEconomiaLote": lambda g: {
+            "query": SIMULAR_ECONOMIA_LOTE,
+            "variables": {
+                "entradas": [{"uf": _uf(g), "consumoKwh": _consumo(g)} for _ in range(tamanho_lote)]
+            },
+        },
+    }
+
+
+def percentil(valores: Sequence[float], p: float) -> float:
+    ordenados = sorted(valores)
+    if not ordenados:
+        return 0.0
+    k = (len(ordenados) - 1) * p / 100
+    inferior = int(k)
+    superior = min(inferior + 1, len(ordenados) - 1)
+    return ordenados[inferior] + (ordenados[superior] - ordenados[inferior]) * (k - inferior)
+
+
+async def executar_cenario(
+    cliente: httpx.AsyncClient,
+    corpo: Callable[[random.Random], dict],
+    requisicoes: int,
+    concorrencia: int,
+    aquecimento: int,
+    semente: int
+) -> dict:
+    gerador = random.Random(semente)
+    corpos = [corpo(gerador) for _ in range(requisicoes + aquecimento)]
+    latencias: List[float] = []
+    erros = 0
+    fila: asyncio.Queue = asyncio.Queue()
+    for i, dados in enumerate(corpos):
+        fila.put_nowait((i < aquecimento, dados))
+
+    async def trabalhador() -> None:
+        nonlocal erros
+        while not fila.empty():
+            aquecendo, dados = fila.get_nowait()
+            inicio = time.perf_counter()
+            resposta = await cliente.post("/graphql", json=dados)
+            duracao = time.perf_counter() - inicio
+            if aquecendo:
+                continue
+            if resposta.status_code != 200 or "errors" in resposta.json():
+                erros += 1
+            latencias.append(duracao * 1000)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+    duracao = time.perf_counter() - inicio
+
+    return {
+        "requisicoes": len(latencias),
+        "erros": erros,
+        "vazao_rps": len(latencias) / duracao if duracao else 0.0,
+        "media_ms": statistics.fmean(latencias) if latencias else 0.0,
+        "p50_ms": percentil(latencias, 50),
+        "p95_ms": percentil(latencias, 95),
+        "p99_ms": percentil(latencias, 99),
+    }
+
+
+def _instalar_catalogo(tamanho: int) -> None:
+    from app.repositorio import RepositorioMemoria, configurar_repositorio
+    from benchmarks.sintetico import gerar_catalogo
+
+    configurar_repositorio(RepositorioMemoria(*gerar_catalogo(tamanho)))
+
+
+def _cliente(url: Optional[str]) -> httpx.AsyncClient:
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=60)
+    from app.main import app, graphql_app
+    # Mede a vazão máxima: todas as requisições saem do mesmo cliente (ver benchmarks.sobrecarga)
+    graphql_app.admissao = None
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+
+async def executar(args: argparse.Namespace) -> dict:
+    cenarios = montar_cenarios(args.tamanho_lote)
+    tamanhos = [None] if args.url else args.tamanhos
+    resultados = []
+
+    async with _cliente(args.url) as cliente:
+        for tamanho in tamanhos:
+            if tamanho is not None:
+                _instalar_catalogo(tamanho)
+            for nome in args.cenarios:
+                requisicoes = args.requisicoes_lote if nome == "simularEconomiaLote" else args.requisicoes
+                medida = await executar_cenario(
+                    cliente, cenarios[nome], requisicoes, args.concorrencia, args.aquecimento, args.semente
+                )
+                medida.update({"cenario": nome, "fornecedores": tamanho})
+                resultados.append(medida)
+                print(
+                    f"{nome:<22} {str(tamanho or 'remoto'):>8} fornecedores "
+                    f"{medida['vazao_rps']:>9.1f} req/s  p50 {medida['p50_ms']:>8.2f} ms  "
+                    f"p95 {medida['p95_ms']:>8.2f} ms  p99 {medida['p99_ms']:>8.2f} ms  "
+                    f"erros {medida['erros']}"
+                )
+
+    return {
+        "gerado_em": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "alvo": args.url or "asgi",
+        "concorrencia": args.concorrencia,
+        "tamanho_lote": args.tamanho_lote,
+        "resultados": resultados,
+    }
+
+
+def comparar(atual: dict, baseline: dict, limite: float) -> List[str]:
+    """Lista as regressões de latência (acima de 1 + limite) e de vazão (abaixo de 1 - limite)."""
+    anteriores = {(r["cenario"], r["fornecedores"]): r for r in baseline.get("resultados", [])}
+    regressoes = []
+    for resultado in atual["resultados"]:
+        chave = (resultado["cenario"], resultado["fornecedores"])
+        anterior = anteriores.get(chave)
+        if not anterior:
+            continue
+        for metrica in METRICAS_COMPARADAS:
+            if anterior[metrica] and resultado[metrica] > anterior[metrica] * (1 + limite):
+                regressoes.append(
+                    f"{chave[0]} ({chave[1]} fornecedores): {metrica} "
+                    f"{anterior[metrica]:.2f} -> {resultado[metrica]:.2f}"
+                )
+        if anterior["vazao_rps"] and resultado["vazao_rps"] < anterior["vazao_rps"] * (1 - limite):
+            regressoes.append(
+                f"{chave[0]} ({chave[1]} fornecedores): vazao_rps "
+                f"{anterior['vazao_rps']:.1f} -> {resultado['vazao_rps']:.1f}"
+            )
+    return regressoes
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Alvo HTTP (p.ex. http://localhost:8000); sem ele roda em processo")
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=[10, 1_000, 10_000, 100_000])
+    parser.add_argument("--cenarios", nargs="+", default=["estados", "simularEconomia", "simularEconomiaLote"],
+                        choices=["estados", "simularEconomia", "simularEconomiaLote"])
+    parser.add_argument("--requisicoes", type=int, default=500)
+    parser.add_argument("--requisicoes-lote", type=int, default=20)
+    parser.add_argument("--tamanho-lote", type=int, default=1000)
+    parser.add_argument("--concorrencia", type=int, default=16)
+    parser.add_argument("--aquecimento", type=int, default=20)
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--saida", help="Arquivo JSON para gravar os resultados")
+    parser.add_argument("--baseline", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--limite", type=float, default=0.20, help="Piora tolerada (0.20 = 20%%)")
+    args = parser.parse_args(argv)
+
+    atual = asyncio.run(executar(args))
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(atual, arquivo, indent=2)
+        print(f"\nResultados gravados em {args.saida}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as arquivo:
+            regressoes = comparar(atual, json.load(arquivo), args.limite)
+        if regressoes:
+            print(f"\nRegressões acima de {args.limite:.0%} em relação a {args.baseline}:")
+            for regressao in regressoes:
+                print(f"  {regressao}")
+            return 1
+        print(f"\nSem regressões acima de {args.limite:.0%} em relação a {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
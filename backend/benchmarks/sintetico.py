@@ -0,0 +1,30 @@
+import random
+from typing import List, Tuple
+from app.data import ESTADOS
+from app.models import Estado, Fornecedor, SolucaoTipo
+
+
+def gerar_fornecedores(quantidade: int, semente: int = 42) -> List[Fornecedor]:
+    """Fornecedores sintéticos distribuídos entre os estados de app/data.py."""
+    gerador = random.Random(semente)
+    fornecedores = []
+    for i in range(quantidade):
+        solucoes = gerador.choice([
+            [SolucaoTipo.GD], [SolucaoTipo.MERCADO_LIVRE], [SolucaoTipo.GD, SolucaoTipo.MERCADO_LIVRE]
+        ])
+        fornecedores.append(Fornecedor(
+            id=f"s{i}",
+            nome=f"Fornecedor Sintético {i}",
+            logo=f"https://api.dicebear.com/7.x/shapes/svg?seed=s{i}",
+            estado=ESTADOS[i % len(ESTADOS)].uf,
+            solucoes=solucoes,
+            custo_kwh_gd=round(gerador.uniform(0.45, 0.80), 4) if SolucaoTipo.GD in solucoes else None,
+            custo_kwh_ml=round(gerador.uniform(0.40, 0.75), 4) if SolucaoTipo.MERCADO_LIVRE in solucoes else None,
+            total_clientes=gerador.randint(10, 5000),
+            avaliacao_media=round(gerador.uniform(3.0, 5.0), 1)
+        ))
+    return fornecedores
+
+
+def gerar_catalogo(quantidade: int, semente: int = 42) -> Tuple[List[Estado], List[Fornecedor]]:
+    return list(ESTADOS), gerar_fornecedores(quantidade, semente)
@@ -0,0 +1,124 @@
+"""Teste de sobrecarga do controle de admissão.
+
+Gera carga em malha aberta (as requisições chegam no ritmo configurado, sem esperar as
+anteriores) contra o app ASGI: clientes normais pedindo simularEconomia e um cliente
+abusivo mandando lotes grandes, acima do que o processo consegue atender. Roda o mesmo
+roteiro sem e com o controle de admissão e mostra o p99 dos clientes normais por janela
+de tempo: sem admissão ele cresce com a fila; com admissão fica estável e o excesso
+recebe 429 na hora.
+
+    python -m benchmarks.sobrecarga --taxa 400 --segundos 6 --lote 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from typing import Dict, List, Tuple
+import httpx
+from app.admissao import ControleAdmissao
+from app.data import ESTADOS
+from benchmarks.carga import SIMULAR_ECONOMIA, SIMULAR_ECONOMIA_LOTE, percentil
+
+CABECALHO_CLIENTE = "x-cliente-id"
+
+
+def p99_por_janela(amostras: List[Tuple[float, float]], janela: float) -> List[float]:
+    """p99 das latências (ms) agrupadas pelo instante de chegada em janelas de `janela` segundos."""
+    grupos: Dict[int, List[float]] = {}
+    for chegada, latencia in amostras:
+        grupos.setdefault(int(chegada // janela), []).append(latencia)
+    return [percentil(grupos[i], 99) for i in sorted(grupos)]
+
+
+async def rodar(
+    cliente: httpx.AsyncClient, taxa: float, segundos: float, lote: int, intervalo_lote: float, semente: int
+) -> dict:
+    gerador = random.Random(semente)
+    normais: List[Tuple[float, float]] = []
+    contagens = {"normal_429": 0, "lote_ok": 0, "lote_429": 0}
+    tarefas = []
+    inicio = time.perf_counter()
+
+    async def normal(chegada: float, corpo: dict, cliente_id: str) -> None:
+        resposta = await cliente.post("/graphql", json=corpo, headers={CABECALHO_CLIENTE: cliente_id})
+        if resposta.status_code == 429:
+            contagens["normal_429"] += 1
+        else:
+            normais.append((chegada, (time.perf_counter() - inicio - chegada) * 1000))
+
+    async def abusivo(corpo: dict) -> None:
+        resposta = await cliente.post("/graphql", json=corpo, headers={CABECALHO_CLIENTE: "abusivo"})
+        contagens["lote_429" if resposta.status_code == 429 else "lote_ok"] += 1
+
+    corpo_lote = {
+        "query": SIMULAR_ECONOMIA_LOTE,
+        "variables": {"entradas": [
+            {"uf": gerador.choice(ESTADOS).uf, "consumoKwh": gerador.uniform(100, 50_000)} for _ in range(lote)
+        ]},
+    }
+    proximo_lote = 0.0
+    for i in range(int(taxa * segundos)):
+        chegada = i / taxa
+        atraso = chegada - (time.perf_counter() - inicio)
+        if atraso > 0:
+            await asyncio.sleep(atraso)
+        if chegada >= proximo_lote:
+            tarefas.append(asyncio.create_task(abusivo(corpo_lote)))
+            proximo_lote += intervalo_lote
+        corpo = {
+            "query": SIMULAR_ECONOMIA,
+            "variables": {"uf": gerador.choice(ESTADOS).uf, "consumoKwh": round(gerador.uniform(50, 100_000), 2)},
+        }
+        tarefas.append(asyncio.create_task(normal(chegada, corpo, f"c{i % 50}")))
+    await asyncio.gather(*tarefas)
+
+    latencias = [l for _, l in normais]
+    return {
+        **contagens,
+        "normal_ok": len(latencias),
+        "p50_ms": percentil(latencias, 50),
+        "p99_ms": percentil(latencias, 99),
+        "p99_por_janela": p99_por_janela(normais, 1.0),
+        "duracao_s": time.perf_counter() - inicio,
+    }
+
+
+async def executar(args: argparse.Namespace) -> None:
+    from app.main import app, graphql_app
+
+    os.environ["ADMISSAO_CABECALHO_CLIENTE"] = CABECALHO_CLIENTE
+    transporte = httpx.ASGITransport(app=app)
+    for nome, admissao in (
+        ("sem admissão", None),
+        ("com admissão", ControleAdmissao(
+            capacidade=args.capacidade, max_fila=args.fila, espera_maxima=args.espera
+        )),
+    ):
+        graphql_app.admissao = admissao
+        async with httpx.AsyncClient(transport=transporte, base_url="http://bench", timeout=120) as cliente:
+            r = await rodar(cliente, args.taxa, args.segundos, args.lote, args.intervalo_lote, args.semente)
+        janelas = " ".join(f"{p:.0f}" for p in r["p99_por_janela"])
+        print(
+            f"{nome:<13} normais {r['normal_ok']:>5} ok {r['normal_429']:>5} 429  "
+            f"p50 {r['p50_ms']:>8.1f} ms  p99 {r['p99_ms']:>8.1f} ms  "
+            f"lotes {r['lote_ok']} ok {r['lote_429']} 429  ({r['duracao_s']:.1f} s)"
+        )
+        print(f"{'':<13} p99 por segundo (ms): {janelas}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--taxa", type=float, default=400, help="simularEconomia por segundo")
+    parser.add_argument("--segundos", type=float, default=6)
+    parser.add_argument("--lote", type=int, default=200, help="linhas por lote do cliente abusivo")
+    parser.add_argument("--intervalo-lote", type=float, default=0.25, help="segundos entre lotes")
+    parser.add_argument("--capacidade", type=float, default=16)
+    parser.add_argument("--fila", type=int, default=64)
+    parser.add_argument("--espera", type=float, default=0.5)
+    parser.add_argument("--semente", type=int, default=42)
+    asyncio.run(executar(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+#!/bin/sh
+# CLARKE_MODO=dev (padrão): um processo com --reload. CLARKE_MODO=prod: Gunicorn com vários workers.
+set -e
+
+if [ "${CLARKE_MODO:-dev}" = "prod" ]; then
+    exec gunicorn app.main:app -c gunicorn.conf.py
+fi
+
+exec uvicorn app.main:app --host 0.0.0.0 --port "${PORT:-8000}" --reload
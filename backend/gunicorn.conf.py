@@ -0,0 +1,48 @@
+"""Configuração de produção: vários workers Uvicorn compartilhando o catálogo pré-carregado.
+
+O app (e o catálogo) é carregado uma vez no processo mestre (``preload_app``) e herdado
+pelos workers via fork com copy-on-write. ``kill -HUP <mestre>`` reconstrói o catálogo
+no mestre e troca os workers sem derrubar requisições em andamento. Com
+``CATALOGO_SNAPSHOTS`` o catálogo vem do snapshot ativo em vez do repositório.
+"""
+import gc
+import multiprocessing
+import os
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+keepalive = 5
+accesslog = "-"
+
+
+def _publicar_catalogo(server):
+    from app.data import get_catalogo
+    from app.repositorio import pre_carregar_catalogo
+    from app.snapshot import vigia_snapshots
+
+    if vigia_snapshots is not None:
+        vigia_snapshots.atualizar(forcar=True)
+        catalogo = get_catalogo()
+    else:
+        catalogo = pre_carregar_catalogo()
+    # Objetos congelados não são visitados pelo GC dos workers, evitando cópias de páginas
+    gc.collect()
+    gc.freeze()
+    server.log.info(
+        "Catálogo versão %s: %s estados, %s fornecedores",
+        catalogo.versao, len(catalogo.estados), len(catalogo.fornecedores)
+    )
+
+
+def when_ready(server):
+    _publicar_catalogo(server)
+
+
+def on_reload(server):
+    _publicar_catalogo(server)
+
@@ -0,0 +1,127 @@
+import asyncio
+import pytest
+from httpx import ASGITransport, AsyncClient
+from app.admissao import AdmissaoNegada, BaldeTokens, ControleAdmissao
+from app.main import app, graphql_app
+
+
+class TestBaldeTokens:
+    """Testes do token bucket por cliente"""
+
+    def test_rajada_e_reposicao(self):
+        """Testa a rajada, o tempo de espera devolvido e a reposição com o tempo"""
+        balde = BaldeTokens(taxa=10, capacidade=5)
+        assert all(balde.consumir(1) == 0 for _ in range(5))
+        assert balde.consumir(1) == pytest.approx(0.1, rel=0.1)
+        balde.atualizado_em -= 0.5
+        assert balde.consumir(5) == 0
+
+    def test_custo_maior_que_rajada(self):
+        """Testa que uma operação maior que a rajada passa com o balde cheio"""
+        balde = BaldeTokens(taxa=1, capacidade=5)
+        assert balde.consumir(100) == 0
+        assert balde.consumir(1) > 0
+
+
+@pytest.mark.asyncio
+class TestControleAdmissao:
+    """Testes da concorrência ponderada com fila limitada"""
+
+    async def test_fila_fifo_ponderada(self):
+        """Testa que uma operação pesada ocupa a capacidade e a fila anda em ordem"""
+        controle = ControleAdmissao(capacidade=4, max_fila=10, espera_maxima=1)
+        ordem = []
+        liberar = asyncio.Event()
+
+        async def operacao(nome, custo):
+            async with controle.vaga(custo):
+                ordem.append(nome)
+                await liberar.wait()
+
+        tarefas = [asyncio.create_task(operacao("lote", 100))]
+        await asyncio.sleep(0)
+        tarefas += [asyncio.create_task(operacao(f"s{i}", 1)) for i in range(3)]
+        await asyncio.sleep(0.01)
+        assert ordem == ["lote"] and controle.em_uso == 4 and controle.na_fila == 3
+        liberar.set()
+        await asyncio.gather(*tarefas)
+        assert ordem == ["lote", "s0", "s1", "s2"]
+        assert controle.em_uso == 0
+
+    async def test_fila_cheia_e_tempo_esgotado(self):
+        """Testa a recusa imediata com a fila cheia e a recusa por espera longa"""
+        controle = ControleAdmissao(capacidade=1, max_fila=1, espera_maxima=0.05)
+        liberar = asyncio.Event()
+
+        async def ocupar():
+            async with controle.vaga(1):
+                await liberar.wait()
+
+        ocupante = asyncio.create_task(ocupar())
+        await asyncio.sleep(0)
+        na_fila = asyncio.create_task(controle.vaga(1).__aenter__())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissaoNegada):
+            async with controle.vaga(1):
+                pass
+        with pytest.raises(AdmissaoNegada):
+            await na_fila
+        assert controle.na_fila == 0
+        liberar.set()
+        await ocupante
+        assert controle.em_uso == 0
+
+    async def test_cancelamento_na_fila(self):
+        """Testa que quem desiste na fila não vaza capacidade"""
+        controle = ControleAdmissao(capacidade=1, max_fila=5, espera_maxima=1)
+        liberar = asyncio.Event()
+
+        async def ocupar():
+            async with controle.vaga(1):
+                await liberar.wait()
+
+        ocupante = asyncio.create_task(ocupar())
+        await asyncio.sleep(0)
+        esperando = asyncio.create_task(ocupar())
+        await asyncio.sleep(0)
+        esperando.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await esperando
+        assert controle.na_fila == 0
+        liberar.set()
+        await ocupante
+        assert controle.em_uso == 0
+
+    async def test_429_com_retry_after(self):
+        """Testa o limite por cliente na API: 429 com Retry-After, sem executar"""
+        anterior = graphql_app.admissao
+        # Cada consulta custa pouco mais de 1: o déficit da terceira fica perto de 0,5 s
+        graphql_app.admissao = ControleAdmissao(taxa_cliente=1, rajada_cliente=2.5)
+        consulta = {"query": '{ simularEconomia(uf: "SP", consumoKwh: 100) { consumoKwh } }'}
+        try:
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+                respostas = [
+                    await client.post("/graphql", json=consulta, headers={"Origin": "http://localhost:3000"})
+                    for _ in range(3)
+                ]
+        finally:
+            graphql_app.admissao = anterior
+        assert [r.status_code for r in respostas] == [200, 200, 429]
+        assert respostas[2].headers["retry-after"] == "1"
+        assert "retry-after" in respostas[2].headers["access-control-expose-headers"].lower()
+        assert respostas[2].json()["errors"][0]["extensions"]["code"] == "SOBRECARGA"
+
+    async def test_custo_da_operacao_executada(self, monkeypatch):
+        """Testa que uma segunda operação no documento não barateia o lote que executa"""
+        controle = ControleAdmissao(taxa_cliente=1, rajada_cliente=100)
+        monkeypatch.setattr(graphql_app, "admissao", controle)
+        consulta = {
+            "query": """query L($entradas: [EntradaSimulacao!]!) {
+                simularEconomiaLote(entradas: $entradas) { economiaAnualTotal }
+            }
+            query Z { estados { uf } }""",
+            "variables": {"entradas": [{"uf": "SP", "consumoKwh": 1000}] * 150},
+        }
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            respostas = [await client.post("/graphql", json=consulta) for _ in range(2)]
+        assert [r.status_code for r in respostas] == [200, 429]
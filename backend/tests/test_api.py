@@ -1,6 +1,13 @@
+import numpy as np
 import pytest
-from httpx import AsyncClient
+from httpx import ASGITransport, AsyncClient
 from app.main import app
+from app.contexto import Contexto
+from app.data import Catalogo
+from app.repositorio import get_repositorio
+import app.schema as schema_module
+from app.schema import CurvaSolucao, calcular_curva_economia
+from benchmarks.sintetico import gerar_catalogo
 
 
 @pytest.mark.asyncio
@@ -9,7 +16,7 @@ class TestGraphQLAPI:
     
     async def test_health_endpoint(self):
         """Testa endpoint de health check"""
-        async with AsyncClient(app=app, base_url="http://test") as client:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
             response = await client.get("/health")
             assert response.status_code == 200
             data = response.json()
@@ -17,7 +24,7 @@ class TestGraphQLAPI:
     
     async def test_root_endpoint(self):
         """Testa endpoint raiz"""
-        async with AsyncClient(app=app, base_url="http://test") as client:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
             response = await client.get("/")
             assert response.status_code == 200
             data = response.json()
@@ -36,7 +43,7 @@ class TestGraphQLAPI:
             }
         """
         
-        async with AsyncClient(app=app, base_url="http://test") as client:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
             response = await client.post(
                 "/graphql",
                 json={"query": query}
@@ -84,7 +91,7 @@ class TestGraphQLAPI:
             }
         """
         
-        async with AsyncClient(app=app, base_url="http://test") as client:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
             response = await client.post(
                 "/graphql",
                 json={"query": query}
@@ -116,7 +123,7 @@ class TestGraphQLAPI:
             }
         """
         
-        async with AsyncClient(app=app, base_url="http://test") as client:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
             response = await client.post(
                 "/graphql",
                 json={"query": query}
@@ -139,7 +146,7 @@ class TestGraphQLAPI:
             }
         """
         
-        async with AsyncClient(app=app, base_url="http://test") as client:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
             response = await client.post(
                 "/graphql",
                 json={"query": query}
@@ -176,7 +183,7 @@ class TestGraphQLAPI:
             }
         """
         
-        async with AsyncClient(app=app, base_url="http://test") as client:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
             response = await client.post(
                 "/graphql",
                 json={"query": query}
@@ -202,9 +209,469 @@ class TestGraphQLAPI:
                 anual = economia["economiaAnual"]
                 assert abs(anual - (mensal * 12)) < 1.0
     
+    async def test_query_simular_economia_lote(self):
+        """Testa que o lote retorna os mesmos valores da simulação individual"""
+        lote = """
+            query {
+                simularEconomiaLote(entradas: [
+                    {uf: "SP", consumoKwh: 30000},
+                    {uf: "XX", consumoKwh: 100},
+                    {uf: "BA", consumoKwh: 1234.5}
+                ]) {
+                    uf
+                    consumoKwh
+                    custoAtualMensal
+                    custoAtualAnual
+                    melhoresEconomias {
+                        fornecedor { id }
+                        solucao
+                        custoAtual
+                        custoComFornecedor
+                        economiaMensal
+                        economiaPercentual
+                        economiaAnual
+                    }
+                }
+            }
+        """
+        individual = """
+            query Simular($uf: String!, $consumoKwh: Float!) {
+                simularEconomia(uf: $uf, consumoKwh: $consumoKwh) {
+                    custoAtualMensal
+                    custoAtualAnual
+                    solucoesDisponiveis {
+                        melhorEconomia {
+                            fornecedor { id }
+                            solucao
+                            custoAtual
+                            custoComFornecedor
+                            economiaMensal
+                            economiaPercentual
+                            economiaAnual
+                        }
+                    }
+                }
+            }
+        """
+        
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/graphql", json={"query": lote})
+            assert response.status_code == 200
+            resultados = response.json()["data"]["simularEconomiaLote"]
+            
+            assert len(resultados) == 3
+            assert resultados[1] is None
+            
+            for resultado in (resultados[0], resultados[2]):
+                response = await client.post(
+                    "/graphql",
+                    json={
+                        "query": individual,
+                        "variables": {"uf": resultado["uf"], "consumoKwh": resultado["consumoKwh"]}
+                    }
+                )
+                esperado = response.json()["data"]["simularEconomia"]
+                
+                assert resultado["custoAtualMensal"] == esperado["custoAtualMensal"]
+                assert resultado["custoAtualAnual"] == esperado["custoAtualAnual"]
+                assert resultado["melhoresEconomias"] == [
+                    s["melhorEconomia"] for s in esperado["solucoesDisponiveis"]
+                ]
+    
+    async def test_fornecedores_paginados(self):
+        """Testa o resumo sem a lista e a lista de fornecedores em páginas"""
+        consulta = """
+            query Pagina($limite: Int, $deslocamento: Int!) {
+                simularEconomia(uf: "SP", consumoKwh: 1000) {
+                    solucoesDisponiveis {
+                        totalFornecedores
+                        fornecedores(limite: $limite, deslocamento: $deslocamento) { id }
+                    }
+                }
+            }
+        """
+        
+        async def pagina(client, limite, deslocamento):
+            response = await client.post("/graphql", json={
+                "query": consulta, "variables": {"limite": limite, "deslocamento": deslocamento}
+            })
+            solucao = response.json()["data"]["simularEconomia"]["solucoesDisponiveis"][0]
+            return solucao["totalFornecedores"], [f["id"] for f in solucao["fornecedores"]]
+        
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            total, todos = await pagina(client, None, 0)
+            assert total == len(todos)
+            paginas = [(await pagina(client, 1, i))[1] for i in range(total + 1)]
+            assert sum(paginas, []) == todos
+            assert paginas[-1] == []
+            
+            response = await client.post("/graphql", json={
+                "query": consulta, "variables": {"limite": -1, "deslocamento": 0}
+            })
+            assert "negativos" in response.json()["errors"][0]["message"]
+    
+    async def test_query_comparar_estados(self):
+        """Testa a comparação entre estados contra a simulação individual de cada UF"""
+        comparacao = """
+            query {
+                compararEstados(consumoKwh: 2500) {
+                    uf
+                    estado { nome }
+                    custoAtualMensal
+                    melhorGd { fornecedor { id } economiaMensal }
+                    melhorMercadoLivre { fornecedor { id } economiaMensal }
+                    melhorEconomia { solucao economiaMensal }
+                }
+            }
+        """
+        individual = """
+            query Simular($uf: String!) {
+                simularEconomia(uf: $uf, consumoKwh: 2500) {
+                    custoAtualMensal
+                    solucoesDisponiveis { tipo melhorEconomia { fornecedor { id } economiaMensal } }
+                }
+            }
+        """
+        
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/graphql", json={"query": comparacao})
+            resultados = response.json()["data"]["compararEstados"]
+            assert len(resultados) == 8
+            economias = [r["melhorEconomia"]["economiaMensal"] for r in resultados]
+            assert economias == sorted(economias, reverse=True)
+            
+            for resultado in resultados:
+                response = await client.post(
+                    "/graphql", json={"query": individual, "variables": {"uf": resultado["uf"]}}
+                )
+                esperado = response.json()["data"]["simularEconomia"]
+                melhores = {s["tipo"]: s["melhorEconomia"] for s in esperado["solucoesDisponiveis"]}
+                assert resultado["custoAtualMensal"] == esperado["custoAtualMensal"]
+                assert resultado["melhorGd"] == melhores.get("GD")
+                assert resultado["melhorMercadoLivre"] == melhores.get("Mercado Livre")
+            
+            response = await client.post("/graphql", json={"query": """
+                query { compararEstados(unidades: [{uf: "BA", consumoKwh: 800}, {uf: "XX", consumoKwh: 1}]) { uf } }
+            """})
+            assert response.json()["data"]["compararEstados"] == [{"uf": "BA"}]
+            
+            response = await client.post("/graphql", json={"query": "query { compararEstados { uf } }"})
+            assert "consumoKwh" in response.json()["errors"][0]["message"]
+    
+    async def test_query_curva_economia(self):
+        """Testa que cada ponto da curva bate com a simulação individual"""
+        curva = """
+            query {
+                curvaEconomia(uf: "SP", pontos: [100, 1234.5, 30000]) {
+                    uf
+                    consumosKwh
+                    custoAtualMensal
+                    solucoes {
+                        tipo
+                        melhorEconomiaMensal
+                        fornecedores {
+                            fornecedor { id }
+                            custoComFornecedor
+                            economiaMensal
+                            economiaPercentual
+                        }
+                    }
+                }
+            }
+        """
+        individual = """
+            query Simular($consumoKwh: Float!) {
+                simularEconomia(uf: "SP", consumoKwh: $consumoKwh) {
+                    custoAtualMensal
+                    solucoesDisponiveis {
+                        tipo
+                        melhorEconomia {
+                            fornecedor { id }
+                            custoComFornecedor
+                            economiaMensal
+                            economiaPercentual
+                        }
+                    }
+                }
+            }
+        """
+        
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/graphql", json={"query": curva})
+            resultado = response.json()["data"]["curvaEconomia"]
+            assert resultado["consumosKwh"] == [100, 1234.5, 30000]
+            
+            for i, consumo in enumerate(resultado["consumosKwh"]):
+                response = await client.post(
+                    "/graphql", json={"query": individual, "variables": {"consumoKwh": consumo}}
+                )
+                esperado = response.json()["data"]["simularEconomia"]
+                assert resultado["custoAtualMensal"][i] == esperado["custoAtualMensal"]
+                
+                for solucao, esperada in zip(resultado["solucoes"], esperado["solucoesDisponiveis"]):
+                    assert solucao["tipo"] == esperada["tipo"]
+                    melhor = esperada["melhorEconomia"]
+                    assert solucao["melhorEconomiaMensal"][i] == melhor["economiaMensal"]
+                    primeiro = solucao["fornecedores"][0]
+                    assert primeiro["fornecedor"] == melhor["fornecedor"]
+                    assert primeiro["custoComFornecedor"][i] == melhor["custoComFornecedor"]
+                    assert primeiro["economiaPercentual"][i] == melhor["economiaPercentual"]
+    
+    async def test_query_curva_economia_intervalo_e_validacao(self):
+        """Testa a curva por intervalo, UF inexistente e limites de pontos"""
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/graphql", json={"query": """
+                query {
+                    curvaEconomia(uf: "RJ", consumoMinimo: 0, consumoMaximo: 1000, passos: 5) {
+                        consumosKwh
+                        solucoes { fornecedores { economiaPercentual } }
+                    }
+                }
+            """})
+            resultado = response.json()["data"]["curvaEconomia"]
+            assert resultado["consumosKwh"] == [0, 250, 500, 750, 1000]
+            assert resultado["solucoes"][0]["fornecedores"][0]["economiaPercentual"][0] == 0
+            
+            response = await client.post("/graphql", json={
+                "query": 'query { curvaEconomia(uf: "XX", pontos: [100]) { uf } }'
+            })
+            assert response.json()["data"]["curvaEconomia"] is None
+            
+            response = await client.post("/graphql", json={
+                "query": 'query { curvaEconomia(uf: "SP", consumoMinimo: 1, consumoMaximo: 2, passos: 100000) { uf } }'
+            })
+            assert "passos" in response.json()["errors"][0]["message"]
+    
+    async def test_curva_economia_por_linha(self):
+        """Testa que a curva não monta matrizes fornecedores × pontos e que a melhor economia é o máximo das linhas"""
+        catalogo = Catalogo(*gerar_catalogo(3000))
+        consumos = np.linspace(0, 50_000, 400)
+        resultado = calcular_curva_economia("SP", consumos, catalogo)
+        for curva in resultado.curvas:
+            assert curva.precos.shape == (len(curva.fornecedores),)
+            solucao = CurvaSolucao(tipo=curva.solucao.value, curva=curva)
+            linhas = np.array([f.economia_mensal() for f in solucao.fornecedores()])
+            assert solucao.melhor_economia_mensal() == linhas.max(axis=0).tolist()
+    
+    async def test_fornecedores_carregados_uma_vez_por_operacao(self, monkeypatch):
+        """Testa que cada fornecedor é buscado uma única vez, em um só lote do DataLoader,
+        e que o repositório não é consultado durante a operação"""
+        chamadas = []
+        carregar_fornecedores = Contexto._carregar_fornecedores
+        
+        async def espiao(contexto, ids):
+            chamadas.append(list(ids))
+            return await carregar_fornecedores(contexto, ids)
+        
+        monkeypatch.setattr(Contexto, "_carregar_fornecedores", espiao)
+        repositorio = type(get_repositorio())
+        consultas_repositorio = []
+        for metodo in ("listar_estados", "listar_fornecedores", "buscar_fornecedores"):
+            original = getattr(repositorio, metodo)
+            monkeypatch.setattr(
+                repositorio, metodo,
+                lambda self, *args, _nome=metodo, _original=original: (
+                    consultas_repositorio.append(_nome) or _original(self, *args)
+                )
+            )
+        
+        query = """
+            query {
+                sp: simularEconomia(uf: "SP", consumoKwh: 30000) {
+                    estado { uf }
+                    solucoesDisponiveis {
+                        fornecedores { id nome }
+                        melhorEconomia { fornecedor { id nome } }
+                    }
+                }
+                mg: simularEconomia(uf: "MG", consumoKwh: 500) {
+                    solucoesDisponiveis {
+                        fornecedores { id }
+                        melhorEconomia { fornecedor { id } }
+                    }
+                }
+                simularEconomiaLote(entradas: [
+                    {uf: "SP", consumoKwh: 100},
+                    {uf: "SP", consumoKwh: 200},
+                    {uf: "MG", consumoKwh: 300}
+                ]) {
+                    melhoresEconomias { fornecedor { id } }
+                }
+            }
+        """
+        
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/graphql", json={"query": query})
+            assert response.status_code == 200
+            data = response.json()
+        
+        assert "errors" not in data
+        assert len(chamadas) == 1
+        assert sorted(chamadas[0]) == ["f1", "f2", "f3", "f6"]
+        assert consultas_repositorio == []
+        
+        solucoes_sp = data["data"]["sp"]["solucoesDisponiveis"]
+        assert [f["id"] for f in solucoes_sp[0]["fornecedores"]] == ["f1", "f3"]
+        assert solucoes_sp[1]["melhorEconomia"]["fornecedor"]["nome"] == "PowerTrade Brasil"
+    
+    async def test_fornecedor_ausente_do_catalogo(self, monkeypatch):
+        """Testa que um fornecedor que sumiu do catálogo vira erro do campo, não exceção interna"""
+        async def nenhum(contexto, ids):
+            return [None] * len(ids)
+        
+        monkeypatch.setattr(Contexto, "_carregar_fornecedores", nenhum)
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/graphql", json={"query": """{
+                simularEconomia(uf: "SP", consumoKwh: 1234) {
+                    custoAtualMensal
+                    solucoesDisponiveis { melhorEconomia { fornecedor { id } } }
+                }
+            }"""})
+        data = response.json()
+        resultado = data["data"]["simularEconomia"]
+        assert resultado["custoAtualMensal"] == 1135.28
+        assert [s["melhorEconomia"] for s in resultado["solucoesDisponiveis"]] == [None, None]
+        assert data["errors"][0]["message"].startswith("Fornecedor não encontrado: ")
+    
+    async def test_consulta_estreita_calcula_apenas_o_pedido(self, monkeypatch):
+        """Testa que campos não pedidos não são calculados"""
+        economias = []
+        buscas = []
+        calcular_economia = schema_module.calcular_economia
+        buscar_fornecedores = Catalogo.buscar_fornecedores
+        
+        def espiao_economia(*args, **kwargs):
+            economias.append(args)
+            return calcular_economia(*args, **kwargs)
+        
+        def espiao_busca(catalogo, ids):
+            buscas.append(list(ids))
+            return buscar_fornecedores(catalogo, ids)
+        
+        monkeypatch.setattr(schema_module, "calcular_economia", espiao_economia)
+        monkeypatch.setattr(Catalogo, "buscar_fornecedores", espiao_busca)
+        
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post(
+                "/graphql",
+                json={"query": '{ simularEconomia(uf: "SP", consumoKwh: 4321) { custoAtualMensal } }'}
+            )
+            assert response.json()["data"]["simularEconomia"]["custoAtualMensal"] == 3975.32
+            assert economias == []
+            assert buscas == []
+            
+            response = await client.post(
+                "/graphql",
+                json={"query": """
+                    {
+                        simularEconomia(uf: "SP", consumoKwh: 4322) {
+                            solucoesDisponiveis { melhorEconomia { economiaMensal } }
+                        }
+                    }
+                """}
+            )
+            solucoes = response.json()["data"]["simularEconomia"]["solucoesDisponiveis"]
+            assert len(solucoes) == 2
+            assert len(economias) == 2
+            assert buscas == []
+    
+    async def test_query_simular_tarifas(self):
+        """Testa perfis mensal e horário no mesmo lote, com a estrutura horossazonal de SP"""
+        query = """
+            query Tarifas($perfis: [PerfilCargaInput!]!, $bandeiras: [BandeiraTarifaria!]) {
+                estados { uf estruturaTarifaria { tarifaPontaKwh adicionaisBandeira { bandeira adicionalKwh } } }
+                simularTarifas(uf: "SP", perfis: $perfis, bandeiras: $bandeiras) {
+                    consumoAnualKwh
+                    custoAtualMensal
+                    custoAtualAnual
+                    solucoes {
+                        tipo
+                        melhorOferta { fornecedor { id estruturasTarifarias { solucao } } custoAnual economiaAnual }
+                        ofertas(limite: 1) { fornecedor { id } }
+                    }
+                }
+            }
+        """
+        variaveis = {
+            "perfis": [
+                {"consumoHorarioKwh": [1.0] * 8760},
+                {"consumoMensalKwh": [500.0] * 12, "demandaMensalKw": [2.0] * 12},
+            ],
+            "bandeiras": ["VERDE"] * 11 + ["VERMELHA_2"],
+        }
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/graphql", json={"query": query, "variables": variaveis})
+            data = response.json()["data"]
+            sp = data["estados"][0]
+            assert sp["estruturaTarifaria"]["tarifaPontaKwh"] == 1.86
+            assert {"bandeira": "VERMELHA_2", "adicionalKwh": 0.07877} in sp["estruturaTarifaria"]["adicionaisBandeira"]
+            assert data["estados"][1]["estruturaTarifaria"] is None
+            
+            horario, mensal = data["simularTarifas"]
+            assert horario["consumoAnualKwh"] == 8760
+            assert mensal["consumoAnualKwh"] == 6000
+            # Janeiro de 2025: 69 horas de ponta, 675 fora de ponta e demanda de 1 kW
+            assert horario["custoAtualMensal"][0] == round(69 * 1.86 + 675 * 0.74 + 38.5, 2)
+            # Sem as horas, o perfil mensal usa a tarifa plana de simularEconomia
+            assert mensal["custoAtualMensal"][0] == round(500 * 0.92 + 2 * 38.5, 2)
+            assert mensal["custoAtualMensal"][11] == round(500 * (0.92 + 0.07877) + 2 * 38.5, 2)
+            
+            for resultado in (horario, mensal):
+                for solucao in resultado["solucoes"]:
+                    melhor = solucao["melhorOferta"]
+                    assert solucao["ofertas"][0]["fornecedor"]["id"] == melhor["fornecedor"]["id"]
+                    assert melhor["economiaAnual"] == pytest.approx(
+                        resultado["custoAtualAnual"] - melhor["custoAnual"], abs=0.02
+                    )
+            ml = horario["solucoes"][1]["melhorOferta"]["fornecedor"]
+            assert ml == {"id": "f2", "estruturasTarifarias": [{"solucao": "Mercado Livre"}]}
+            
+            response = await client.post("/graphql", json={
+                "query": query, "variables": {"perfis": [{"consumoHorarioKwh": [1.0] * 100}]}
+            })
+            assert response.json()["data"]["simularTarifas"] is None
+            assert "8760" in response.json()["errors"][0]["message"]
+    
+    async def test_query_projecao_contrato(self):
+        """Testa a projeção de contrato pela API e a validação do prazo"""
+        query = """
+            query Projecao($anos: Int!) {
+                projecaoContrato(
+                    uf: "SP", consumoKwh: 5000, anos: $anos, reajusteTarifaPercentual: 7,
+                    reajusteContratoPercentual: 4, taxaDescontoPercentual: 10, custoMigracao: 15000
+                ) {
+                    anos
+                    custoAtualMensal
+                    custoAtualTotal
+                    solucoes {
+                        tipo
+                        melhorVpl { fornecedor { id } vpl paybackMeses }
+                        fornecedores { fornecedor { id } custoMensal economiaAcumulada economiaTotal vpl }
+                    }
+                }
+            }
+        """
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/graphql", json={"query": query, "variables": {"anos": 10}})
+            projecao = response.json()["data"]["projecaoContrato"]
+            assert projecao["anos"] == 10
+            assert len(projecao["custoAtualMensal"]) == 120
+            assert projecao["custoAtualMensal"][12] == round(5000 * 0.92 * 1.07, 2)
+            for solucao in projecao["solucoes"]:
+                melhor = solucao["melhorVpl"]
+                assert melhor["vpl"] == max(f["vpl"] for f in solucao["fornecedores"])
+                assert 1 <= melhor["paybackMeses"] <= 120
+                for fornecedor in solucao["fornecedores"]:
+                    assert len(fornecedor["custoMensal"]) == 120
+                    assert fornecedor["economiaTotal"] == fornecedor["economiaAcumulada"][-1]
+            
+            response = await client.post("/graphql", json={"query": query, "variables": {"anos": 50}})
+            assert response.json()["data"]["projecaoContrato"] is None
+            assert "anos" in response.json()["errors"][0]["message"]
+    
     async def test_cors_headers(self):
         """Testa se headers CORS estão configurados"""
-        async with AsyncClient(app=app, base_url="http://test") as client:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
             response = await client.options(
                 "/graphql",
                 headers={
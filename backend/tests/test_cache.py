@@ -0,0 +1,311 @@
+import asyncio
+import json
+import pytest
+import strawberry
+import time
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from strawberry.http import GraphQLRequestData
+from app.cache import CacheLRU, VooUnico
+from app.data import ESTADOS, FORNECEDORES, Catalogo, get_catalogo, recarregar_catalogo
+from app.contexto import get_contexto
+from app.main import app, graphql_app
+from app.metricas import metricas
+from app.router import POLITICAS_CACHE, ClarkeGraphQLRouter, chave_operacao, etag_operacao
+from app.schema import cache_simulacoes, fornecedor_type, schema
+
+
+class TestCacheLRU:
+    """Testes do cache LRU com TTL"""
+    
+    def test_acerto_e_falha(self):
+        """Testa contadores de acerto e falha"""
+        cache = CacheLRU(tamanho_maximo=10)
+        assert cache.get("a") is None
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert cache.acertos == 1
+        assert cache.falhas == 1
+        assert cache.taxa_acerto == 0.5
+    
+    def test_remove_menos_usado(self):
+        """Testa remoção do item usado há mais tempo"""
+        cache = CacheLRU(tamanho_maximo=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert len(cache) == 2
+    
+    def test_expira_por_ttl(self):
+        """Testa expiração de itens pelo TTL"""
+        cache = CacheLRU(tamanho_maximo=10, ttl_segundos=0.01)
+        cache.set("a", 1)
+        time.sleep(0.02)
+        assert cache.get("a") is None
+        assert len(cache) == 0
+    
+    def test_get_or_set_guarda_none(self):
+        """Testa que resultados None também são memorizados"""
+        cache = CacheLRU()
+        chamadas = []
+        for _ in range(3):
+            cache.get_or_set("x", lambda: chamadas.append(1))
+        assert len(chamadas) == 1
+
+
+SIMULACAO = """
+    query Simular($uf: String!, $consumoKwh: Float!) {
+        simularEconomia(uf: $uf, consumoKwh: $consumoKwh) {
+            custoAtualMensal
+        }
+    }
+"""
+
+
+async def simular(uf: str, consumo_kwh: float) -> dict:
+    resultado = await schema.execute(
+        SIMULACAO,
+        variable_values={"uf": uf, "consumoKwh": consumo_kwh},
+        context_value=await get_contexto()
+    )
+    assert resultado.errors is None
+    return resultado.data["simularEconomia"]
+
+
+@pytest.mark.asyncio
+class TestCacheSimulacao:
+    """Testes do cache de simulações"""
+    
+    async def test_simulacao_repetida_reutiliza_resultado(self):
+        """Testa que a mesma simulação não é recalculada"""
+        primeiro = await simular("SP", 777)
+        acertos = cache_simulacoes.acertos
+        segundo = await simular("SP", 777)
+        assert segundo == primeiro
+        assert cache_simulacoes.acertos == acertos + 1
+    
+    async def test_recarga_do_catalogo_invalida(self):
+        """Testa que a troca de versão do catálogo invalida o cache"""
+        antes = await simular("RJ", 1000)
+        versao = get_catalogo().versao
+        
+        estados = [
+            e.model_copy(update={"tarifa_base_kwh": 2.0}) if e.uf == "RJ" else e
+            for e in ESTADOS
+        ]
+        try:
+            recarregar_catalogo(estados, FORNECEDORES)
+            assert get_catalogo().versao == versao + 1
+            depois = await simular("RJ", 1000)
+            assert antes["custoAtualMensal"] == 980
+            assert depois["custoAtualMensal"] == 2000
+        finally:
+            recarregar_catalogo(ESTADOS, FORNECEDORES)
+
+
+class TestObjetosCompartilhados:
+    """Testes dos objetos GraphQL compartilhados por versão do catálogo"""
+    
+    def test_fornecedor_type_reutilizado_por_versao(self):
+        """Testa que o FornecedorType só é recriado quando o catálogo muda"""
+        catalogo = Catalogo(ESTADOS, FORNECEDORES)
+        fornecedor = catalogo.get_fornecedor("f1")
+        
+        primeiro = fornecedor_type(catalogo, fornecedor)
+        assert fornecedor_type(catalogo, fornecedor) is primeiro
+        assert primeiro.solucoes == ("GD",)
+        
+        novo = Catalogo(ESTADOS, FORNECEDORES, versao=catalogo.versao + 1)
+        assert fornecedor_type(novo, novo.get_fornecedor("f1")) is not primeiro
+
+
+@pytest.mark.asyncio
+class TestCacheHTTP:
+    """Testes do cache HTTP das queries via GET"""
+    
+    async def test_etag_e_304(self):
+        """Testa ETag forte, Cache-Control por operação e 304 sem executar"""
+        parametros = {
+            "query": "query S($uf: String!) { simularEconomia(uf: $uf, consumoKwh: 500) { custoAtualMensal } }",
+            "variables": json.dumps({"uf": "SP"}),
+        }
+        # Sem compressão o ETag é o do roteador (ver test_etag_comprimido)
+        cabecalhos = {"Accept-Encoding": "identity"}
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test", headers=cabecalhos) as client:
+            resposta = await client.get("/graphql", params=parametros)
+            assert resposta.status_code == 200
+            etag = resposta.headers["etag"]
+            assert etag == etag_operacao(
+                parametros["query"], {"uf": "SP"}, None, get_catalogo().impressao
+            )
+            assert resposta.headers["cache-control"] == f"public, max-age={POLITICAS_CACHE['simularEconomia']}"
+            
+            acertos = cache_simulacoes.acertos + cache_simulacoes.falhas
+            resposta = await client.get("/graphql", params=parametros, headers={"If-None-Match": f'W/{etag}, "x"'})
+            assert resposta.status_code == 304
+            assert resposta.content == b""
+            assert resposta.headers["etag"] == etag
+            assert cache_simulacoes.acertos + cache_simulacoes.falhas == acertos
+            
+            outras = {**parametros, "variables": json.dumps({"uf": "RJ"})}
+            resposta = await client.get("/graphql", params=outras, headers={"If-None-Match": etag})
+            assert resposta.status_code == 200
+            assert resposta.headers["etag"] != etag
+    
+    async def test_etag_comprimido(self):
+        """Testa o 304 com o ETag da versão gzip e que ele não vale para outra codificação"""
+        consulta = {"query": "{ estados { uf } }"}
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            resposta = await client.get("/graphql", params=consulta, headers={"Accept-Encoding": "gzip"})
+            etag = resposta.headers["etag"]
+            assert etag.endswith('-gzip"') and not etag.startswith("W/")
+
+            resposta = await client.get(
+                "/graphql", params=consulta, headers={"Accept-Encoding": "gzip", "If-None-Match": etag}
+            )
+            assert resposta.status_code == 304
+            assert resposta.headers["etag"] == etag
+            assert resposta.headers["vary"] == "Accept-Encoding"
+
+            resposta = await client.get(
+                "/graphql", params=consulta, headers={"Accept-Encoding": "identity", "If-None-Match": etag}
+            )
+            assert resposta.status_code == 200
+
+    async def test_troca_de_catalogo_muda_etag(self):
+        """Testa que o ETag acompanha o conteúdo do catálogo, não o contador de versões"""
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            consulta = {"query": "{ estados { uf tarifaBaseKwh } }"}
+            etag = (await client.get("/graphql", params=consulta)).headers["etag"]
+            estados = [e.model_copy(update={"tarifa_base_kwh": 2.0}) if e.uf == "RJ" else e for e in ESTADOS]
+            try:
+                recarregar_catalogo(estados, FORNECEDORES)
+                resposta = await client.get("/graphql", params=consulta, headers={"If-None-Match": etag})
+                assert resposta.status_code == 200
+                assert resposta.headers["etag"] != etag
+            finally:
+                recarregar_catalogo(ESTADOS, FORNECEDORES)
+            resposta = await client.get("/graphql", params=consulta, headers={"If-None-Match": etag})
+            assert resposta.status_code == 304
+    
+    async def test_respostas_nao_cacheaveis(self):
+        """Testa POST, erros e campos sem política: sem ETag"""
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            resposta = await client.post("/graphql", json={"query": "{ estados { uf } }"})
+            assert "etag" not in resposta.headers
+            
+            resposta = await client.get("/graphql", params={"query": "{ estados { naoExiste } }"})
+            assert "errors" in resposta.json()
+            assert "etag" not in resposta.headers
+            
+            resposta = await client.get("/graphql", params={"query": "{ __typename estados { uf } }"})
+            assert resposta.status_code == 200
+            assert "etag" not in resposta.headers
+
+
+@pytest.mark.asyncio
+class TestVooUnico:
+    """Testes da coalescência de operações idênticas em andamento"""
+    
+    async def test_chamadas_simultaneas_compartilham_execucao(self):
+        """Testa uma execução por chave enquanto ela está em andamento, e nenhuma memória depois"""
+        voo = VooUnico()
+        execucoes = []
+        
+        async def calcular(valor):
+            execucoes.append(valor)
+            await asyncio.sleep(0.01)
+            return [valor]
+        
+        resultados = await asyncio.gather(*[voo.executar(i % 2, lambda i=i: calcular(i % 2)) for i in range(10)])
+        assert execucoes == [0, 1]
+        assert resultados[0] is resultados[2]
+        assert (voo.executadas, voo.coalescidas, len(voo)) == (2, 8, 0)
+        
+        await voo.executar(0, lambda: calcular(0))
+        assert execucoes == [0, 1, 0]
+    
+    async def test_erro_e_cancelamento(self):
+        """Testa que o erro chega a todos e que um interessado cancelado não cancela os demais"""
+        voo = VooUnico()
+        
+        async def falhar():
+            await asyncio.sleep(0.01)
+            raise ValueError("falhou")
+        
+        resultados = await asyncio.gather(*[voo.executar("k", falhar) for _ in range(3)], return_exceptions=True)
+        assert all(isinstance(r, ValueError) for r in resultados)
+        
+        async def calcular():
+            await asyncio.sleep(0.02)
+            return 42
+        
+        primeiro = asyncio.create_task(voo.executar("k", calcular))
+        segundo = asyncio.create_task(voo.executar("k", calcular))
+        await asyncio.sleep(0)
+        primeiro.cancel()
+        assert await segundo == 42
+    
+    async def test_chave_operacao(self):
+        """Testa que formatação e ordem das variáveis não mudam a chave, mas o catálogo sim"""
+        a = GraphQLRequestData("query  S { estados { uf } }\n", {"a": 1, "b": 2}, None)
+        b = GraphQLRequestData("query S{estados{uf}} # comentário", {"b": 2, "a": 1}, None)
+        assert chave_operacao(a, 1) == chave_operacao(b, 1)
+        assert chave_operacao(a, 1) != chave_operacao(a, 2)
+        assert chave_operacao(a, 1) != chave_operacao(GraphQLRequestData(a.query, {"a": 2, "b": 2}, None), 1)
+    
+    async def test_requisicoes_identicas_coalescidas(self):
+        """Testa que requisições HTTP idênticas simultâneas recebem a mesma resposta de uma execução"""
+        consulta = "query S($uf: String!) { simularEconomia(uf: $uf, consumoKwh: 777) { custoAtualMensal estado { nome } } }"
+        voo = graphql_app.voo_unico
+        executadas, coalescidas = voo.executadas, voo.coalescidas
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            respostas = await asyncio.gather(*[
+                client.post("/graphql", json={"query": consulta, "variables": {"uf": uf}})
+                for uf in ["SP"] * 20 + ["RJ"] * 5
+            ])
+        assert {r.status_code for r in respostas} == {200}
+        assert respostas[0].json() == respostas[19].json() != respostas[20].json()
+        assert voo.executadas - executadas == 2
+        assert voo.coalescidas - coalescidas == 23
+        assert 'graphql_voo_unico_total{resultado="coalescida"}' in metricas.exportar()
+
+    async def test_mutations_nao_coalescidas(self, monkeypatch):
+        """Testa que só queries são compartilhadas entre requisições"""
+        # O roteador extra registra coletores que não devem ficar no /metrics global
+        monkeypatch.setattr(metricas, "coletores", list(metricas.coletores))
+        execucoes = {"query": 0, "mutation": 0}
+
+        async def contar(tipo: str) -> int:
+            execucoes[tipo] += 1
+            await asyncio.sleep(0.01)
+            return execucoes[tipo]
+
+        @strawberry.type
+        class Consulta:
+            @strawberry.field
+            async def contador(self) -> int:
+                return await contar("query")
+
+        @strawberry.type
+        class Mutacao:
+            @strawberry.mutation
+            async def incrementar(self) -> int:
+                return await contar("mutation")
+
+        aplicacao = FastAPI()
+        aplicacao.include_router(
+            ClarkeGraphQLRouter(strawberry.Schema(query=Consulta, mutation=Mutacao), context_getter=get_contexto),
+            prefix="/graphql"
+        )
+        async with AsyncClient(transport=ASGITransport(app=aplicacao), base_url="http://test") as client:
+            for consulta in ("query { contador }", "mutation { incrementar }"):
+                respostas = await asyncio.gather(*[client.post("/graphql", json={"query": consulta}) for _ in range(5)])
+                assert {r.status_code for r in respostas} == {200}
+            invalida = await client.post("/graphql", content=b"{", headers={"content-type": "application/json"})
+        assert execucoes == {"query": 1, "mutation": 5}
+        assert invalida.status_code == 400
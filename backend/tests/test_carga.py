@@ -0,0 +1,36 @@
+from benchmarks.carga import comparar, percentil
+
+
+def resultado(p95: float, vazao: float) -> dict:
+    return {
+        "resultados": [{
+            "cenario": "simularEconomia",
+            "fornecedores": 1000,
+            "p50_ms": 1.0,
+            "p95_ms": p95,
+            "p99_ms": p95,
+            "vazao_rps": vazao,
+        }]
+    }
+
+
+class TestCarga:
+    """Testes das funções do teste de carga"""
+    
+    def test_percentil(self):
+        """Testa percentis com interpolação linear"""
+        valores = list(range(1, 101))
+        assert percentil(valores, 50) == 50.5
+        assert percentil(valores, 99) == 99.01
+        assert percentil([], 95) == 0.0
+    
+    def test_sem_regressao_dentro_do_limite(self):
+        """Testa que variações dentro do limite são aceitas"""
+        assert comparar(resultado(11.0, 95.0), resultado(10.0, 100.0), limite=0.2) == []
+    
+    def test_regressao_de_latencia_e_vazao(self):
+        """Testa que pioras acima do limite são reportadas"""
+        regressoes = comparar(resultado(13.0, 70.0), resultado(10.0, 100.0), limite=0.2)
+        assert len(regressoes) == 3
+        assert any("p95_ms" in r for r in regressoes)
+        assert any("vazao_rps" in r for r in regressoes)
@@ -0,0 +1,139 @@
+import gzip
+import json
+import zlib
+import pytest
+from httpx import ASGITransport, AsyncClient
+from app.compressao import MiddlewareCompressao, escolher_codificacao
+from app.main import app
+from app.serializacao import SERIALIZADORES, escolher_serializador
+
+
+def resposta_bruta(tamanho: int, pedacos: int = 1, content_type: bytes = b"application/json", etag: bytes = None):
+    async def aplicacao(scope, receive, send):
+        cabecalhos = [(b"content-type", content_type)]
+        if etag:
+            cabecalhos.append((b"etag", etag))
+        await send({"type": "http.response.start", "status": 200, "headers": cabecalhos})
+        for i in range(pedacos):
+            await send({"type": "http.response.body", "body": b"a" * tamanho, "more_body": i < pedacos - 1})
+    return aplicacao
+
+
+async def pedir(aplicacao, encoding: str, **kwargs):
+    transporte = ASGITransport(app=MiddlewareCompressao(aplicacao, **kwargs))
+    async with AsyncClient(transport=transporte, base_url="http://test") as client:
+        return await client.get("/", headers={"Accept-Encoding": encoding})
+
+
+async def chamar(middleware, encoding: str):
+    """Mensagens ASGI enviadas pelo middleware, sem a descompressão automática do httpx."""
+    mensagens = []
+
+    async def enviar(mensagem):
+        mensagens.append(mensagem)
+
+    async def receber():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", encoding.encode())]}
+    await middleware(scope, receber, enviar)
+    return mensagens
+
+
+class TestNegociacao:
+    """Testes da escolha de codificação por Accept-Encoding"""
+
+    def test_preferencia_e_q(self):
+        """Testa br antes de gzip nos empates, q=0 e curinga"""
+        disponiveis = ("br", "gzip")
+        assert escolher_codificacao("gzip, deflate, br", disponiveis) == "br"
+        assert escolher_codificacao("br;q=0.5, gzip", disponiveis) == "gzip"
+        assert escolher_codificacao("br;q=0, gzip;q=0", disponiveis) is None
+        assert escolher_codificacao("*", ("gzip",)) == "gzip"
+        assert escolher_codificacao("identity", disponiveis) is None
+        assert escolher_codificacao("", disponiveis) is None
+
+
+@pytest.mark.asyncio
+class TestCompressao:
+    """Testes do middleware de compressão"""
+
+    async def test_limiar(self):
+        """Testa que corpos pequenos seguem sem compressão e grandes saem com gzip"""
+        pequena = await pedir(resposta_bruta(100), "gzip", tamanho_minimo=500)
+        assert "content-encoding" not in pequena.headers
+        assert pequena.headers["vary"] == "Accept-Encoding"
+
+        grande = await pedir(resposta_bruta(5000), "gzip", tamanho_minimo=500)
+        assert grande.headers["content-encoding"] == "gzip"
+        assert int(grande.headers["content-length"]) < 5000
+        assert grande.content == b"a" * 5000
+
+    async def test_tipo_nao_compressivel(self):
+        """Testa que conteúdo binário não é comprimido"""
+        resposta = await pedir(resposta_bruta(5000, content_type=b"image/png"), "gzip", tamanho_minimo=500)
+        assert "content-encoding" not in resposta.headers
+
+    async def test_stream_comprimido_por_pedaco(self):
+        """Testa que cada pedaço de um stream já pode ser descomprimido ao chegar"""
+        inicio, *corpos = await chamar(MiddlewareCompressao(resposta_bruta(10, pedacos=3)), "gzip")
+        assert (b"content-encoding", b"gzip") in inicio["headers"]
+        assert not any(nome == b"content-length" for nome, _ in inicio["headers"])
+        descompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        assert descompressor.decompress(corpos[0]["body"]) == b"a" * 10
+        assert gzip.decompress(b"".join(c["body"] for c in corpos)) == b"a" * 30
+
+    async def test_brotli(self):
+        """Testa a compressão brotli quando o cliente aceita"""
+        brotli = pytest.importorskip("brotli")
+        middleware = MiddlewareCompressao(resposta_bruta(5000, pedacos=2), codificacoes=("br", "gzip"))
+        inicio, *corpos = await chamar(middleware, "gzip, br")
+        assert (b"content-encoding", b"br") in inicio["headers"]
+        assert brotli.decompress(b"".join(c["body"] for c in corpos)) == b"a" * 10000
+
+    async def test_vary_sem_compressao(self):
+        """Testa Vary: Accept-Encoding também quando o cliente não aceita compressão"""
+        resposta = await pedir(resposta_bruta(5000), "identity", tamanho_minimo=500)
+        assert "content-encoding" not in resposta.headers
+        assert resposta.headers["vary"] == "Accept-Encoding"
+        binaria = await pedir(resposta_bruta(5000, content_type=b"image/png"), "identity")
+        assert "vary" not in binaria.headers
+
+    async def test_etag_forte_por_codificacao(self):
+        """Testa ETag forte com a codificação quando comprimido, mesmo abaixo do limiar"""
+        aplicacao = resposta_bruta(10, etag=b'"abc"')
+        assert (await pedir(aplicacao, "gzip", tamanho_minimo=500)).headers["etag"] == '"abc-gzip"'
+        assert (await pedir(aplicacao, "identity", tamanho_minimo=500)).headers["etag"] == '"abc"'
+        fraco = resposta_bruta(10, etag=b'W/"abc"')
+        assert (await pedir(fraco, "gzip", tamanho_minimo=500)).headers["etag"] == 'W/"abc"'
+
+    async def test_lote_ndjson_comprimido(self):
+        """Testa o endpoint de lote em streaming com gzip"""
+        corpo = "cliente_id,uf,consumo_kwh\n" + "".join(f"c{i},SP,{1000 + i}\n" for i in range(50))
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            resposta = await client.post(
+                "/simulacoes/lote", content=corpo.encode(),
+                headers={"content-type": "text/csv", "accept-encoding": "gzip"}
+            )
+        assert resposta.headers["content-encoding"] == "gzip"
+        linhas = [json.loads(l) for l in resposta.text.splitlines()]
+        assert [l["cliente_id"] for l in linhas] == [f"c{i}" for i in range(50)]
+
+
+class TestSerializacao:
+    """Testes dos serializadores JSON"""
+
+    def test_serializadores_equivalentes(self):
+        """Testa que todos os serializadores produzem o mesmo documento"""
+        dados = {"uf": "SÃO", "valores": [1, 2.5, None, True], "aninhado": {"a": []}}
+        saidas = {nome: dumps(dados) for nome, dumps in SERIALIZADORES.items()}
+        assert all(json.loads(s) == dados for s in saidas.values())
+        assert saidas["json"] == '{"uf":"SÃO","valores":[1,2.5,null,true],"aninhado":{"a":[]}}'.encode()
+
+    def test_escolha(self, monkeypatch):
+        """Testa a escolha por nome e por variável de ambiente"""
+        assert escolher_serializador("json") is SERIALIZADORES["json"]
+        monkeypatch.setenv("JSON_SERIALIZADOR", "json")
+        assert escolher_serializador() is SERIALIZADORES["json"]
+        with pytest.raises(ValueError):
+            escolher_serializador("ujson")
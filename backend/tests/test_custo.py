@@ -0,0 +1,140 @@
+import pytest
+from graphql import parse
+from httpx import ASGITransport, AsyncClient
+from app.admissao import ControleAdmissao
+from app.custo import PESO_FORNECEDOR, LimiteCusto, analisar_custo
+from app.data import Catalogo
+from app.main import app, graphql_app
+from app.models import SolucaoTipo
+from app.schema import schema
+from benchmarks.sintetico import gerar_catalogo
+
+
+def analisar(consulta: str, variaveis: dict = None, operacao: str = None, catalogo: Catalogo = None):
+    return analisar_custo(parse(consulta), schema._schema, variaveis, operacao, catalogo)
+
+
+SIMULACAO = "simularEconomia(uf: \"SP\", consumoKwh: 1000) { solucoesDisponiveis { fornecedores { id nome } } }"
+
+
+class TestAnaliseCusto:
+    """Testes da análise estática de custo das operações"""
+
+    def test_lote_cresce_com_as_entradas(self):
+        """Testa o custo do lote por variável e por literal"""
+        consulta = """query Lote($entradas: [EntradaSimulacao!]!) {
+            simularEconomiaLote(entradas: $entradas) { economiaAnualTotal }
+        }"""
+        entradas = [{"uf": "SP", "consumoKwh": 1000}] * 10_000
+        assert analisar(consulta, {"entradas": entradas}).custo == pytest.approx(5001, abs=1)
+        literal = '{ simularEconomiaLote(entradas: [{uf: "SP", consumoKwh: 1}, {uf: "RJ", consumoKwh: 2}]) { economiaAnualTotal } }'
+        assert analisar(literal).custo == pytest.approx(2, abs=0.01)
+
+    def test_argumento_limitado_pelo_resolver(self):
+        """Testa que passos acima do máximo do resolver não inflam o custo"""
+        consulta = '{ curvaEconomia(uf: "SP", consumoMinimoKwh: 100, consumoMaximoKwh: 1000, passos: 100000) { uf } }'
+        assert analisar(consulta).custo == pytest.approx(26, abs=0.01)
+
+    def test_operacao_selecionada_pelo_nome(self):
+        """Testa que só a operação escolhida é cobrada e que, sem nome, vale a primeira"""
+        consulta = "query A { estados { uf } } query B { %s }" % SIMULACAO
+        assert analisar(consulta, operacao="A").campos < analisar(consulta, operacao="B").campos
+        invertida = "query B { %s } query A { estados { uf } }" % SIMULACAO
+        assert analisar(invertida).campos == analisar(consulta, operacao="B").campos
+
+    def test_aliases_multiplicam(self):
+        """Testa que cada alias de um campo caro é cobrado"""
+        uma = analisar("{ %s }" % SIMULACAO)
+        consulta = "{ %s }" % " ".join(f"s{i}: {SIMULACAO}" for i in range(200))
+        varias = analisar(consulta)
+        assert varias.aliases == 200
+        assert varias.campos == pytest.approx(200 * uma.campos)
+        assert varias.custo == pytest.approx(200 * uma.custo, rel=0.01)
+
+    def test_listas_pelo_catalogo_e_limite(self):
+        """Testa que a lista de fornecedores usa o tamanho do catálogo e respeita `limite`"""
+        catalogo = Catalogo(*gerar_catalogo(2000))
+        completa = analisar("{ %s }" % SIMULACAO, catalogo=catalogo)
+        paginada = analisar(
+            '{ simularEconomia(uf: "SP", consumoKwh: 1000) { solucoesDisponiveis { fornecedores(limite: 5) { id nome } } } }',
+            catalogo=catalogo
+        )
+        assert completa.campos > 2 * catalogo.max_fornecedores_por_solucao
+        assert paginada.campos < 50
+        assert completa.custo > paginada.custo
+
+    def test_fornecedores_cobrados_por_item(self):
+        """Testa que cada fornecedor construído para a lista custa PESO_FORNECEDOR por ocorrência"""
+        catalogo = Catalogo(*gerar_catalogo(2000))
+        completa = analisar("{ %s }" % SIMULACAO, catalogo=catalogo)
+        fornecedores = len(SolucaoTipo) * catalogo.max_fornecedores_por_solucao
+        assert completa.custo >= 1 + PESO_FORNECEDOR * fornecedores
+
+    def test_fragmentos_e_ciclos(self):
+        """Testa que fragmentos contam como os campos que expandem e que ciclos não travam"""
+        direta = analisar("{ estados { uf nome } }")
+        com_fragmento = analisar("{ estados { ...E } } fragment E on EstadoType { uf nome }")
+        assert com_fragmento.campos == direta.campos
+        ciclo = analisar("{ estados { ...A } } fragment A on EstadoType { uf ...B } fragment B on EstadoType { ...A }")
+        assert ciclo.campos > 0
+
+    def test_profundidade(self):
+        """Testa a profundidade medida e a introspecção fora da conta"""
+        assert analisar("{ %s }" % SIMULACAO).profundidade == 4
+        assert analisar("{ __schema { types { name } } }").campos == 0
+
+
+@pytest.mark.asyncio
+class TestLimiteCusto:
+    """Testes da recusa e do relatório de custo no /graphql"""
+
+    async def consultar(self, consulta: str, variaveis: dict = None) -> dict:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            resposta = await client.post("/graphql", json={"query": consulta, "variables": variaveis})
+        assert resposta.status_code == 200
+        return resposta.json()
+
+    async def test_custo_na_resposta(self):
+        """Testa o custo em extensions de uma consulta aceita"""
+        corpo = await self.consultar("{ estados { uf } }")
+        assert corpo["data"]["estados"]
+        custo = corpo["extensions"]["custo"]
+        assert custo["total"] == 1 and custo["profundidade"] == 2 and custo["aliases"] == 0
+
+    async def test_recusa_acima_do_limite(self, monkeypatch):
+        """Testa que a operação cara é recusada antes de executar"""
+        monkeypatch.setattr(LimiteCusto, "custo_maximo", 10)
+        consulta = "{ %s }" % " ".join(f"s{i}: {SIMULACAO}" for i in range(20))
+        corpo = await self.consultar(consulta)
+        assert corpo.get("data") is None
+        assert corpo["errors"][0]["extensions"]["code"] == "CUSTO_EXCEDIDO"
+        assert corpo["extensions"]["custo"]["total"] > 10
+
+    async def test_recusa_por_profundidade(self, monkeypatch):
+        """Testa o limite de profundidade"""
+        monkeypatch.setattr(LimiteCusto, "profundidade_maxima", 3)
+        corpo = await self.consultar("{ %s }" % SIMULACAO)
+        assert corpo.get("data") is None
+        assert corpo["errors"][0]["extensions"]["code"] == "PROFUNDIDADE_EXCEDIDA"
+
+    async def test_recusa_leque_de_aliases(self, monkeypatch):
+        """Testa que muitos simularEconomia com alias são recusados mesmo abaixo do custo máximo"""
+        monkeypatch.setattr(graphql_app, "admissao", ControleAdmissao())
+        consulta = "{ %s }" % " ".join(f"s{i}: {SIMULACAO}" for i in range(200))
+        corpo = await self.consultar(consulta)
+        assert corpo.get("data") is None
+        assert corpo["errors"][0]["extensions"]["code"] == "ALIASES_EXCEDIDOS"
+        assert corpo["extensions"]["custo"]["aliases"] == 200
+
+    async def test_varias_operacoes_sem_nome(self, monkeypatch):
+        """Testa que uma segunda operação no documento não esconde o custo da primeira"""
+        monkeypatch.setattr(graphql_app, "admissao", ControleAdmissao())
+        consulta = """query L($entradas: [EntradaSimulacao!]!) {
+            simularEconomiaLote(entradas: $entradas) { economiaAnualTotal }
+        }
+        query Z { estados { uf } }"""
+        entradas = [{"uf": "SP", "consumoKwh": 1000}] * 12_000
+        corpo = await self.consultar(consulta, {"entradas": entradas})
+        assert corpo.get("data") is None
+        assert corpo["errors"][0]["extensions"]["code"] == "CUSTO_EXCEDIDO"
+        assert corpo["extensions"]["custo"]["total"] > 6000
@@ -1,9 +1,32 @@
 import pytest
-from app.data import ESTADOS, FORNECEDORES, get_estado, get_fornecedores_por_estado
-from app.schema import calcular_economia
-from app.models import SolucaoTipo
+from app.data import ESTADOS, FORNECEDORES, Catalogo, get_estado, get_fornecedores_por_estado
+from app.indice import EnvelopeInferior, IndicePrecoFixo, custo_curva
+from app.schema import calcular_economia, calcular_economia_lote, calcular_melhor_economia, comparar_estados
+from app.models import Estado, EstruturaTarifaria, FaixaConsumo, Fornecedor, SolucaoTipo
+from app.repositorio import (
+    RepositorioMemoria, RepositorioSQLite, configurar_repositorio, get_repositorio
+)
 
 
+@pytest.fixture(params=["memoria", "sqlite"])
+def repositorio(request, tmp_path):
+    """Carrega o catálogo a partir de cada backend de persistência"""
+    if request.param == "sqlite":
+        repositorio = RepositorioSQLite(tmp_path / "catalogo.db")
+        repositorio.criar_tabelas()
+        repositorio.semear(ESTADOS, FORNECEDORES)
+    else:
+        repositorio = RepositorioMemoria(ESTADOS, FORNECEDORES)
+    
+    anterior = get_repositorio()
+    configurar_repositorio(repositorio)
+    yield repositorio
+    configurar_repositorio(anterior)
+    if isinstance(repositorio, RepositorioSQLite):
+        repositorio.fechar()
+
+
+@pytest.mark.usefixtures("repositorio")
 class TestData:
     """Testes para funções de acesso aos dados"""
     
@@ -40,6 +63,67 @@ class TestData:
         assert len(FORNECEDORES) > 0
 
 
+class TestCatalogo:
+    """Testes dos índices do catálogo em memória"""
+    
+    def test_indice_por_id(self):
+        """Testa busca de fornecedor por id"""
+        catalogo = Catalogo(ESTADOS, FORNECEDORES)
+        assert catalogo.get_fornecedor("f3").nome == "GreenEnergy Soluções"
+        assert catalogo.get_fornecedor("inexistente") is None
+        
+        repetido = FORNECEDORES[0].model_copy(update={"nome": "Repetido"})
+        catalogo = Catalogo(ESTADOS, FORNECEDORES + [repetido])
+        assert catalogo.get_fornecedor("f1").nome == "Repetido"
+        assert Catalogo(ESTADOS, []).buscar_fornecedores(["f1"]) == [None]
+    
+    def test_indice_por_solucao(self):
+        """Testa agrupamento por (UF, solução) mantendo a ordem do catálogo"""
+        catalogo = Catalogo(ESTADOS, FORNECEDORES)
+        gd = catalogo.get_fornecedores_por_solucao("SP", SolucaoTipo.GD)
+        ml = catalogo.get_fornecedores_por_solucao("SP", SolucaoTipo.MERCADO_LIVRE)
+        assert [f.id for f in gd] == ["f1", "f3"]
+        assert [f.id for f in ml] == ["f2", "f3"]
+        assert catalogo.get_fornecedores_por_solucao("RS", SolucaoTipo.MERCADO_LIVRE) == ()
+    
+    def test_ordenacao_por_custo(self):
+        """Testa que os grupos são pré-ordenados pelo custo da solução"""
+        catalogo = Catalogo(ESTADOS, FORNECEDORES)
+        for (uf, solucao), fornecedores in catalogo.fornecedores_por_custo.items():
+            custos = [f.custo_kwh(solucao) for f in fornecedores]
+            assert custos == sorted(custos)
+        
+        ml_sp = catalogo.get_fornecedores_por_custo("SP", SolucaoTipo.MERCADO_LIVRE)
+        assert ml_sp[0].id == "f2"
+
+
+    def test_melhor_economia_pela_curva_da_estrutura(self):
+        """Testa que faixas e taxa fixa entram no índice e no valor de melhorEconomia"""
+        estado = Estado(uf="SP", nome="São Paulo", tarifa_base_kwh=0.9)
+        escalonada = EstruturaTarifaria(tarifa_fora_ponta_kwh=0.7, taxa_fixa_mensal=50, faixas=[
+            FaixaConsumo(ate_kwh=1000, tarifa_kwh=0.7),
+            FaixaConsumo(tarifa_kwh=0.3),
+        ])
+        fornecedores = [
+            Fornecedor(id="plana", nome="Plana", logo="", estado="SP", solucoes=[SolucaoTipo.GD],
+                       custo_kwh_gd=0.6, total_clientes=1, avaliacao_media=4),
+            Fornecedor(id="faixas", nome="Faixas", logo="", estado="SP", solucoes=[SolucaoTipo.GD],
+                       custo_kwh_gd=0.7, total_clientes=1, avaliacao_media=4,
+                       estruturas_tarifarias={SolucaoTipo.GD: escalonada}),
+        ]
+        catalogo = Catalogo([estado], fornecedores)
+        assert isinstance(catalogo.indices_melhor_oferta[("SP", SolucaoTipo.GD)], EnvelopeInferior)
+        assert isinstance(Catalogo(ESTADOS, FORNECEDORES).indices_melhor_oferta[("SP", SolucaoTipo.GD)], IndicePrecoFixo)
+        
+        assert calcular_melhor_economia(catalogo, "SP", SolucaoTipo.GD, 500).fornecedor_id == "plana"
+        melhor = calcular_melhor_economia(catalogo, "SP", SolucaoTipo.GD, 5000)
+        custo = custo_curva(escalonada.curva_custo(), 5000)
+        assert custo == pytest.approx(50 + 700 + 4000 * 0.3)
+        assert melhor.fornecedor_id == "faixas"
+        assert melhor.custo_com_fornecedor == round(custo, 2)
+        assert melhor.economia_mensal == round(5000 * 0.9 - custo, 2)
+
+
 class TestCalculoEconomia:
     """Testes para função de cálculo de economia"""
     
@@ -138,4 +222,79 @@ class TestCalculoEconomia:
         # 1000 * 0.50 = 500 (custo fornecedor)
         # Economia = 500 (50%)
         
-        assert abs(economia.economia_percentual - 50.0) < 0.1
\ No newline at end of file
+        assert abs(economia.economia_percentual - 50.0) < 0.1
+
+
+class TestCalculoEconomiaLote:
+    """Testes do cálculo vetorizado em lote"""
+    
+    def test_lote_igual_ao_calculo_individual(self):
+        """Testa que o lote reproduz o cálculo individual do melhor fornecedor"""
+        entradas = [
+            (uf, consumo)
+            for uf in ["SP", "RJ", "MG", "BA", "CE"]
+            for consumo in [1, 100, 333.33, 12345.678, 30000]
+        ]
+        
+        resultados = calcular_economia_lote(entradas)
+        
+        for (uf, consumo), resultado in zip(entradas, resultados):
+            estado = get_estado(uf)
+            assert resultado.custo_atual_mensal == consumo * estado.tarifa_base_kwh
+            for melhor in resultado.melhores_economias:
+                candidatos = [
+                    calcular_economia(f, melhor.solucao, consumo, estado.tarifa_base_kwh)
+                    for f in get_fornecedores_por_estado(uf)
+                    if melhor.solucao in f.solucoes
+                ]
+                esperado = max(candidatos, key=lambda e: e.economia_mensal)
+                assert melhor.fornecedor.id == esperado.fornecedor.id
+                assert melhor.custo_com_fornecedor == esperado.custo_com_fornecedor
+                assert melhor.economia_mensal == esperado.economia_mensal
+                assert melhor.economia_percentual == esperado.economia_percentual
+                assert melhor.economia_anual == esperado.economia_anual
+    
+    def test_lote_entradas_invalidas(self):
+        """Testa que UF inexistente e consumo não positivo retornam None"""
+        resultados = calcular_economia_lote([("XX", 100), ("SP", 0), ("SP", -5), ("SP", 100)])
+        assert resultados[:3] == [None, None, None]
+        assert resultados[3] is not None
+        assert [e.solucao for e in resultados[3].melhores_economias] == [
+            SolucaoTipo.GD, SolucaoTipo.MERCADO_LIVRE
+        ]
+    
+    def test_lote_vazio(self):
+        """Testa lote sem entradas"""
+        assert calcular_economia_lote([]) == []
+
+
+class TestComparacaoEstados:
+    """Testes da comparação matricial entre estados"""
+    
+    def test_igual_ao_lote_e_ordenada_por_economia(self):
+        """Testa que a comparação reproduz o cálculo por UF e ordena pela maior economia"""
+        entradas = [(e.uf, 1234.5) for e in ESTADOS]
+        comparacao = comparar_estados(entradas)
+        por_uf = {r.uf: r for r in calcular_economia_lote(entradas)}
+        
+        assert sorted(r.uf for r in comparacao) == sorted(por_uf)
+        for resultado in comparacao:
+            assert resultado.custo_atual_mensal == por_uf[resultado.uf].custo_atual_mensal
+            assert resultado.melhores_economias == por_uf[resultado.uf].melhores_economias
+        
+        melhores = [max(e.economia_mensal for e in r.melhores_economias) for r in comparacao]
+        assert melhores == sorted(melhores, reverse=True)
+    
+    def test_estados_com_quantidades_diferentes_de_fornecedores(self):
+        """Testa o preenchimento da matriz quando um estado não oferece uma solução"""
+        catalogo = Catalogo(ESTADOS, [f for f in FORNECEDORES if f.estado != "RJ" or f.id == "f4"])
+        assert catalogo.precos_por_estado[SolucaoTipo.GD].shape == (len(ESTADOS), 2)
+        
+        resultados = {r.uf: r for r in comparar_estados([("RJ", 500), ("SP", 500)], catalogo)}
+        assert [e.solucao for e in resultados["RJ"].melhores_economias] == [SolucaoTipo.GD]
+        assert len(resultados["SP"].melhores_economias) == 2
+    
+    def test_unidades_invalidas_ficam_de_fora(self):
+        """Testa UF inexistente, consumo não positivo e unidades repetidas no mesmo estado"""
+        resultados = comparar_estados([("XX", 100), ("SP", 0), ("SP", 100), ("SP", 200)])
+        assert [(r.uf, r.consumo_kwh) for r in resultados] == [("SP", 200), ("SP", 100)]
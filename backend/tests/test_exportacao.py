@@ -0,0 +1,118 @@
+import asyncio
+import csv
+import io
+import json
+import pytest
+from httpx import ASGITransport, AsyncClient
+from app.main import app
+from app.exportacao import COLUNAS_CSV, registro_exportacoes
+import app.exportacao as modulo_exportacao
+
+
+async def exportar(corpo: str, content_type: str, **params):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        return await client.post(
+            "/simulacoes/lote", content=corpo.encode(), params=params,
+            headers={"content-type": content_type, "origin": "http://localhost:3000"}
+        )
+
+
+@pytest.mark.asyncio
+class TestExportacaoLote:
+    """Testes do endpoint de simulação em lote com streaming"""
+    
+    async def test_csv_para_ndjson(self):
+        """Testa a leitura de CSV e a saída NDJSON na ordem de entrada"""
+        corpo = "cliente_id,uf,consumo_kwh\nc1,SP,1000\nc2,mg,500\n"
+        response = await exportar(corpo, "text/csv")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        linhas = [json.loads(l) for l in response.text.splitlines()]
+        assert [l["cliente_id"] for l in linhas] == ["c1", "c2"]
+        assert linhas[0]["custo_atual_mensal"] == 920.0
+        assert linhas[0]["economias"][0] == {
+            "solucao": "GD", "fornecedor_id": "f1", "fornecedor_nome": "Energia Solar SP",
+            "custo_com_fornecedor": 650.0, "economia_mensal": 270.0,
+            "economia_percentual": 29.35, "economia_anual": 3240.0,
+        }
+        assert linhas[1]["uf"] == "MG"
+    
+    async def test_ndjson_para_csv_com_erros_por_linha(self):
+        """Testa que linhas inválidas viram erro na própria linha, sem interromper o lote"""
+        corpo = "\n".join([
+            json.dumps({"cliente_id": 1, "uf": "SP", "consumo_kwh": 100}),
+            json.dumps({"cliente_id": 2, "uf": "XX", "consumo_kwh": 100}),
+            json.dumps({"cliente_id": 3, "uf": "RJ", "consumo_kwh": "abc"}),
+            json.dumps({"cliente_id": 4, "uf": "RJ", "consumo_kwh": 0}),
+            "{quebrado",
+        ])
+        response = await exportar(corpo, "application/x-ndjson", formato="csv")
+        
+        linhas = list(csv.DictReader(io.StringIO(response.text)))
+        assert list(linhas[0].keys()) == COLUNAS_CSV
+        assert linhas[0]["gd_fornecedor_id"] == "f1" and linhas[0]["erro"] == ""
+        assert [l["erro"].split(":")[0] for l in linhas[1:]] == [
+            "Estado não encontrado", "Consumo inválido", "Consumo deve ser maior que zero", "JSON inválido"
+        ]
+        
+        progresso = registro_exportacoes.buscar(response.headers["x-exportacao-id"]).como_dict()
+        assert progresso["estado"] == "concluida"
+        assert progresso["linhas_processadas"] == 5
+        assert progresso["erros"] == 4
+    
+    async def test_lotes_pequenos_mantem_resultados(self, monkeypatch):
+        """Testa que o resultado não depende do tamanho do lote"""
+        corpo = "uf;consumo_kwh\n" + "".join(f"SP;{100 + i}\n" for i in range(25))
+        esperado = (await exportar(corpo, "text/csv")).text
+        monkeypatch.setattr(modulo_exportacao, "LOTE_LINHAS", 4)
+        assert (await exportar(corpo, "text/csv")).text == esperado
+    
+    async def test_cabecalho_invalido_e_tipo_nao_suportado(self):
+        """Testa os erros de formato de entrada"""
+        response = await exportar("a,b\n1,2\n", "text/csv")
+        assert json.loads(response.text.splitlines()[-1])["erro"].startswith("O CSV precisa")
+        assert (await exportar("x", "text/plain")).status_code == 415
+    
+    async def test_consulta_de_progresso(self):
+        """Testa a rota de progresso"""
+        response = await exportar("uf,consumo_kwh\nSP,100\n", "text/csv")
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            progresso = await client.get(f"/simulacoes/lote/{response.headers['x-exportacao-id']}")
+            inexistente = await client.get("/simulacoes/lote/nao-existe")
+        # O frontend só lê o id se o CORS o expuser
+        assert "x-exportacao-id" in response.headers["access-control-expose-headers"].lower()
+        assert progresso.json()["linhas_lidas"] == 1
+        assert inexistente.status_code == 404
+    
+    async def test_cancelamento_na_desconexao(self, monkeypatch):
+        """Testa que a desconexão do cliente interrompe o processamento"""
+        monkeypatch.setattr(modulo_exportacao, "LOTE_LINHAS", 1)
+        recebidos = []
+        mensagens = [
+            {"type": "http.request", "body": b"uf,consumo_kwh\n", "more_body": True},
+            {"type": "http.request", "body": b"SP,100\n", "more_body": True},
+        ]
+        
+        async def receive():
+            if mensagens:
+                return mensagens.pop(0)
+            await asyncio.sleep(0.05)
+            return {"type": "http.disconnect"}
+        
+        async def send(mensagem):
+            recebidos.append(mensagem)
+        
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": "/simulacoes/lote", "raw_path": b"/simulacoes/lote",
+            "query_string": b"", "root_path": "", "server": ("test", 80), "client": ("test", 1),
+            "headers": [(b"content-type", b"text/csv"), (b"host", b"test")],
+        }
+        await asyncio.wait_for(app(scope, receive, send), timeout=5)
+        
+        inicio = next(m for m in recebidos if m["type"] == "http.response.start")
+        exportacao_id = dict(inicio["headers"])[b"x-exportacao-id"].decode()
+        progresso = registro_exportacoes.buscar(exportacao_id)
+        assert progresso.estado == "cancelada"
+        assert progresso.linhas_processadas == 1
@@ -0,0 +1,93 @@
+import random
+from typing import Tuple
+from app.indice import EnvelopeInferior, IndicePrecoFixo, construir_indice, custo_curva
+from app.models import Fornecedor, SegmentoCusto, SolucaoTipo
+
+
+class FornecedorPorTrechos(Fornecedor):
+    """Fornecedor de teste com curva de custo arbitrária"""
+    
+    trechos: Tuple[SegmentoCusto, ...] = ()
+    
+    def curva_custo(self, solucao: SolucaoTipo) -> Tuple[SegmentoCusto, ...]:
+        return self.trechos
+
+
+def criar_fornecedor(id: str, custo_kwh_gd: float = 0.5, trechos=()) -> Fornecedor:
+    return FornecedorPorTrechos(
+        id=id,
+        nome=id,
+        logo="https://example.com/logo.png",
+        estado="SP",
+        solucoes=[SolucaoTipo.GD],
+        custo_kwh_gd=custo_kwh_gd,
+        total_clientes=100,
+        avaliacao_media=4.5,
+        trechos=trechos or (SegmentoCusto(0.0, 0.0, custo_kwh_gd),)
+    )
+
+
+class TestIndiceMelhorOferta:
+    """Testes do índice de melhor fornecedor"""
+    
+    def test_preco_fixo_usa_argmin(self):
+        """Testa que preços fixos por kWh geram tabela de argmin"""
+        fornecedores = [criar_fornecedor("a", 0.7), criar_fornecedor("b", 0.5), criar_fornecedor("c", 0.5)]
+        por_custo = sorted(fornecedores, key=lambda f: f.custo_kwh_gd)
+        
+        indice = construir_indice(fornecedores, por_custo, SolucaoTipo.GD)
+        
+        assert isinstance(indice, IndicePrecoFixo)
+        assert indice.melhor(1).id == "b"
+        assert indice.melhor(1_000_000).id == "b"
+    
+    def test_taxa_fixa_troca_vencedor(self):
+        """Testa que a taxa fixa faz o vencedor depender do consumo"""
+        fornecedores = [
+            criar_fornecedor("sem_taxa", trechos=(SegmentoCusto(0.0, 0.0, 0.8),)),
+            criar_fornecedor("com_taxa", trechos=(SegmentoCusto(0.0, 1000.0, 0.4),)),
+        ]
+        
+        indice = construir_indice(fornecedores, fornecedores, SolucaoTipo.GD)
+        
+        assert isinstance(indice, EnvelopeInferior)
+        # Equilíbrio em 0.8x = 1000 + 0.4x => x = 2500 kWh
+        assert indice.melhor(1000).id == "sem_taxa"
+        assert indice.melhor(10000).id == "com_taxa"
+    
+    def test_envoltoria_igual_forca_bruta(self):
+        """Testa a envoltória contra a avaliação de todas as curvas"""
+        gerador = random.Random(42)
+        fornecedores = []
+        for i in range(40):
+            inicios = sorted(gerador.sample(range(1, 50000), gerador.randint(0, 3)))
+            trechos = [SegmentoCusto(0.0, gerador.uniform(0, 2000), gerador.uniform(0.3, 0.9))]
+            for inicio in inicios:
+                trechos.append(SegmentoCusto(float(inicio), gerador.uniform(0, 5000), gerador.uniform(0.3, 0.9)))
+            fornecedores.append(criar_fornecedor(f"f{i}", trechos=tuple(trechos)))
+        
+        indice = EnvelopeInferior(fornecedores, SolucaoTipo.GD)
+        
+        for _ in range(2000):
+            consumo = gerador.uniform(1, 60000)
+            minimo = min(custo_curva(f.curva_custo(SolucaoTipo.GD), consumo) for f in fornecedores)
+            escolhido = indice.melhor(consumo)
+            assert abs(custo_curva(escolhido.curva_custo(SolucaoTipo.GD), consumo) - minimo) < 1e-6
+    
+    def test_envoltoria_linear_e_empates(self):
+        """Testa que a envoltória tem no máximo um trecho por trecho de entrada e que empates ficam com o primeiro"""
+        gerador = random.Random(7)
+        fornecedores = [
+            criar_fornecedor(f"f{i}", trechos=(
+                SegmentoCusto(0.0, gerador.uniform(0, 2000), gerador.uniform(0.3, 0.9)),
+                SegmentoCusto(float(gerador.randint(1, 50000)), gerador.uniform(0, 5000), gerador.uniform(0.3, 0.9)),
+            ))
+            for i in range(500)
+        ]
+        fornecedores.append(criar_fornecedor("copia", trechos=fornecedores[0].trechos))
+        
+        indice = EnvelopeInferior(fornecedores, SolucaoTipo.GD)
+        
+        assert len(indice.retas) <= 3 * len(fornecedores)
+        assert all(a < b for a, b in zip(indice.inicios, indice.inicios[1:]))
+        assert "copia" not in {indice.fornecedores[r[2]].id for r in indice.retas}
@@ -0,0 +1,73 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+from app.main import app
+from app.metricas import Histograma, RegistroMetricas
+
+
+class TestRegistroMetricas:
+    """Testes do registro de métricas"""
+    
+    def test_histograma_cumulativo(self):
+        """Testa buckets cumulativos, soma e contagem no formato Prometheus"""
+        registro = RegistroMetricas()
+        for valor in (0.0004, 0.003, 0.003, 20.0):
+            registro.observar("latencia_segundos", valor, "Latência", rota="x")
+        
+        texto = registro.exportar()
+        
+        assert "# TYPE latencia_segundos histogram" in texto
+        assert 'latencia_segundos_bucket{rota="x",le="0.0005"} 1' in texto
+        assert 'latencia_segundos_bucket{rota="x",le="0.005"} 3' in texto
+        assert 'latencia_segundos_bucket{rota="x",le="10.0"} 3' in texto
+        assert 'latencia_segundos_bucket{rota="x",le="+Inf"} 4' in texto
+        assert 'latencia_segundos_count{rota="x"} 4' in texto
+    
+    def test_contador_e_escape_de_rotulos(self):
+        """Testa contadores e escape de aspas nos rótulos"""
+        registro = RegistroMetricas()
+        registro.incrementar("erros_total", 2, operacao='a"b')
+        registro.incrementar("erros_total", 1, operacao='a"b')
+        assert 'erros_total{operacao="a\\"b"} 3' in registro.exportar()
+    
+    def test_limite_de_cardinalidade(self):
+        """Testa que séries além do limite são agrupadas"""
+        registro = RegistroMetricas()
+        for i in range(500):
+            registro.incrementar("operacoes_total", operacao=f"op{i}")
+        series = registro.contadores["operacoes_total"]
+        assert len(series) <= 201
+        assert series[(("operacao", "outras"),)] == 300
+    
+    def test_histograma_sem_observacoes(self):
+        """Testa histograma vazio"""
+        histograma = Histograma()
+        assert histograma.total == 0
+        assert sum(histograma.contagens) == 0
+
+
+@pytest.mark.asyncio
+class TestEndpointMetricas:
+    """Testes da rota /metrics"""
+    
+    async def test_metricas_apos_operacoes(self):
+        """Testa que operações, resolvers, erros e caches aparecem em /metrics"""
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            await client.post("/graphql", json={"query": "query Metricas { estados { uf } }"})
+            await client.post(
+                "/graphql",
+                json={"query": 'query MetricasSim { simularEconomia(uf: "SP", consumoKwh: 10) { custoAtualMensal } }'}
+            )
+            await client.post("/graphql", json={"query": "query MetricasErro { inexistente }"})
+            response = await client.get("/metrics")
+        
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        texto = response.text
+        assert 'graphql_operacao_segundos_count{operacao="Metricas"}' in texto
+        assert 'graphql_fase_segundos_count{fase="execute",operacao="Metricas"}' in texto
+        assert 'graphql_resolver_segundos_count{campo="Query.simularEconomia"}' in texto
+        assert 'graphql_resolver_segundos_count{campo="ResultadoSimulacao.custoAtualMensal"}' in texto
+        assert 'campo="EstadoType.uf"' not in texto
+        assert 'graphql_erros_total{operacao="MetricasErro"} 1' in texto
+        assert 'cache_taxa_acerto{cache="simulacoes"}' in texto
+        assert "graphql_serializacao_segundos_count" in texto
@@ -0,0 +1,108 @@
+import json
+import pytest
+from httpx import ASGITransport, AsyncClient
+from app.main import app, graphql_app
+from app.persistidas import ErroConsultaPersistida, RegistroConsultas, cache_documentos, hash_consulta
+import strawberry.schema.execute as execucao
+
+
+ESTADOS = "query GetEstados { estados { uf nome tarifaBaseKwh } }"
+
+
+def extensao(consulta: str) -> dict:
+    return {"persistedQuery": {"version": 1, "sha256Hash": hash_consulta(consulta)}}
+
+
+@pytest.fixture
+def registro(monkeypatch):
+    registro = RegistroConsultas()
+    monkeypatch.setattr(graphql_app, "consultas_persistidas", registro)
+    return registro
+
+
+class TestRegistroConsultas:
+    """Testes do registro de consultas persistidas"""
+    
+    def test_hash_divergente(self):
+        """Testa que o hash precisa corresponder ao texto"""
+        with pytest.raises(ErroConsultaPersistida) as erro:
+            RegistroConsultas().registrar("0" * 64, ESTADOS)
+        assert erro.value.codigo == "PERSISTED_QUERY_HASH_MISMATCH"
+    
+    def test_lista_de_permissao(self):
+        """Testa que o modo lista só aceita documentos conhecidos"""
+        registro = RegistroConsultas({"estados": ESTADOS}, somente_lista=True)
+        
+        assert registro.resolver({"extensions": extensao(ESTADOS)})["query"] == ESTADOS
+        assert registro.resolver({"query": ESTADOS})["query"] == ESTADOS
+        
+        outra = "{ estados { uf } }"
+        for dados in ({"query": outra}, {"query": outra, "extensions": extensao(outra)}):
+            with pytest.raises(ErroConsultaPersistida) as erro:
+                registro.resolver(dados)
+            assert erro.value.codigo == "PERSISTED_QUERY_NOT_ALLOWED"
+    
+    def test_de_arquivo(self, tmp_path):
+        """Testa carga da lista de consultas a partir de JSON"""
+        caminho = tmp_path / "consultas.json"
+        caminho.write_text(json.dumps([ESTADOS]), encoding="utf-8")
+        registro = RegistroConsultas.de_arquivo(str(caminho))
+        assert registro.buscar(hash_consulta(ESTADOS)) == ESTADOS
+
+
+@pytest.mark.asyncio
+class TestConsultasPersistidasAPI:
+    """Testes do fluxo de Automatic Persisted Queries na API"""
+    
+    async def test_fluxo_registro(self, registro):
+        """Testa hash desconhecido, registro e uso só com o hash"""
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/graphql", json={"extensions": extensao(ESTADOS)})
+            assert response.status_code == 200
+            erro = response.json()["errors"][0]
+            assert erro["message"] == "PersistedQueryNotFound"
+            assert erro["extensions"]["code"] == "PERSISTED_QUERY_NOT_FOUND"
+            
+            response = await client.post(
+                "/graphql", json={"query": ESTADOS, "extensions": extensao(ESTADOS)}
+            )
+            assert len(response.json()["data"]["estados"]) > 0
+            
+            response = await client.post("/graphql", json={"extensions": extensao(ESTADOS)})
+            assert len(response.json()["data"]["estados"]) > 0
+    
+    async def test_persistida_via_get(self, registro):
+        """Testa consulta persistida enviada por GET"""
+        registro.registrar(hash_consulta(ESTADOS), ESTADOS)
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.get(
+                "/graphql", params={"extensions": json.dumps(extensao(ESTADOS))}
+            )
+            assert response.status_code == 200
+            assert len(response.json()["data"]["estados"]) > 0
+    
+    async def test_documento_reaproveitado(self, registro, monkeypatch):
+        """Testa que consultas repetidas não são analisadas nem validadas de novo"""
+        chamadas = []
+        parse_document = execucao.parse_document
+        validate_document = execucao.validate_document
+        monkeypatch.setattr(execucao, "parse_document", lambda *a, **k: chamadas.append("parse") or parse_document(*a, **k))
+        monkeypatch.setattr(execucao, "validate_document", lambda *a, **k: chamadas.append("validate") or validate_document(*a, **k))
+        
+        consulta = "query Repetida { estados { uf } }"
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            for _ in range(3):
+                response = await client.post("/graphql", json={"query": consulta})
+                assert len(response.json()["data"]["estados"]) > 0
+        
+        assert chamadas == ["parse", "validate"]
+        assert cache_documentos.get(hash_consulta(consulta)) is not None
+    
+    async def test_documento_invalido_nao_entra_no_cache(self, registro):
+        """Testa que documentos com erro de validação não são memorizados"""
+        consulta = "{ estados { campoInexistente } }"
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            for _ in range(2):
+                response = await client.post("/graphql", json={"query": consulta})
+                assert "errors" in response.json()
+        assert cache_documentos.get(hash_consulta(consulta)) is None
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from app.data import Catalogo, ESTADOS, FORNECEDORES
+from app.models import SolucaoTipo
+from app.projecao import CenarioContrato, projetar_contrato
+from app.schema import calcular_economia
+
+
+@pytest.fixture
+def catalogo():
+    return Catalogo(ESTADOS, FORNECEDORES)
+
+
+class TestProjecaoContrato:
+    """Testes da projeção de contratos com reajustes e VPL"""
+
+    def test_sem_reajuste_repete_simulacao(self, catalogo):
+        """Testa que sem reajuste e desconto cada mês repete simularEconomia"""
+        custo_atual, projecoes = projetar_contrato("SP", 5000, CenarioContrato(anos=3), catalogo)
+        estado = catalogo.get_estado("SP")
+        assert custo_atual.shape == (36,)
+        for projecao in projecoes:
+            for linha, fornecedor in enumerate(projecao.fornecedores):
+                esperado = calcular_economia(fornecedor, projecao.solucao, 5000, estado.tarifa_base_kwh)
+                assert np.all(projecao.custo_mensal[linha] == esperado.custo_com_fornecedor)
+                assert np.all(projecao.economia_mensal[linha] == esperado.economia_mensal)
+                assert projecao.economia_acumulada[linha, -1] == pytest.approx(esperado.economia_mensal * 36)
+                assert projecao.vpl[linha] == pytest.approx(esperado.economia_mensal * 36)
+                assert projecao.payback_meses[linha] == 1
+
+    def test_reajustes_payback_e_vpl(self, catalogo):
+        """Testa reajustes anuais, payback com custo de migração e VPL contra o cálculo mês a mês"""
+        cenario = CenarioContrato(
+            anos=10, reajuste_tarifa_percentual=8, reajuste_contrato_percentual=3,
+            taxa_desconto_percentual=12, custo_migracao=20000
+        )
+        custo_atual, projecoes = projetar_contrato("SP", 5000, cenario, catalogo)
+        tarifa = catalogo.get_estado("SP").tarifa_base_kwh
+        assert custo_atual[11] == pytest.approx(5000 * tarifa)
+        assert custo_atual[12] == pytest.approx(5000 * tarifa * 1.08)
+        assert custo_atual[119] == pytest.approx(5000 * tarifa * 1.08 ** 9)
+
+        ml = next(p for p in projecoes if p.solucao == SolucaoTipo.MERCADO_LIVRE)
+        for linha, fornecedor in enumerate(ml.fornecedores):
+            acumulada, vpl, payback = 0.0, -20000.0, None
+            for mes in range(120):
+                economia = custo_atual[mes] - 5000 * fornecedor.custo_kwh(ml.solucao) * 1.03 ** (mes // 12)
+                acumulada += economia
+                vpl += economia / 1.12 ** ((mes + 1) / 12)
+                if payback is None and acumulada >= 20000:
+                    payback = mes + 1
+            assert ml.economia_acumulada[linha, -1] == pytest.approx(acumulada)
+            assert ml.vpl[linha] == pytest.approx(vpl)
+            assert ml.payback_meses[linha] == payback
+
+    def test_sem_payback_no_prazo(self, catalogo):
+        """Testa payback -1 quando o custo de migração não é recuperado"""
+        _, projecoes = projetar_contrato("SP", 100, CenarioContrato(anos=1, custo_migracao=1e6), catalogo)
+        assert all(np.all(p.payback_meses == -1) for p in projecoes)
+        assert all(np.all(p.vpl < 0) for p in projecoes)
+
+    def test_validacao(self, catalogo):
+        """Testa prazo, taxas e custo de migração inválidos e UF inexistente"""
+        for cenario in (
+            CenarioContrato(anos=0),
+            CenarioContrato(anos=31),
+            CenarioContrato(anos=5, taxa_desconto_percentual=-100),
+            CenarioContrato(anos=5, reajuste_contrato_percentual=float("nan")),
+            CenarioContrato(anos=5, custo_migracao=-1),
+        ):
+            with pytest.raises(ValueError):
+                projetar_contrato("SP", 1000, cenario, catalogo)
+        assert projetar_contrato("XX", 1000, CenarioContrato(anos=5), catalogo) is None
+        assert projetar_contrato("SP", 0, CenarioContrato(anos=5), catalogo) is None
@@ -0,0 +1,114 @@
+import json
+import pytest
+from httpx import ASGITransport, AsyncClient
+from app.main import app
+from app.rastreamento import ExportadorArquivo, Rastreador, extrair_contexto, rastreador, span, trace_atual
+
+CONSULTA = '{ simularEconomia(uf: "SP", consumoKwh: 1000) { custoAtualMensal } }'
+CONSULTA_COM_ESTADO = '{ simularEconomia(uf: "SP", consumoKwh: 1000) { custoAtualMensal estado { nome } } }'
+
+
+class TestRastreamento:
+    """Testes de spans, amostragem e propagação"""
+    
+    def test_span_sem_trace_ativo_nao_registra(self):
+        """Testa que fora de um trace os spans são no-op"""
+        with span("qualquer"):
+            assert trace_atual() is None
+    
+    def test_spans_aninhados(self):
+        """Testa a hierarquia de spans e o resumo por fase"""
+        raiz = Rastreador().iniciar("raiz")
+        with raiz:
+            with span("externo") as externo:
+                with span("interno") as interno:
+                    pass
+        
+        assert interno.pai_id == externo.span_id
+        assert externo.pai_id == raiz.span_id
+        assert set(raiz.trace.como_dict()["fases_ms"]) == {"externo", "interno"}
+    
+    def test_extrair_traceparent(self):
+        """Testa a leitura do cabeçalho W3C traceparent"""
+        trace_id, pai_id, amostrado = extrair_contexto(
+            {"traceparent": "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01"}
+        )
+        assert trace_id == "0af7651916cd43dd8448eb211c80319c"
+        assert pai_id == "b7ad6b7169203331"
+        assert amostrado is True
+        assert extrair_contexto({"traceparent": "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-00"})[2] is False
+        assert extrair_contexto({"x-trace-id": "abc"}) == ("abc", None, None)
+    
+    def test_amostragem(self):
+        """Testa que a decisão propagada só força a amostragem com cabeçalhos confiáveis"""
+        assert Rastreador(amostragem=0.0).amostrar(None) is False
+        assert Rastreador(amostragem=1.0).amostrar(None) is True
+        assert Rastreador(amostragem=1.0).amostrar(False) is False
+        assert Rastreador(amostragem=0.0).amostrar(True) is False
+        assert Rastreador(amostragem=0.0, confiar_cabecalhos=True).amostrar(True) is True
+    
+    def test_exportador_arquivo(self, tmp_path):
+        """Testa a gravação de traces em JSON Lines"""
+        caminho = tmp_path / "traces.jsonl"
+        raiz = Rastreador().iniciar("raiz")
+        with raiz:
+            pass
+        ExportadorArquivo(str(caminho)).exportar(raiz.trace)
+        linhas = caminho.read_text().splitlines()
+        assert json.loads(linhas[0])["trace_id"] == raiz.trace.trace_id
+
+
+@pytest.mark.asyncio
+class TestRastreamentoHTTP:
+    """Testes do middleware e da rota de depuração"""
+    
+    async def test_requisicao_amostrada_registra_fases(self, monkeypatch):
+        """Testa que uma requisição amostrada registra as fases e propaga o trace id"""
+        monkeypatch.setattr(rastreador, "confiar_cabecalhos", True)
+        monkeypatch.setenv("ADMIN_TOKEN", "segredo")
+        trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post(
+                "/graphql", json={"query": CONSULTA_COM_ESTADO},
+                headers={"traceparent": f"00-{trace_id}-00f067aa0ba902b7-01"}
+            )
+            assert response.headers["x-trace-id"] == trace_id
+            
+            debug = await client.get(
+                "/debug/traces", params={"limite": 200}, headers={"X-Admin-Token": "segredo"}
+            )
+        
+        trace = next(t for t in debug.json()["traces"] if t["trace_id"] == trace_id)
+        assert trace["spans"][0]["pai_id"] == "00f067aa0ba902b7"
+        for fase in ("asgi.receive", "graphql.parse", "graphql.validate", "graphql.execute",
+                     "resolver.Query.simularEconomia", "dataloader.estados", "graphql.serializacao"):
+            assert fase in trace["fases_ms"]
+    
+    async def test_amostragem_forcada_sem_confianca(self, monkeypatch):
+        """Testa que, por padrão, o cliente não consegue forçar o rastreamento"""
+        monkeypatch.setattr(rastreador, "amostragem", 0.0)
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post(
+                "/graphql", json={"query": CONSULTA}, headers={"x-trace-sampled": "1"}
+            )
+        assert "x-trace-id" not in response.headers
+    
+    async def test_debug_traces_exige_token(self, monkeypatch):
+        """Testa que a rota de traces segue o token de administração"""
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            monkeypatch.delenv("ADMIN_TOKEN", raising=False)
+            assert (await client.get("/debug/traces")).status_code == 404
+            monkeypatch.setenv("ADMIN_TOKEN", "segredo")
+            assert (await client.get("/debug/traces")).status_code == 403
+            assert (await client.get("/debug/traces", headers={"X-Admin-Token": "x"})).status_code == 403
+            assert (await client.get("/debug/traces", headers={"X-Admin-Token": "segredo"})).status_code == 200
+    
+    async def test_requisicao_nao_amostrada(self):
+        """Testa que requisições fora da amostra não geram trace"""
+        antes = len(rastreador.memoria.traces)
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post(
+                "/graphql", json={"query": CONSULTA}, headers={"x-trace-sampled": "0"}
+            )
+        assert "x-trace-id" not in response.headers
+        assert len(rastreador.memoria.traces) == antes
@@ -0,0 +1,177 @@
+import sqlite3
+import threading
+import pytest
+from app.data import ESTADOS, FORNECEDORES, get_catalogo
+from app.models import SolucaoTipo
+from app.repositorio import (
+    RepositorioSQLite, configurar_repositorio, get_repositorio, obter_catalogo, pre_carregar_catalogo
+)
+import app.repositorio as modulo_repositorio
+
+
+@pytest.fixture
+def sqlite(tmp_path):
+    repositorio = RepositorioSQLite(tmp_path / "catalogo.db", tamanho_pool=2)
+    repositorio.criar_tabelas()
+    yield repositorio
+    repositorio.fechar()
+
+
+class TestRepositorioSQLite:
+    """Testes do catálogo persistido em SQLite"""
+    
+    def test_semente_preserva_dados_e_ordem(self, sqlite):
+        """Testa que a semente grava as listas de app/data.py sem perdas"""
+        sqlite.semear(ESTADOS, FORNECEDORES)
+        assert sqlite.listar_estados() == ESTADOS
+        assert sqlite.listar_fornecedores() == FORNECEDORES
+    
+    def test_migra_banco_sem_estruturas_tarifarias(self, tmp_path):
+        """Testa que criar_tabelas adiciona as colunas de estrutura tarifária a bancos antigos"""
+        caminho = tmp_path / "antigo.db"
+        with sqlite3.connect(caminho) as conexao:
+            conexao.execute(
+                "CREATE TABLE estados (uf TEXT PRIMARY KEY, nome TEXT NOT NULL, tarifa_base_kwh REAL NOT NULL)"
+            )
+            conexao.execute("INSERT INTO estados VALUES ('RJ', 'Rio de Janeiro', 0.98)")
+        repositorio = RepositorioSQLite(caminho, tamanho_pool=1)
+        try:
+            repositorio.criar_tabelas()
+            assert repositorio.listar_estados()[0].estrutura_tarifaria is None
+            repositorio.semear(ESTADOS, FORNECEDORES)
+            estados = {e.uf: e for e in repositorio.listar_estados()}
+            assert estados["SP"].estrutura_tarifaria == ESTADOS[0].estrutura_tarifaria
+        finally:
+            repositorio.fechar()
+    
+    def test_busca_por_ids(self, sqlite):
+        """Testa busca em lote por id mantendo a ordem pedida"""
+        sqlite.semear(ESTADOS, FORNECEDORES)
+        encontrados = sqlite.buscar_fornecedores(["f3", "inexistente", "f1"])
+        assert encontrados[0].id == "f3"
+        assert encontrados[1] is None
+        assert encontrados[2].id == "f1"
+    
+    def test_busca_por_solucao(self, sqlite):
+        """Testa filtro por UF e tipo de solução"""
+        sqlite.semear(ESTADOS, FORNECEDORES)
+        ids = [f.id for f in sqlite.listar_fornecedores_por_solucao("SP", SolucaoTipo.MERCADO_LIVRE)]
+        assert ids == ["f2", "f3"]
+    
+    def test_indices_por_uf_e_solucao(self, sqlite):
+        """Testa que as consultas por UF e solução usam índices"""
+        with sqlite._conexao() as conexao:
+            plano_uf = conexao.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM fornecedores WHERE estado = 'SP'"
+            ).fetchall()
+            plano_solucao = conexao.execute(
+                "EXPLAIN QUERY PLAN SELECT fornecedor_id FROM fornecedor_solucoes WHERE solucao = 'GD'"
+            ).fetchall()
+        assert "idx_fornecedores_estado" in str([tuple(linha) for linha in plano_uf])
+        assert "idx_fornecedor_solucoes_solucao" in str([tuple(linha) for linha in plano_solucao])
+    
+    def test_importar_csv(self, sqlite, tmp_path):
+        """Testa importação em massa de CSV com atualização de preços"""
+        estados = tmp_path / "estados.csv"
+        estados.write_text("uf,nome,tarifa_base_kwh\nSP,São Paulo,0.92\nAM,Amazonas,0.95\n", encoding="utf-8")
+        fornecedores = tmp_path / "fornecedores.csv"
+        fornecedores.write_text(
+            "id,nome,logo,estado,solucoes,custo_kwh_gd,custo_kwh_ml,total_clientes,avaliacao_media\n"
+            "a1,Amazonas Solar,https://example.com/a.png,AM,GD|Mercado Livre,0.70,0.66,10,4.1\n"
+            "a2,Norte Livre,https://example.com/b.png,AM,Mercado Livre,,0.61,20,3.9\n",
+            encoding="utf-8"
+        )
+        
+        assert sqlite.importar_csv_estados(estados) == 2
+        assert sqlite.importar_csv_fornecedores(fornecedores) == 2
+        
+        a1, a2 = sqlite.buscar_fornecedores(["a1", "a2"])
+        assert a1.solucoes == [SolucaoTipo.GD, SolucaoTipo.MERCADO_LIVRE]
+        assert a1.custo_kwh_gd == 0.70
+        assert a2.custo_kwh_gd is None
+        
+        fornecedores.write_text(
+            "id,nome,logo,estado,solucoes,custo_kwh_gd,custo_kwh_ml,total_clientes,avaliacao_media\n"
+            "a1,Amazonas Solar,https://example.com/a.png,AM,GD,0.68,,10,4.1\n",
+            encoding="utf-8"
+        )
+        sqlite.importar_csv_fornecedores(fornecedores)
+        a1 = sqlite.buscar_fornecedores(["a1"])[0]
+        assert a1.solucoes == [SolucaoTipo.GD]
+        assert a1.custo_kwh_gd == 0.68
+        assert len(sqlite.listar_fornecedores()) == 2
+    
+    def test_importar_csv_invalido(self, sqlite, tmp_path):
+        """Testa que linhas inválidas não são gravadas"""
+        fornecedores = tmp_path / "fornecedores.csv"
+        fornecedores.write_text(
+            "id,nome,logo,estado,solucoes,custo_kwh_gd,custo_kwh_ml,total_clientes,avaliacao_media\n"
+            "x1,Ok,https://example.com/a.png,SP,GD,0.5,,10,4.0\n"
+            "x2,Nota alta,https://example.com/b.png,SP,GD,0.5,,10,7.0\n",
+            encoding="utf-8"
+        )
+        with pytest.raises(ValueError):
+            sqlite.importar_csv_fornecedores(fornecedores)
+        assert sqlite.listar_fornecedores() == []
+    
+    def test_escrita_avanca_versao(self, sqlite):
+        """Testa que qualquer escrita muda a versão dos dados"""
+        versao = sqlite.versao_dados()
+        sqlite.semear(ESTADOS, FORNECEDORES)
+        assert sqlite.versao_dados() > versao
+    
+    @pytest.mark.asyncio
+    async def test_acesso_assincrono(self, sqlite):
+        """Testa o caminho assíncrono pelo pool de conexões"""
+        sqlite.semear(ESTADOS, FORNECEDORES)
+        estados = await sqlite.listar_estados_async()
+        fornecedores = await sqlite.listar_fornecedores_async()
+        assert [e.uf for e in estados] == [e.uf for e in ESTADOS]
+        assert fornecedores[0].nome == "Energia Solar SP"
+    
+    @pytest.mark.asyncio
+    async def test_catalogo_recarrega_quando_dados_mudam(self, sqlite, monkeypatch):
+        """Testa que alterações no banco chegam ao catálogo em memória"""
+        sqlite.semear(ESTADOS, FORNECEDORES)
+        anterior = get_repositorio()
+        monkeypatch.setattr(modulo_repositorio, "INTERVALO_VERIFICACAO", 0)
+        try:
+            configurar_repositorio(sqlite)
+            catalogo = await obter_catalogo()
+            assert catalogo.get_estado("SP").tarifa_base_kwh == 0.92
+            
+            with sqlite._conexao() as conexao:
+                conexao.execute("UPDATE estados SET tarifa_base_kwh = 1.10 WHERE uf = 'SP'")
+            
+            threads = []
+            recarregar = modulo_repositorio.recarregar_catalogo
+            monkeypatch.setattr(
+                modulo_repositorio, "recarregar_catalogo",
+                lambda *args: threads.append(threading.get_ident()) or recarregar(*args)
+            )
+            novo = await obter_catalogo()
+            assert threads and threads[0] != threading.get_ident()
+            assert novo.versao > catalogo.versao
+            assert novo.get_estado("SP").tarifa_base_kwh == 1.10
+            assert await obter_catalogo() is novo
+        finally:
+            configurar_repositorio(anterior)
+    
+    @pytest.mark.asyncio
+    async def test_pre_carregar_catalogo(self, sqlite, monkeypatch):
+        """Testa o carregamento antes do fork: o worker reabre o banco mas reaproveita o catálogo"""
+        sqlite.semear(ESTADOS, FORNECEDORES)
+        anterior = get_repositorio()
+        monkeypatch.setenv("CATALOGO_DB", sqlite.caminho)
+        monkeypatch.setattr(modulo_repositorio, "INTERVALO_VERIFICACAO", 0)
+        try:
+            catalogo = pre_carregar_catalogo()
+            assert modulo_repositorio._repositorio is None
+            assert len(catalogo.fornecedores) == len(FORNECEDORES)
+            assert catalogo.get_precos_por_custo("SP", SolucaoTipo.GD).flags.writeable is False
+            
+            assert await obter_catalogo() is catalogo
+            assert isinstance(get_repositorio(), RepositorioSQLite)
+        finally:
+            get_repositorio().fechar()
+            configurar_repositorio(anterior)
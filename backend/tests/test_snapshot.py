@@ -0,0 +1,125 @@
+import pytest
+from httpx import ASGITransport, AsyncClient
+from app.data import ESTADOS, FORNECEDORES, Catalogo, get_catalogo, publicar_catalogo
+from app.main import app
+from app.models import SolucaoTipo
+from app.snapshot import (
+    ErroSnapshot, VigiaSnapshots, ativar_snapshot, carregar_snapshot, ler_colunas,
+    listar_versoes, salvar_snapshot, snapshot_atual
+)
+import app.snapshot as modulo_snapshot
+
+
+@pytest.fixture
+def catalogo_original():
+    anterior = get_catalogo()
+    yield anterior
+    publicar_catalogo(anterior)
+
+
+class TestSnapshot:
+    """Testes do formato colunar de snapshots"""
+    
+    def test_ida_e_volta(self, tmp_path):
+        """Testa que o snapshot reproduz os dados do catálogo"""
+        diretorio = salvar_snapshot(tmp_path, ESTADOS, FORNECEDORES)
+        catalogo = carregar_snapshot(diretorio)
+        
+        assert [e.model_dump() for e in catalogo.estados] == [e.model_dump() for e in ESTADOS]
+        assert [f.model_dump() for f in catalogo.fornecedores] == [f.model_dump() for f in FORNECEDORES]
+        assert catalogo.get_melhor_fornecedor("SP", SolucaoTipo.GD, 1000).id == "f1"
+    
+    def test_fornecedores_montados_sob_demanda(self, tmp_path):
+        """Testa que carregar o snapshot não monta fornecedores e que a impressão é a do catálogo em memória"""
+        diretorio = salvar_snapshot(tmp_path, ESTADOS, FORNECEDORES)
+        catalogo = carregar_snapshot(diretorio)
+        
+        assert catalogo.impressao == Catalogo(ESTADOS, FORNECEDORES).impressao
+        assert list(catalogo.get_precos_por_custo("SP", SolucaoTipo.MERCADO_LIVRE)) == [0.58, 0.61]
+        # Só o grupo com estrutura tarifária própria (f2 no mercado livre de SP) examina as curvas
+        assert {m.id for m in catalogo.fornecedores._modelos if m} == {"f2", "f3"}
+        
+        assert [f.id if f else None for f in catalogo.buscar_fornecedores(["f3", "x", "f10"])] == ["f3", None, "f10"]
+        assert {m.id for m in catalogo.fornecedores._modelos if m} == {"f2", "f3", "f10"}
+        assert catalogo.get_fornecedor("f3") is catalogo.buscar_fornecedores(["f3"])[0]
+    
+    def test_colunas_mapeadas_em_memoria(self, tmp_path):
+        """Testa que as colunas numéricas são lidas por mmap, sem cópia"""
+        diretorio = salvar_snapshot(tmp_path, ESTADOS, FORNECEDORES)
+        colunas = ler_colunas(diretorio, "fornecedores")
+        assert colunas["custo_kwh_gd"].filename is not None
+        assert colunas["custo_kwh_gd"].flags.writeable is False
+        assert int(colunas["total_clientes"].sum()) == sum(f.total_clientes for f in FORNECEDORES)
+    
+    def test_versoes_e_ponteiro(self, tmp_path):
+        """Testa a numeração de versões, o ponteiro ATUAL e o rollback"""
+        salvar_snapshot(tmp_path, ESTADOS, FORNECEDORES)
+        segundo = salvar_snapshot(tmp_path, ESTADOS, FORNECEDORES[:3])
+        assert listar_versoes(tmp_path) == [1, 2]
+        assert snapshot_atual(tmp_path) == segundo
+        
+        ativar_snapshot(tmp_path, 1)
+        assert snapshot_atual(tmp_path).name == "00000001"
+        with pytest.raises(ErroSnapshot):
+            ativar_snapshot(tmp_path, 7)
+    
+    def test_vigia_publica_nova_versao(self, tmp_path, catalogo_original):
+        """Testa a troca atômica: quem capturou o catálogo anterior continua com ele"""
+        vigia = VigiaSnapshots(tmp_path)
+        assert vigia.atualizar() is None
+        
+        salvar_snapshot(tmp_path, ESTADOS, FORNECEDORES)
+        em_andamento = get_catalogo()
+        novo = vigia.atualizar()
+        assert novo is get_catalogo()
+        assert novo.versao > em_andamento.versao
+        assert vigia.atualizar() is None
+        
+        salvar_snapshot(tmp_path, ESTADOS, FORNECEDORES[:2])
+        assert len(vigia.atualizar().fornecedores) == 2
+        assert len(em_andamento.fornecedores) == len(FORNECEDORES)
+    
+    def test_vigia_ignora_snapshot_corrompido(self, tmp_path, catalogo_original):
+        """Testa que um snapshot inválido não substitui o catálogo publicado"""
+        diretorio = salvar_snapshot(tmp_path, ESTADOS, FORNECEDORES)
+        (diretorio / "fornecedores.nome.npy").unlink()
+        vigia = VigiaSnapshots(tmp_path)
+        
+        assert vigia.atualizar() is None
+        assert "00000001" in vigia.erro
+    
+    def test_vigia_sobrevive_a_raiz_ilegivel(self, tmp_path, catalogo_original):
+        """Testa que um erro ao ler o ponteiro fica registrado em vez de escapar do vigia"""
+        (tmp_path / "ATUAL").mkdir()
+        vigia = VigiaSnapshots(tmp_path)
+        assert vigia.atualizar() is None
+        assert vigia.erro
+        assert get_catalogo() is catalogo_original
+        assert get_catalogo() is catalogo_original
+
+
+@pytest.mark.asyncio
+class TestRecargaAdministrativa:
+    """Testes da rota de recarga do catálogo"""
+    
+    async def test_recarga_exige_token(self, tmp_path, monkeypatch, catalogo_original):
+        """Testa a autenticação e a publicação pela rota administrativa"""
+        salvar_snapshot(tmp_path, ESTADOS, FORNECEDORES[:4])
+        monkeypatch.setattr(modulo_snapshot, "vigia_snapshots", VigiaSnapshots(tmp_path))
+        monkeypatch.setenv("ADMIN_TOKEN", "segredo")
+        
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            negado = await client.post("/admin/catalogo/recarregar", headers={"X-Admin-Token": "x"})
+            aceito = await client.post("/admin/catalogo/recarregar", headers={"X-Admin-Token": "segredo"})
+        
+        assert negado.status_code == 403
+        assert aceito.status_code == 200
+        assert aceito.json()["fornecedores"] == 4
+        assert aceito.json()["versao"] == get_catalogo().versao
+    
+    async def test_recarga_desabilitada(self, monkeypatch):
+        """Testa que sem snapshots configurados a rota não existe"""
+        monkeypatch.setattr(modulo_snapshot, "vigia_snapshots", None)
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/admin/catalogo/recarregar")
+        assert response.status_code == 404
@@ -0,0 +1,206 @@
+import numpy as np
+import pytest
+from pydantic import ValidationError
+from app.data import Catalogo, ESTADOS, FORNECEDORES
+from app.models import BandeiraTarifaria, Estado, EstruturaTarifaria, FaixaConsumo, Fornecedor, SolucaoTipo
+from app.indice import custo_curva
+from app.schema import calcular_melhor_economia
+from app.tarifas import PerfisCarga, calendario, custo_mensal, horas_no_ano, precificar_perfis
+
+
+VERDE = [BandeiraTarifaria.VERDE] * 12
+
+
+class TestEstruturaTarifaria:
+    """Testes da validação das estruturas tarifárias"""
+
+    def test_faixas_invalidas(self):
+        """Testa que só a última faixa fica aberta e que os limites crescem"""
+        with pytest.raises(ValidationError):
+            EstruturaTarifaria(tarifa_fora_ponta_kwh=0.5, faixas=[FaixaConsumo(ate_kwh=100, tarifa_kwh=0.4)])
+        with pytest.raises(ValidationError):
+            EstruturaTarifaria(tarifa_fora_ponta_kwh=0.5, faixas=[
+                FaixaConsumo(ate_kwh=200, tarifa_kwh=0.4),
+                FaixaConsumo(ate_kwh=100, tarifa_kwh=0.5),
+                FaixaConsumo(tarifa_kwh=0.6),
+            ])
+
+    def test_janela_de_ponta_invalida(self):
+        """Testa que o fim da ponta deve vir depois do início"""
+        with pytest.raises(ValidationError):
+            EstruturaTarifaria(tarifa_fora_ponta_kwh=0.5, inicio_ponta=20, fim_ponta=18)
+
+
+class TestMotorTarifario:
+    """Testes do motor de tarifação sobre perfis de carga"""
+
+    def test_calendario(self):
+        """Testa horas por ano, meses e as horas de ponta só em dias úteis"""
+        assert horas_no_ano(2025) == 8760
+        assert horas_no_ano(2024) == 8784
+        agregador, inicio_mes = calendario(2025, (18, 21, False))
+        assert agregador.shape == (8760, 24)
+        assert np.all(agregador.sum(axis=1) == 1)
+        assert inicio_mes[1] == 31 * 24
+        # Janeiro de 2025 tem 23 dias úteis
+        assert agregador[:, 0].sum() == 23 * 3
+
+    def test_perfil_mensal_com_estrutura_plana_reproduz_tarifa_base(self):
+        """Testa que sem estrutura o custo é consumo × tarifa, como em simularEconomia"""
+        estado = Estado(uf="RJ", nome="Rio de Janeiro", tarifa_base_kwh=0.98)
+        perfis = PerfisCarga(mensais=[[300.0] * 12, [1000.0] * 12])
+        custo = custo_mensal(estado.estrutura(), perfis, VERDE)
+        assert np.array_equal(custo, np.array([[300 * 0.98] * 12, [1000 * 0.98] * 12]))
+
+    def test_horosazonal_demanda_e_bandeira(self):
+        """Testa ponta, fora de ponta, demanda máxima mensal e adicional de bandeira"""
+        estrutura = EstruturaTarifaria(
+            tarifa_ponta_kwh=2.0,
+            tarifa_fora_ponta_kwh=0.5,
+            tarifa_demanda_kw=10.0,
+            adicional_bandeira_kwh={BandeiraTarifaria.VERMELHA_1: 0.1}
+        )
+        perfil = np.ones((1, 8760))
+        perfil[0, 18] = 5.0  # 1º de janeiro de 2025 (quarta-feira), 18h
+        perfis = PerfisCarga(horarios=perfil, ano=2025)
+        bandeiras = [BandeiraTarifaria.VERMELHA_1] + VERDE[1:]
+
+        custo = custo_mensal(estrutura, perfis, bandeiras)[0]
+        energia_janeiro = 31 * 24 + 4
+        energia_ponta = 23 * 3 + 4
+        esperado = (
+            energia_ponta * 2.0 + (energia_janeiro - energia_ponta) * 0.5
+            + energia_janeiro * 0.1 + 5.0 * 10.0
+        )
+        assert custo[0] == pytest.approx(esperado)
+        fevereiro = 28 * 24
+        assert custo[1] == pytest.approx(20 * 3 * 2.0 + (fevereiro - 20 * 3) * 0.5 + 10.0)
+
+    def test_faixas_de_consumo(self):
+        """Testa a cobrança por blocos do consumo mensal"""
+        estrutura = EstruturaTarifaria(tarifa_fora_ponta_kwh=0.0, faixas=[
+            FaixaConsumo(ate_kwh=100, tarifa_kwh=0.5),
+            FaixaConsumo(ate_kwh=300, tarifa_kwh=0.7),
+            FaixaConsumo(tarifa_kwh=0.9),
+        ])
+        perfis = PerfisCarga(mensais=[[50.0] * 12, [250.0] * 12, [500.0] * 12])
+        custo = custo_mensal(estrutura, perfis, VERDE)[:, 0]
+        assert custo.tolist() == pytest.approx([25.0, 50 + 150 * 0.7, 50 + 140 + 200 * 0.9])
+
+    def test_precificar_usa_estrutura_do_fornecedor(self):
+        """Testa que fornecedores com estrutura própria saem do produto externo dos preços planos"""
+        estado = Estado(uf="SP", nome="São Paulo", tarifa_base_kwh=0.9)
+        fornecedores = [
+            Fornecedor(id="a", nome="A", logo="", estado="SP", solucoes=[SolucaoTipo.GD],
+                       custo_kwh_gd=0.6, total_clientes=1, avaliacao_media=4),
+            Fornecedor(id="b", nome="B", logo="", estado="SP", solucoes=[SolucaoTipo.GD],
+                       custo_kwh_gd=0.5, total_clientes=1, avaliacao_media=4,
+                       estruturas_tarifarias={SolucaoTipo.GD: EstruturaTarifaria(tarifa_fora_ponta_kwh=0.8)}),
+        ]
+        perfis = PerfisCarga(mensais=[[100.0] * 12])
+        custo_atual, solucoes = precificar_perfis(estado, Catalogo([estado], fornecedores), perfis)
+        assert custo_atual.sum() == pytest.approx(1080)
+        (gd,) = solucoes
+        assert [f.id for f in gd.fornecedores] == ["b", "a"]
+        assert gd.economia_anual[:, 0].tolist() == pytest.approx([120, 360])
+
+    def test_perfil_mensal_usa_tarifa_plana_e_bandeira_da_estrutura(self):
+        """Testa que perfis mensais não usam a tarifa de ponta e que a bandeira vem só das estruturas"""
+        catalogo = Catalogo(ESTADOS, FORNECEDORES)
+        estado = catalogo.get_estado("SP")
+        perfis = PerfisCarga(mensais=[[500.0] * 12])
+        custo_atual, solucoes = precificar_perfis(estado, catalogo, perfis)
+        assert custo_atual[0].tolist() == pytest.approx([500 * 0.92] * 12)
+        ml = {f.id: linha for linha, f in enumerate(solucoes[1].fornecedores)}
+        assert solucoes[1].custo_mensal[ml["f2"], 0].tolist() == pytest.approx([500 * 0.58] * 12)
+
+        vermelha = [BandeiraTarifaria.VERMELHA_2] * 12
+        custo_vermelha, solucoes_vermelha = precificar_perfis(estado, catalogo, perfis, vermelha)
+        assert custo_vermelha[0, 0] == pytest.approx(500 * (0.92 + 0.07877))
+        for normal, com_bandeira in zip(solucoes, solucoes_vermelha):
+            assert np.array_equal(normal.custo_mensal, com_bandeira.custo_mensal)
+
+    def test_perfil_mensal_mantem_faixas_da_estrutura_com_ponta(self):
+        """Testa que, sem a tarifa de ponta, as faixas da estrutura ainda cobram o perfil mensal"""
+        estado = Estado(uf="SP", nome="São Paulo", tarifa_base_kwh=0.9)
+        estrutura = EstruturaTarifaria(tarifa_ponta_kwh=2.0, tarifa_fora_ponta_kwh=0.5, faixas=[
+            FaixaConsumo(ate_kwh=100, tarifa_kwh=0.3),
+            FaixaConsumo(tarifa_kwh=0.8),
+        ])
+        fornecedores = [
+            Fornecedor(id="a", nome="A", logo="", estado="SP", solucoes=[SolucaoTipo.GD],
+                       custo_kwh_gd=0.6, total_clientes=1, avaliacao_media=4,
+                       estruturas_tarifarias={SolucaoTipo.GD: estrutura}),
+        ]
+        perfis = PerfisCarga(mensais=[[300.0] * 12])
+        _, (gd,) = precificar_perfis(estado, Catalogo([estado], fornecedores), perfis)
+        assert gd.custo_mensal[0, 0].tolist() == pytest.approx([100 * 0.3 + 200 * 0.8] * 12)
+
+    def test_curva_de_custo_igual_ao_perfil_mensal(self):
+        """Testa que a curva da estrutura (usada no índice de melhor oferta) cobra o mesmo que o motor"""
+        estrutura = EstruturaTarifaria(
+            tarifa_ponta_kwh=1.5, tarifa_fora_ponta_kwh=0.5, taxa_fixa_mensal=30,
+            adicional_bandeira_kwh={BandeiraTarifaria.VERDE: 0.01},
+            faixas=[FaixaConsumo(ate_kwh=100, tarifa_kwh=0.4), FaixaConsumo(ate_kwh=400, tarifa_kwh=0.6),
+                    FaixaConsumo(tarifa_kwh=0.5)]
+        )
+        fornecedor = Fornecedor(id="a", nome="A", logo="", estado="SP", solucoes=[SolucaoTipo.GD],
+                                custo_kwh_gd=0.55, total_clientes=1, avaliacao_media=4,
+                                estruturas_tarifarias={SolucaoTipo.GD: estrutura})
+        consumos = [0.0, 50.0, 100.0, 250.0, 400.0, 1234.5]
+        perfis = PerfisCarga(mensais=[[c] * 12 for c in consumos])
+        mensal = custo_mensal(estrutura.sem_posto_horario(0.55), perfis, VERDE)[:, 0]
+        curva = fornecedor.curva_custo(SolucaoTipo.GD)
+        assert [custo_curva(curva, c) for c in consumos] == pytest.approx(mensal.tolist())
+
+    def test_mesmo_vencedor_de_melhor_economia(self):
+        """Testa que simularTarifas (perfil mensal constante) e melhorEconomia escolhem e cobram igual"""
+        gerador = np.random.default_rng(3)
+        estado = Estado(uf="SP", nome="São Paulo", tarifa_base_kwh=0.9)
+        fornecedores = []
+        for i in range(30):
+            limites = np.sort(gerador.choice(np.arange(100, 5000, 100), 2, replace=False))
+            estrutura = EstruturaTarifaria(
+                tarifa_fora_ponta_kwh=float(gerador.uniform(0.4, 0.8)),
+                tarifa_ponta_kwh=float(gerador.uniform(1.0, 2.0)) if i % 3 == 0 else None,
+                taxa_fixa_mensal=float(gerador.uniform(0, 300)),
+                faixas=[FaixaConsumo(ate_kwh=float(limites[0]), tarifa_kwh=float(gerador.uniform(0.4, 0.9))),
+                        FaixaConsumo(ate_kwh=float(limites[1]), tarifa_kwh=float(gerador.uniform(0.3, 0.8))),
+                        FaixaConsumo(tarifa_kwh=float(gerador.uniform(0.2, 0.7)))] if i % 2 == 0 else []
+            )
+            fornecedores.append(Fornecedor(
+                id=f"f{i}", nome=f"F{i}", logo="", estado="SP", solucoes=[SolucaoTipo.GD],
+                custo_kwh_gd=float(gerador.uniform(0.5, 0.8)), total_clientes=1, avaliacao_media=4,
+                estruturas_tarifarias={SolucaoTipo.GD: estrutura} if i % 5 else {}
+            ))
+        catalogo = Catalogo([estado], fornecedores)
+        consumos = [50.0, 300.0, 1000.0, 2500.0, 7000.0, 40000.0]
+        _, (gd,) = precificar_perfis(estado, catalogo, PerfisCarga(mensais=[[c] * 12 for c in consumos]))
+        for perfil, consumo in enumerate(consumos):
+            anual = gd.custo_mensal[:, perfil].sum(axis=1)
+            melhor = calcular_melhor_economia(catalogo, "SP", SolucaoTipo.GD, consumo)
+            assert anual.min() == pytest.approx(melhor.custo_com_fornecedor * 12, abs=0.1)
+            assert gd.fornecedores[int(anual.argmin())].id == melhor.fornecedor_id
+
+    def test_lote_igual_a_perfis_individuais(self):
+        """Testa que precificar em lote dá o mesmo que um perfil por vez"""
+        catalogo = Catalogo(ESTADOS, FORNECEDORES)
+        estado = catalogo.get_estado("SP")
+        matriz = np.random.default_rng(1).uniform(0, 3, (20, 8760))
+        custo_lote, solucoes_lote = precificar_perfis(estado, catalogo, PerfisCarga(horarios=matriz))
+        for i in (0, 7, 19):
+            custo, solucoes = precificar_perfis(estado, catalogo, PerfisCarga(horarios=matriz[i:i + 1]))
+            assert np.allclose(custo[0], custo_lote[i])
+            for individual, lote in zip(solucoes, solucoes_lote):
+                assert np.allclose(individual.custo_mensal[:, 0], lote.custo_mensal[:, i])
+
+    def test_perfis_invalidos(self):
+        """Testa tamanhos errados, valores negativos e demanda em perfil horário"""
+        with pytest.raises(ValueError):
+            PerfisCarga(horarios=np.ones((1, 8760)), ano=2024)
+        with pytest.raises(ValueError):
+            PerfisCarga(mensais=[[-1.0] * 12])
+        with pytest.raises(ValueError):
+            PerfisCarga(horarios=np.ones((1, 8760)), demanda_kw=[[1.0] * 12])
+        with pytest.raises(ValueError):
+            PerfisCarga()
@@ -1,12 +1,32 @@
 import { ApolloClient, InMemoryCache, HttpLink } from '@apollo/client';
+import { createPersistedQueryLink } from '@apollo/client/link/persisted-queries';
+
+// Automatic Persisted Queries: envia só o sha256 do documento e o texto
+// completo apenas quando o servidor ainda não o conhece. As queries com hash
+// vão por GET, com URLs curtas que o navegador e o proxy podem cachear (ETag).
+const sha256 = async (query) => {
+  const bytes = new TextEncoder().encode(query);
+  const digest = await crypto.subtle.digest('SHA-256', bytes);
+  return Array.from(new Uint8Array(digest))
+    .map((byte) => byte.toString(16).padStart(2, '0'))
+    .join('');
+};
+
+const httpLink = new HttpLink({
+  uri: import.meta.env.VITE_API_URL 
+    ? `${import.meta.env.VITE_API_URL}/graphql`
+    : 'http://localhost:8000/graphql',
+});
+
+// crypto.subtle só existe em contextos seguros (https ou localhost); fora deles
+// as queries seguem completas por POST, sem APQ.
+const link = globalThis.crypto?.subtle
+  ? createPersistedQueryLink({ sha256, useGETForHashedQueries: true }).concat(httpLink)
+  : httpLink;
 
 const client = new ApolloClient({
-  link: new HttpLink({
-    uri: import.meta.env.VITE_API_URL 
-      ? `${import.meta.env.VITE_API_URL}/graphql`
-      : 'http://localhost:8000/graphql',
-  }),
+  link,
   cache: new InMemoryCache(),
 });
 
-export default client;
\ No newline at end of file
+export default client;